@@ -16,6 +16,16 @@
 Base utilities to build API operation managers and objects on top of.
 """
 
+import collections
+import threading
+import time
+import urllib
+
+from . import exceptions
+from . import executor
+from . import retry
+from . import utils
+
 
 def getid(obj):
     """
@@ -32,60 +42,472 @@ class Manager(object):
     """
     Managers interact with a particular type of API and provide CRUD
     operations for them.
+
+    :param api: The client the manager belongs to.
+    :param cache: A ``ResponseCache`` for GET requests. (optional)
+    :param compact: Build compact resources, see `compact_class`.
+                    (optional)
+    :param server_fields: Ask the server for the requested fields only,
+                          with the `fields` query parameter. (optional)
+    :param server_filters: Send the equality filters of listings to the
+                           server as query parameters. (optional)
     """
     resource_class = None
     use_admin_url = False
+    # Resources live under /loadbalancers/<id>/ and their manager methods
+    # take the load balancer as the first argument.
+    nested = False
+    # Attributes find() answers from the name index instead of a listing.
+    index_attrs = ('human_id', 'name', 'display_name')
+    # A lookup miss doesn't refresh a name index younger than this.
+    index_refresh_interval = 5
+    # Cached lookups elsewhere in the API that writes of this manager make
+    # stale, dropped along with the cached responses of the written URL.
+    invalidates = ()
 
-    def __init__(self, api):
+    def __init__(self, api, cache=None, compact=False, server_fields=False,
+                 server_filters=False):
         self.api = api
+        self.cache = cache
+        self.server_fields = server_fields
+        self.server_filters = server_filters
+        if compact and self.resource_class is not None:
+            self.resource_class = compact_class(self.resource_class)
+        self._objects = collections.OrderedDict()
+        self._objects_lock = threading.Lock()
+        self._local = threading.local()
+        self._indexes = {}
 
     def _is_admin_url(self, admin_url):
         return self.use_admin_url or admin_url
 
+    def _cached_get(self, url, admin_url, **kwargs):
+        """ GET a URL, answering from the response cache if possible.
+            Returns the response, or None on a cache hit, and the body.
+        """
+        if self.cache is None or kwargs.get('body') is not None:
+            return self.api.client.json_request('GET', url,
+                                                admin_url=admin_url,
+                                                **kwargs)
+        key = (admin_url, url)
+        if not getattr(self._local, 'fresh', False):
+            body = self.cache.get(key)
+            if body is not None:
+                return None, body
+        resp, body = self.api.client.json_request('GET', url,
+                                                  admin_url=admin_url,
+                                                  **kwargs)
+        self.cache.put(key, body)
+        return resp, body
+
+    def _reuse(self, key, resp, make):
+        """ Build results with `make`, unless the server answered 304 Not
+            Modified for `key`, in which case the objects built from the
+            previous response are returned again.
+        """
+        if resp is not None and resp.status == 304:
+            with self._objects_lock:
+                previous = self._objects.get(key)
+            if previous is not None:
+                return previous
+        result = make()
+        if (resp is not None and resp.status == 200 and
+                getattr(self.api.client, 'conditional_get', False) and
+                (resp.get('etag') or resp.get('last-modified'))):
+            with self._objects_lock:
+                self._objects.pop(key, None)
+                self._objects[key] = result
+                while len(self._objects) > self.api.client.MAX_VALIDATORS:
+                    self._objects.popitem(last=False)
+        return result
+
+    def _bulk(self, func, items, concurrency=10):
+        """ Call `func` for every item on at most `concurrency` threads.
+
+            Returns the results in the order of `items`. If any call fails
+            BulkOperationError is raised with the results of the calls that
+            succeeded and the errors of those that failed.
+        """
+        items = list(items)
+        if not items:
+            return []
+        self.api.client.ensure_pool(concurrency)
+        with executor.Executor(min(concurrency, len(items))) as pool:
+            futures = [pool.submit(func, item) for item in items]
+            results, errors = [], []
+            for item, future in zip(items, futures):
+                error = future.exception()
+                if error is None:
+                    results.append(future.result())
+                else:
+                    errors.append((item, error))
+        if errors:
+            raise exceptions.BulkOperationError(results, errors)
+        return results
+
+    def _poll(self, items, fetch, ready, failed=None, timeout=None,
+              initial=1, maximum=30):
+        """ Wait until every item is ready, polling all of them in one loop.
+
+            `fetch` is called with the list of pending items and returns
+            their current resources in the same order. An item is done once
+            `ready(resource)` is true; if `failed(resource)` is true it is
+            given up with ResourceStateError. The delay between rounds
+            grows exponentially while nothing changes and starts over once
+            some item is done. Items still pending after `timeout` seconds
+            fail with WaitTimeout.
+
+            Returns a list of the final resources of the done items and a
+            list of (item, exception) pairs for the failed ones.
+        """
+        items = list(items)
+        pending = list(items)
+        done, errors = {}, []
+        deadline = timeout is not None and time.time() + timeout or None
+        delays = retry.backoff(initial, maximum)
+        while pending:
+            still_pending = []
+            for item, res in zip(pending, fetch(pending)):
+                if res is not None and ready(res):
+                    done[id(item)] = res
+                elif res is not None and failed is not None and failed(res):
+                    errors.append((item, exceptions.ResourceStateError(
+                        "%s went into a failure state" % (getid(res),))))
+                else:
+                    still_pending.append(item)
+            if len(still_pending) < len(pending):
+                delays = retry.backoff(initial, maximum)
+            pending = still_pending
+            if not pending:
+                break
+            delay = next(delays)
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    errors.extend((item, exceptions.WaitTimeout(
+                        "Timed out waiting for %s" % (getid(item),)))
+                        for item in pending)
+                    break
+                delay = min(delay, remaining)
+            time.sleep(delay)
+        return [done[id(item)] for item in items if id(item) in done], errors
+
+    def _set_parent(self, url, obj):
+        """ Record the load balancer a nested resource belongs to. """
+        if self.nested:
+            obj._parent = url.strip('/').split('/')[1]
+        return obj
+
+    def _refresh(self, items, lb=None, fresh=True):
+        """ Fetch the current state of `items`, bypassing the response
+            cache if `fresh`. Items of the same load balancer, given as
+            `lb` or recorded in the resources, are fetched with one list
+            request. So are several top-level items, a single one is
+            fetched with a get request.
+        """
+        def parent_of(item):
+            if lb is None and isinstance(item, Resource):
+                return item._parent
+            return lb
+
+        groups = collections.OrderedDict()
+        for item in items:
+            groups.setdefault(parent_of(item), []).append(item)
+        current = {}
+        self._local.fresh = fresh
+        try:
+            for parent, group in groups.iteritems():
+                if parent is None and len(group) == 1:
+                    current[None, getid(group[0])] = self.get(
+                        getid(group[0]))
+                elif parent is None:
+                    for res in self.list():
+                        current[None, res.id] = res
+                else:
+                    for res in self.list(parent):
+                        current[parent, res.id] = res
+        finally:
+            self._local.fresh = False
+        return [current.get((parent_of(item), getid(item))) for item in items]
+
+    def hydrate(self, resources, lb=None):
+        """ Load all attributes of many resources at once, with a single
+            list request per load balancer for nested resources.
+        """
+        resources = list(resources)
+        for res, new in zip(resources,
+                            self._refresh(resources, lb, fresh=False)):
+            if new is not None:
+                res._info = new._info
+                res._add_details(new._info)
+            res.set_loaded(True)
+        return resources
+
+    def _build_index(self, args):
+        resources = collections.OrderedDict()
+        names = dict((attr, {}) for attr in self.index_attrs)
+        for res in self.list(*args):
+            resources[res.id] = res
+            for attr in self.index_attrs:
+                value = res._info.get(attr)
+                if value is not None:
+                    names[attr].setdefault(value, []).append(res.id)
+        self._indexes[args] = (time.time(), resources, names)
+        return self._indexes[args]
+
+    def _lookup(self, args, attr, value):
+        """ Return the resources whose `attr` is `value` from the name
+            index of the collection listed with `args`. The index is built
+            with one list request and rebuilt when a lookup misses.
+        """
+        index = self._indexes.get(args)
+        if index is None:
+            index = self._build_index(args)
+        elif (value not in index[2][attr] and
+                time.time() - index[0] >= self.index_refresh_interval):
+            index = self._build_index(args)
+        return [index[1][id] for id in index[2][attr].get(value, ())]
+
+    def findall(self, *args, **kwargs):
+        """ Find all resources that have the given attribute values.
+
+            Positional arguments are passed to list(), e.g. the load
+            balancer for nested resources. A lookup by a single attribute
+            of `index_attrs` is answered from the name index, anything
+            else filters a fresh listing.
+        """
+        if len(kwargs) == 1 and kwargs.keys()[0] in self.index_attrs:
+            attr, value = kwargs.items()[0]
+            return self._lookup(tuple(getid(arg) for arg in args), attr,
+                                value)
+        return [res for res in self.list(*args)
+                if all(res._info.get(attr) == value
+                       for attr, value in kwargs.iteritems())]
+
+    def find(self, *args, **kwargs):
+        """ Find the single resource that has the given attribute values,
+            see findall().
+        """
+        matches = self.findall(*args, **kwargs)
+        if not matches:
+            raise exceptions.NotFound(404, "No %s matching %s." % (
+                self.resource_class.__name__, kwargs))
+        if len(matches) > 1:
+            raise exceptions.NoUniqueMatch
+        return matches[0]
+
+    def wait_for(self, resources, field='status', target='ACTIVE',
+                 failure=('ERROR',), timeout=600, poll_interval=1,
+                 max_poll_interval=30, lb=None):
+        """ Wait until `field` of the resources equals `target`.
+
+            All resources are polled in one loop, with one list request per
+            round if they belong to load balancer `lb`. The poll interval
+            grows from `poll_interval` to `max_poll_interval` with jitter
+            while nothing changes.
+
+            Given a single resource, returns its final state or raises
+            WaitTimeout or ResourceStateError if its `field` becomes one of
+            `failure`. Given a list, returns the final states in order or
+            raises BulkOperationError with the resources that got ready and
+            a (resource, exception) pair per failure.
+        """
+        single = not isinstance(resources, (list, tuple))
+        items = single and [resources] or list(resources)
+        done, errors = self._poll(
+            items, lambda pending: self._refresh(pending, lb),
+            lambda res: res._info.get(field) == target,
+            lambda res: res._info.get(field) in failure,
+            timeout=timeout, initial=poll_interval,
+            maximum=max_poll_interval)
+        if single and errors:
+            raise errors[0][1]
+        if errors:
+            raise exceptions.BulkOperationError(done, errors)
+        return single and done[0] or done
+
+    def _invalidate(self, url):
+        self._indexes.clear()
+        if self.cache is not None:
+            self.cache.invalidate(url)
+            for stale in self.invalidates:
+                self.cache.invalidate(stale)
+
     def _list(self, url, response_key, obj_class=None, body=None,
               admin_url=False):
         admin_url = self._is_admin_url(admin_url)
-        resp, body = self.api.client.json_request('GET', url,
-                                                  admin_url=admin_url,
-                                                  body=body)
+        resp, body = self._cached_get(url, admin_url, body=body)
+
+        if obj_class is None:
+            obj_class = self.resource_class
+
+        def make():
+            data = body[response_key]
+            return [self._set_parent(url, obj_class(self, res, loaded=True))
+                    for res in data if res]
+        return list(self._reuse((admin_url, url), resp, make))
 
+    def _project(self, info, fields):
+        """ Keep only the id and the `fields` of a resource's attributes. """
+        if fields is None:
+            return info
+        return dict((key, value) for key, value in info.iteritems()
+                    if key == 'id' or key in fields)
+
+    def _iter_list(self, url, response_key, obj_class=None, page_size=None,
+                   admin_url=False, fields=None, filters=None):
+        """ Yield the resources of a collection one at a time.
+
+            With `page_size` the collection is fetched page by page using
+            the `limit` and `marker` query parameters. A server that ignores
+            them is detected and its full response used instead. Without it
+            the response is decoded one item at a time. Responses are not
+            cached.
+
+            With `fields` the resources only get these attributes and their
+            id, and the server is asked for them only if the manager has
+            `server_fields` set.
+
+            `filters` maps attributes to the values the server should
+            match, they are sent as query parameters if the manager has
+            `server_filters` set. The caller still has to filter the
+            resources of servers that ignore them.
+        """
+        admin_url = self._is_admin_url(admin_url)
         if obj_class is None:
             obj_class = self.resource_class
+        if fields is not None:
+            fields = frozenset(fields)
+            if self.server_fields:
+                url += '%sfields=%s' % ('?' in url and '&' or '?',
+                                        urllib.quote(','.join(sorted(fields)),
+                                                     safe=','))
+        if filters and self.server_filters:
+            url += ('?' in url and '&' or '?') + urllib.urlencode(
+                sorted(filters.iteritems()))
+
+        def make(res):
+            return self._set_parent(url, obj_class(
+                self, self._project(res, fields), loaded=True))
+
+        if page_size is None:
+            resp, body = self.api.client.raw_request('GET', url,
+                                                     admin_url=admin_url)
+            for res in utils.iter_json_array(body, response_key):
+                if res:
+                    yield make(res)
+            return
 
-        data = body[response_key]
-        return [obj_class(self, res, loaded=True) for res in data if res]
+        separator = '?' in url and '&' or '?'
+        first = marker = None
+        while True:
+            query = [('limit', page_size)]
+            if marker is not None:
+                query.append(('marker', marker))
+            resp, body = self.api.client.json_request(
+                'GET', url + separator + urllib.urlencode(query),
+                admin_url=admin_url)
+            data = body[response_key]
+            if not data:
+                return
+            if marker is not None and data[0].get('id') == first:
+                # The marker was ignored, this is the first page again.
+                return
+            if first is None:
+                first = data[0].get('id')
+            for res in data:
+                if res:
+                    yield make(res)
+            marker = data[-1].get('id')
+            # A short page is the last one, a longer one means that the
+            # server returned everything.
+            if len(data) != page_size or marker is None:
+                return
 
     def _delete(self, url, admin_url=False):
         admin_url = self._is_admin_url(admin_url)
-        self.api.client.raw_request('DELETE', url, admin_url=admin_url)
+        try:
+            self.api.client.raw_request('DELETE', url, admin_url=admin_url)
+        finally:
+            self._invalidate(url)
 
     def _update(self, url, body, response_key=None, admin_url=False):
         admin_url = self._is_admin_url(admin_url)
-        resp, body = self.api.client.json_request('PUT', url,
-                                                  admin_url=admin_url,
-                                                  body=body)
+        try:
+            resp, body = self.api.client.json_request('PUT', url,
+                                                      admin_url=admin_url,
+                                                      body=body)
+        finally:
+            self._invalidate(url)
         # PUT requests may not return a body
         if body:
-            return self.resource_class(self, body[response_key])
+            return self._set_parent(url,
+                                    self.resource_class(self,
+                                                        body[response_key]))
 
     def _create(self, url, body, response_key,
                 admin_url=False,
                 return_raw=False):
         admin_url = self._is_admin_url(admin_url)
-        resp, body = self.api.client.json_request('POST', url,
-                                                  admin_url=admin_url,
-                                                  body=body)
+        try:
+            resp, body = self.api.client.json_request('POST', url,
+                                                      admin_url=admin_url,
+                                                      body=body)
+        finally:
+            self._invalidate(url)
         if return_raw:
             return body[response_key]
-        return self.resource_class(self, body[response_key])
+        return self._set_parent(url, self.resource_class(self,
+                                                         body[response_key]))
 
     def _get(self, url, response_key, return_raw=False, admin_url=False):
         admin_url = self._is_admin_url(admin_url)
-        resp, body = self.api.client.json_request('GET', url,
-                                                  admin_url=admin_url)
+        resp, body = self._cached_get(url, admin_url)
         if return_raw:
             return body[response_key]
-        return self.resource_class(self, body[response_key])
+        return self._reuse((admin_url, url), resp,
+                           lambda: self._set_parent(
+                               url, self.resource_class(self,
+                                                        body[response_key])))
+
+
+class AsyncManager(object):
+    """
+    Wraps a manager so that its public methods run on an executor and
+    return futures instead of blocking.
+    """
+    def __init__(self, manager, executor):
+        self.manager = manager
+        self.executor = executor
+
+    def __getattr__(self, name):
+        attr = getattr(self.manager, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def submit(*args, **kwargs):
+            return self.executor.submit(attr, *args, **kwargs)
+        submit.__name__ = name
+        submit.__doc__ = attr.__doc__
+        return submit
+
+
+_compact_classes = {}
+
+
+def compact_class(cls):
+    """
+    Returns a variant of the resource class `cls` whose instances keep only
+    the raw attribute dict and look attributes up in it when they are
+    accessed, instead of copying every attribute into the instance.
+    """
+    try:
+        return _compact_classes[cls]
+    except KeyError:
+        compact = type(cls.__name__, (cls,), {'__slots__': (),
+                                              '_compact': True,
+                                              '__module__': cls.__module__})
+        return _compact_classes.setdefault(cls, compact)
 
 
 class Resource(object):
@@ -97,30 +519,42 @@ class Resource(object):
     :param info: dictionary representing resource attributes
     :param loaded: prevent lazy-loading if set to True
     """
+    # The instance __dict__ is only allocated when attributes are copied
+    # into it, which compact resources never do.
+    __slots__ = ('manager', '_info', '_loaded', '_parent', '__dict__',
+                 '__weakref__')
+    _compact = False
+
     def __init__(self, manager, info, loaded=False):
         self.manager = manager
         self._info = info
+        self._parent = None
         self._add_details(info)
         self._loaded = loaded
 
     def _add_details(self, info):
+        if self._compact:
+            return
         for (k, v) in info.iteritems():
             setattr(self, k, v)
 
     def __getattr__(self, k):
-        if k not in self.__dict__:
-            #NOTE(bcwaldon): disallow lazy-loading if already loaded once
-            if not self.is_loaded():
-                self.get()
-                return self.__getattr__(k)
-
+        if k in Resource.__slots__:
             raise AttributeError(k)
-        else:
-            return self.__dict__[k]
+        try:
+            return self._info[k]
+        except KeyError:
+            pass
+        #NOTE(bcwaldon): disallow lazy-loading if already loaded once
+        if not self.is_loaded():
+            self.get()
+            return self.__getattr__(k)
+        raise AttributeError(k)
 
     def __repr__(self):
-        reprkeys = sorted(k for k in self.__dict__.keys() if k[0] != '_' and
-                                                                k != 'manager')
+        attrs = self._compact and self._info or self.__dict__
+        reprkeys = sorted(k for k in attrs.keys() if k[0] != '_' and
+                                                       k != 'manager')
         info = ", ".join("%s=%s" % (k, getattr(self, k)) for k in reprkeys)
         return "<%s %s>" % (self.__class__.__name__, info)
 
@@ -137,7 +571,10 @@ class Resource(object):
         if not hasattr(self.manager, 'get'):
             return
 
-        new = self.manager.get(self.id)
+        if self._parent is None:
+            new = self.manager.get(self.id)
+        else:
+            new = self.manager.get(self._parent, self.id)
         if new:
             self._info = new._info
             self._add_details(new._info)
@@ -0,0 +1,91 @@
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+"""
+In-memory cache of API responses for the managers.
+"""
+
+import collections
+import copy
+import threading
+import time
+
+
+def scope(url):
+    """
+    Returns the collection and the resource prefix a URL belongs to, e.g.
+    ('/loadbalancers', '/loadbalancers/1') for '/loadbalancers/1/nodes/2'.
+    """
+    parts = url.split('?', 1)[0].strip('/').split('/')
+    return '/' + parts[0], '/' + '/'.join(parts[:2])
+
+
+class ResponseCache(object):
+    """A size-bounded LRU cache of decoded GET responses with a TTL.
+
+    Entries are keyed by (admin_url, url). A write to a URL invalidates
+    the cached collection it belongs to and everything under the same
+    top-level resource, so that e.g. changing a node of load balancer 1
+    drops `/loadbalancers`, `/loadbalancers/1` and `/loadbalancers/1/...`.
+
+    :param float ttl: Seconds an entry stays valid.
+    :param integer size: Maximum number of entries.
+    """
+
+    def __init__(self, ttl=30, size=1000):
+        self.ttl = ttl
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return a copy of the cached value for `key` or None."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] < time.time():
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def put(self, key, value):
+        if value is None:
+            return
+        entry = (time.time() + self.ttl, copy.deepcopy(value))
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url):
+        collection, prefix = scope(url)
+        with self._lock:
+            for key in self._entries.keys():
+                cached_url = key[1].split('?', 1)[0]
+                if (cached_url == collection or cached_url == prefix or
+                        cached_url.startswith(prefix + '/')):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -19,11 +19,15 @@ OpenStack Client interface. Handles the REST calls and responses.
 """
 
 import httplib2
+import collections
 import copy
 import logging
 import json
+import threading
+import time
 
 from . import exceptions
+from . import pool
 from . import utils
 from .service_catalog import ServiceCatalog
 
@@ -34,11 +38,17 @@ logger = logging.getLogger(__name__)
 class HTTPClient(httplib2.Http):
 
     USER_AGENT = 'python-balancerclient'
+    MIN_REFRESH_INTERVAL = 30
+    MAX_VALIDATORS = 1000
 
     def __init__(self, endpoint=None, token=None, username=None,
                  password=None, tenant_name=None, tenant_id=None,
                  region_name=None, auth_url=None, auth_tenant_id=None,
-                 endpoint_type=None, timeout=600, insecure=False):
+                 endpoint_type=None, timeout=600, insecure=False,
+                 pool_size=None, pool_idle_timeout=60,
+                 pool_max_requests=None, token_cache=None,
+                 auto_refresh=False, refresh_margin=300,
+                 retry_policy=None, conditional_get=False):
         super(HTTPClient, self).__init__(timeout=timeout)
         self.endpoint = endpoint
         self.auth_token = token
@@ -50,11 +60,45 @@ class HTTPClient(httplib2.Http):
         self.tenant_id = tenant_id
         self.region_name = region_name
         self.endpoint_type = endpoint_type
+        self.token_cache = token_cache
+        self.auth_token_expires = None
+        self.auto_refresh = auto_refresh
+        self.refresh_margin = refresh_margin
+        self._auth_lock = threading.Lock()
+        self._refresh_timer = None
+        self.retry_policy = retry_policy
+        self._endpoints = {}
+        self.conditional_get = conditional_get
+        self._validators = collections.OrderedDict()
+        self._validators_lock = threading.Lock()
         self.force_exception_to_status_code = True
         self.disable_ssl_certificate_validation = insecure
+        # httplib2.Http keeps a single connection per host and can't be
+        # shared between threads, so concurrent callers go through a pool
+        # of persistent connections when it is configured.
+        if pool_size:
+            self.pool = pool.ConnectionPool(size=pool_size,
+                                            idle_timeout=pool_idle_timeout,
+                                            max_requests=pool_max_requests,
+                                            timeout=timeout,
+                                            insecure=insecure)
+        else:
+            self.pool = None
+        self._pool_lock = threading.Lock()
         if self.endpoint is None:
             self.authenticate()
 
+    def ensure_pool(self, size):
+        """ Make sure requests go through a connection pool, so that the
+            client can be used from several threads at once.
+        """
+        with self._pool_lock:
+            if self.pool is None:
+                self.pool = pool.ConnectionPool(
+                    size=size, timeout=self.timeout,
+                    insecure=self.disable_ssl_certificate_validation)
+        return self.pool
+
     def _http_request(self, url, method, **kwargs):
         """ Send an http request with the specified characteristics.
         """
@@ -64,7 +108,18 @@ class HTTPClient(httplib2.Http):
         if self.auth_token:
             kwargs['headers'].setdefault('X-Auth-Token', self.auth_token)
 
-        resp, body = super(HTTPClient, self).request(url, method, **kwargs)
+        def send():
+            if self.pool is not None:
+                return self.pool.request(
+                    url, method,
+                    follow_all_redirects=self.follow_all_redirects,
+                    **kwargs)
+            return super(HTTPClient, self).request(url, method, **kwargs)
+
+        if self.retry_policy is not None:
+            resp, body = self.retry_policy.run(method, url, send)
+        else:
+            resp, body = send()
 
         if logger.isEnabledFor(logging.DEBUG):
             utils.http_log(logger, (url, method,), kwargs, resp, body)
@@ -74,6 +129,31 @@ class HTTPClient(httplib2.Http):
 
         return resp, body
 
+    def _conditional_headers(self, url, headers):
+        """ Add validators of the last response for `url` to the headers
+            of a GET request. Returns the validators used, if any.
+        """
+        validator = self._validators.get(url)
+        if validator is None:
+            return None, headers
+        etag, last_modified, body = validator
+        headers = dict(headers)
+        if etag:
+            headers.setdefault('If-None-Match', etag)
+        if last_modified:
+            headers.setdefault('If-Modified-Since', last_modified)
+        return validator, headers
+
+    def _remember_validators(self, url, resp, body):
+        etag = resp.get('etag')
+        last_modified = resp.get('last-modified')
+        with self._validators_lock:
+            self._validators.pop(url, None)
+            if etag or last_modified:
+                self._validators[url] = (etag, last_modified, body)
+                while len(self._validators) > self.MAX_VALIDATORS:
+                    self._validators.popitem(last=False)
+
     def _json_request(self, method, url, **kwargs):
         """ Wrapper around _http_request to handle setting headers,
             JSON enconding/decoding and error handling.
@@ -85,8 +165,18 @@ class HTTPClient(httplib2.Http):
         if 'body' in kwargs and kwargs['body'] is not None:
             kwargs['body'] = json.dumps(kwargs['body'])
 
+        conditional = self.conditional_get and method == 'GET'
+        validator = None
+        if conditional:
+            validator, kwargs['headers'] = self._conditional_headers(
+                url, kwargs['headers'])
+
         resp, body = self._http_request(url, method, **kwargs)
 
+        if resp.status == 304 and validator is not None:
+            # Not modified, hand out the body decoded last time.
+            return resp, validator[2]
+
         if body:
             try:
                 body = json.loads(body)
@@ -99,10 +189,15 @@ class HTTPClient(httplib2.Http):
         if 400 <= resp.status < 600:
             raise exceptions.from_response(resp, body)
 
+        if conditional and resp.status == 200:
+            self._remember_validators(url, resp, body)
+
         return resp, body
 
     def _get_endpoint(self, admin_url=False):
         """ Retrieve endpoint from service catalog.
+
+            Resolved endpoints are remembered until the catalog changes.
         """
         if self.endpoint_type:
             endpoint_type = self.endpoint_type
@@ -111,17 +206,42 @@ class HTTPClient(httplib2.Http):
                 endpoint_type = 'adminURL'
             else:
                 endpoint_type = 'publicURL'
+        try:
+            return self._endpoints[endpoint_type]
+        except KeyError:
+            pass
         endpoint = self.service_catalog.url_for(attr='region',
                                                 filter_value=self.region_name,
                                                 endpoint_type=endpoint_type)
+        self._endpoints[endpoint_type] = endpoint
         return endpoint
 
-    def raw_request(self, method, url, admin_url=False, **kwargs):
+    def _url(self, url, admin_url=False):
         if self.endpoint:
-            url = self.endpoint + url
-        else:
-            url = self._get_endpoint(admin_url=admin_url) + url
+            return self.endpoint + url
+        return self._get_endpoint(admin_url=admin_url) + url
+
+    def _can_reauthenticate(self):
+        return bool(self.auth_url and self.username and self.password)
+
+    def _authenticated_request(self, request, method, url, admin_url,
+                               kwargs):
+        """ Send a request, re-authenticating and retrying it once if
+            the token has expired.
+        """
+        token = self.auth_token
+        try:
+            return request(method, self._url(url, admin_url=admin_url),
+                           **dict(kwargs))
+        except exceptions.Unauthorized:
+            if not self._can_reauthenticate():
+                raise
+            logger.debug("Token was rejected, re-authenticating.")
+            self.reauthenticate(token)
+            return request(method, self._url(url, admin_url=admin_url),
+                           **dict(kwargs))
 
+    def _raw_request(self, method, url, **kwargs):
         kwargs.setdefault('headers', {})
         kwargs['headers'].setdefault('Content-Type',
                                      'application/octet-stream')
@@ -133,15 +253,75 @@ class HTTPClient(httplib2.Http):
 
         return resp, body
 
+    def raw_request(self, method, url, admin_url=False, **kwargs):
+        return self._authenticated_request(self._raw_request, method, url,
+                                           admin_url, kwargs)
+
     def json_request(self, method, url, admin_url=False, **kwargs):
-        if self.endpoint:
-            url = self.endpoint + url
+        return self._authenticated_request(self._json_request, method, url,
+                                           admin_url, kwargs)
+
+    def _token_cache_key(self):
+        return self.token_cache.key(self.auth_url, self.username,
+                                    tenant_id=self.tenant_id,
+                                    tenant_name=self.tenant_name)
+
+    def authenticate(self, stale_token=None):
+        """ Obtain a token and the service catalog.
+
+            A token from the cache equal to `stale_token` is not reused.
+        """
+        if self.token_cache is None:
+            self._load_access(self._request_token())
         else:
-            url = self._get_endpoint(admin_url=admin_url) + url
-        resp, body = self._json_request(method, url, **kwargs)
-        return resp, body
+            key = self._token_cache_key()
+            with self.token_cache.lock(key):
+                body = self.token_cache.get(key)
+                if body is not None:
+                    try:
+                        self._load_access(body, stale_token=stale_token)
+                    except exceptions.AuthorizationFailure:
+                        logger.debug("Ignoring an unusable cached token.")
+                        body = None
+                if body is None:
+                    body = self._request_token()
+                    self._load_access(body)
+                    self.token_cache.put(key, body)
+        self._schedule_refresh()
+
+    def reauthenticate(self, stale_token):
+        """ Replace `stale_token` with a new one.
+
+            Callers that find the same stale token at once wait for a
+            single request to Keystone instead of each sending their own.
+        """
+        with self._auth_lock:
+            if self.auth_token != stale_token:
+                return
+            self.authenticate(stale_token=stale_token)
+
+    def _schedule_refresh(self):
+        if not self.auto_refresh or self.auth_token_expires is None:
+            return
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+        delay = self.auth_token_expires - self.refresh_margin - time.time()
+        # Don't hammer Keystone if it hands out tokens that expire within
+        # the refresh margin.
+        delay = max(delay, self.MIN_REFRESH_INTERVAL)
+        self._refresh_timer = threading.Timer(delay,
+                                              self._refresh_in_background,
+                                              args=(self.auth_token,))
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
 
-    def authenticate(self):
+    def _refresh_in_background(self, token):
+        try:
+            self.reauthenticate(token)
+        except Exception:
+            logger.exception("Unable to refresh the token.")
+
+    def _request_token(self):
         token_url = self.auth_url + "/tokens"
         body = {'auth': {'passwordCredentials': {'username': self.username,
                                                  'password': self.password}}}
@@ -156,12 +336,22 @@ class HTTPClient(httplib2.Http):
             resp, body = self._json_request('POST', token_url, body=body)
         finally:
             self.follow_all_redirects = tmp_follow_all_redirects
+        return body
 
+    def _load_access(self, body, stale_token=None):
         try:
-            self.service_catalog = ServiceCatalog(body['access'])
-            token = self.service_catalog.get_token()
+            service_catalog = ServiceCatalog(body['access'])
+            token = service_catalog.get_token()
+            if stale_token is not None and token['id'] == stale_token:
+                raise exceptions.AuthorizationFailure()
+            self.service_catalog = service_catalog
+            self._endpoints = {}
             self.auth_token = token['id']
             self.auth_tenant_id = token['tenant_id']
-        except KeyError:
+        except (KeyError, TypeError):
             logger.exception("Parse service catalog failed.")
             raise exceptions.AuthorizationFailure()
+        try:
+            self.auth_token_expires = utils.parse_isotime(token['expires'])
+        except (KeyError, TypeError, ValueError):
+            self.auth_token_expires = None
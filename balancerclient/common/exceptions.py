@@ -42,6 +42,33 @@ class AmbiguousEndpoints(Exception):
         return "AmbiguousEndpoints: %s" % repr(self.endpoints)
 
 
+class BulkOperationError(Exception):
+    """Some items of a bulk operation failed.
+
+    :param results: Results of the items that succeeded.
+    :param errors: List of (item, exception) pairs for the failed items.
+    """
+    def __init__(self, results=None, errors=None):
+        self.results = results or []
+        self.errors = errors or []
+
+    def __str__(self):
+        return "%d of %d items failed: %s" % (
+            len(self.errors), len(self.errors) + len(self.results),
+            "; ".join("%s: %s" % (item, error)
+                      for item, error in self.errors))
+
+
+class WaitTimeout(Exception):
+    """A resource did not reach the expected state in time."""
+    pass
+
+
+class ResourceStateError(Exception):
+    """A resource went into a failure state while being waited for."""
+    pass
+
+
 class ClientException(Exception):
     """
     The base exception class for all exceptions this library raises.
@@ -0,0 +1,165 @@
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+"""
+Futures and a bounded worker pool to run API calls concurrently.
+"""
+
+import logging
+import Queue
+import sys
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class Future(object):
+    """The result of a call that runs in the background."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+
+    def done(self):
+        return self._event.is_set()
+
+    def result(self, timeout=None):
+        """Wait for the call and return its result or re-raise its error."""
+        if not self._event.wait(timeout):
+            raise RuntimeError("Timed out waiting for the result.")
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+    def exception(self, timeout=None):
+        if not self._event.wait(timeout):
+            raise RuntimeError("Timed out waiting for the result.")
+        if self._exc_info is not None:
+            return self._exc_info[1]
+
+    def add_done_callback(self, fn):
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def set_result(self, result):
+        self._result = result
+        self._finish()
+
+    def set_exception(self, exc_info):
+        self._exc_info = exc_info
+        self._finish()
+
+    def _finish(self):
+        with self._lock:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception:
+                logger.exception("Future callback failed.")
+
+
+class Executor(object):
+    """Runs callables on at most `max_workers` threads.
+
+    Worker threads are started on demand and live until `shutdown` is
+    called.
+    """
+
+    def __init__(self, max_workers=10):
+        if max_workers < 1:
+            raise ValueError("max_workers must be a positive integer.")
+        self.max_workers = max_workers
+        self._queue = Queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._idle = 0
+        self._shutdown = False
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                self._idle += 1
+            item = self._queue.get()
+            with self._lock:
+                self._idle -= 1
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                future.set_exception(sys.exc_info())
+            else:
+                future.set_result(result)
+
+    def _spawn(self):
+        with self._lock:
+            if (len(self._threads) >= self.max_workers or
+                    self._queue.qsize() <= self._idle):
+                return
+            thread = threading.Thread(target=self._worker)
+            thread.daemon = True
+            self._threads.append(thread)
+        thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule ``fn(*args, **kwargs)`` and return its `Future`."""
+        if self._shutdown:
+            raise RuntimeError("Cannot submit after shutdown.")
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        self._spawn()
+        return future
+
+    def map(self, fn, *iterables):
+        """Like the builtin `map`, but calls run concurrently."""
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return [future.result() for future in futures]
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+        for thread in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+def as_completed(futures):
+    """Yield futures in the order they finish."""
+    done = Queue.Queue()
+    futures = list(futures)
+    for future in futures:
+        future.add_done_callback(done.put)
+    for i in xrange(len(futures)):
+        yield done.get()
@@ -0,0 +1,147 @@
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+"""
+Thread-safe pool of persistent HTTP connections.
+"""
+
+import threading
+import time
+import urlparse
+
+import httplib2
+
+
+class PooledConnection(object):
+    """A keep-alive ``httplib2.Http`` object checked out of the pool."""
+
+    def __init__(self, http):
+        self.http = http
+        self.requests = 0
+        self.last_used = time.time()
+
+    def is_idle(self, idle_timeout, now=None):
+        if idle_timeout is None:
+            return False
+        if now is None:
+            now = time.time()
+        return now - self.last_used > idle_timeout
+
+    def close(self):
+        for conn in self.http.connections.values():
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self.http.connections.clear()
+
+
+class ConnectionPool(object):
+    """Hands out persistent connections to concurrent callers.
+
+    Every endpoint (scheme and authority of the URL) gets at most `size`
+    connections. Callers block until a connection for their endpoint is
+    free. Connections unused for `idle_timeout` seconds, or that have
+    served `max_requests` requests, are closed instead of being reused.
+
+    :param integer size: Number of connections per endpoint.
+    :param idle_timeout: Seconds a connection may stay idle. (optional)
+    :param max_requests: Requests served per connection before it is
+                         closed. (optional)
+    :param timeout: Socket timeout passed to ``httplib2.Http``.
+    :param insecure: Disable SSL certificate validation.
+    """
+
+    def __init__(self, size=10, idle_timeout=60, max_requests=None,
+                 timeout=None, insecure=False):
+        if size < 1:
+            raise ValueError("Pool size must be a positive integer.")
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self.insecure = insecure
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._idle = {}
+
+    @staticmethod
+    def _key(uri):
+        parts = urlparse.urlsplit(uri)
+        return (parts.scheme, parts.netloc)
+
+    def _new_connection(self):
+        http = httplib2.Http(timeout=self.timeout)
+        http.force_exception_to_status_code = True
+        http.disable_ssl_certificate_validation = self.insecure
+        return PooledConnection(http)
+
+    def _acquire(self, key):
+        with self._lock:
+            slots = self._slots.get(key)
+            if slots is None:
+                slots = self._slots[key] = threading.Semaphore(self.size)
+                self._idle[key] = []
+        slots.acquire()
+
+        now = time.time()
+        with self._lock:
+            idle = self._idle[key]
+            while idle:
+                conn = idle.pop()
+                if not conn.is_idle(self.idle_timeout, now):
+                    return conn
+                conn.close()
+        return self._new_connection()
+
+    def _release(self, key, conn):
+        try:
+            if conn is None:
+                return
+            conn.requests += 1
+            conn.last_used = time.time()
+            if self.max_requests and conn.requests >= self.max_requests:
+                conn.close()
+                return
+            with self._lock:
+                self._idle[key].append(conn)
+        finally:
+            self._slots[key].release()
+
+    def request(self, uri, method='GET', follow_all_redirects=False,
+                **kwargs):
+        """Send a request over a pooled connection.
+
+        Accepts the same arguments as ``httplib2.Http.request``.
+        """
+        key = self._key(uri)
+        conn = self._acquire(key)
+        try:
+            conn.http.follow_all_redirects = follow_all_redirects
+            return conn.http.request(uri, method, **kwargs)
+        except Exception:
+            conn.close()
+            conn = None
+            raise
+        finally:
+            self._release(key, conn)
+
+    def clear(self):
+        """Close all idle connections."""
+        with self._lock:
+            for idle in self._idle.values():
+                while idle:
+                    idle.pop().close()
@@ -0,0 +1,346 @@
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+"""
+Client-side filtering, sorting and truncation of listed resources.
+
+A filter compares resource attributes with ``==``, ``!=``, ``<``, ``<=``,
+``>``, ``>=``, ``^=`` (starts with) and ``=~`` (regular expression search)
+and combines the comparisons with ``and``, ``or``, ``not`` and
+parentheses::
+
+    weight>10 and condition==ENABLED
+    address^=10.0.1. or not (port==80 or port==443)
+
+Values compare as numbers when both sides are numbers and as strings
+otherwise. A sort is a comma-separated list of attributes, each optionally
+prefixed with ``-`` or suffixed with ``:desc`` for descending order.
+"""
+
+import heapq
+import itertools
+import operator
+import re
+
+from balancerclient.common import exceptions
+
+OPERATORS = {'==': operator.eq, '!=': operator.ne,
+             '<': operator.lt, '<=': operator.le,
+             '>': operator.gt, '>=': operator.ge}
+
+_TOKEN_RE = re.compile(r"""\s*(?:
+    (?P<paren>[()])
+  | (?P<op>==|!=|<=|>=|<|>|\^=|=~)
+  | "(?P<dquoted>(?:[^"\\]|\\.)*)"
+  | '(?P<squoted>[^']*)'
+  | (?P<word>[^\s()=!<>^~"']+)
+)""", re.VERBOSE)
+_KEYWORDS = ('and', 'or', 'not')
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if match is None:
+            raise exceptions.CommandError('Invalid filter at %r' %
+                                          text[position:].strip())
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'dquoted':
+            kind, value = 'value', re.sub(r'\\(.)', r'\1', value)
+        elif kind == 'squoted':
+            kind = 'value'
+        elif kind == 'word' and value.lower() in _KEYWORDS:
+            kind, value = 'keyword', value.lower()
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser(object):
+    """Recursive descent parser building a tree of nodes:
+    ('or', [nodes]), ('and', [nodes]), ('not', node) and
+    ('cmp', field, op, value).
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def parse(self):
+        if not self.tokens:
+            raise exceptions.CommandError('Empty filter')
+        node = self._or()
+        if self.position < len(self.tokens):
+            self._fail()
+        return node
+
+    def _fail(self):
+        if self.position < len(self.tokens):
+            found = repr(self.tokens[self.position][1])
+        else:
+            found = 'end of filter'
+        raise exceptions.CommandError('Invalid filter %r: unexpected %s' %
+                                      (self.text, found))
+
+    def _peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def _take(self, kind, value=None):
+        token = self._peek()
+        if token[0] != kind or (value is not None and token[1] != value):
+            self._fail()
+        self.position += 1
+        return token[1]
+
+    def _chain(self, keyword, operand):
+        nodes = [operand()]
+        while self._peek() == ('keyword', keyword):
+            self.position += 1
+            nodes.append(operand())
+        if len(nodes) == 1:
+            return nodes[0]
+        return (keyword, nodes)
+
+    def _or(self):
+        return self._chain('or', self._and)
+
+    def _and(self):
+        return self._chain('and', self._not)
+
+    def _not(self):
+        if self._peek() == ('keyword', 'not'):
+            self.position += 1
+            return ('not', self._not())
+        if self._peek() == ('paren', '('):
+            self.position += 1
+            node = self._or()
+            self._take('paren', ')')
+            return node
+        field = self._take('word')
+        op = self._take('op')
+        kind, value = self._peek()
+        if kind not in ('word', 'value'):
+            self._fail()
+        self.position += 1
+        return ('cmp', field, op, value)
+
+
+def _compile(node):
+    kind = node[0]
+    if kind == 'or':
+        tests = [_compile(child) for child in node[1]]
+        return lambda info: any(test(info) for test in tests)
+    if kind == 'and':
+        tests = [_compile(child) for child in node[1]]
+        return lambda info: all(test(info) for test in tests)
+    if kind == 'not':
+        test = _compile(node[1])
+        return lambda info: not test(info)
+
+    field, op, value = node[1:]
+    if op == '^=':
+        def test(info):
+            actual = info.get(field)
+            return actual is not None and unicode(actual).startswith(value)
+        return test
+    if op == '=~':
+        try:
+            search = re.compile(value).search
+        except re.error, e:
+            raise exceptions.CommandError('Invalid regular expression %r: '
+                                          '%s' % (value, e))
+        return lambda info: (info.get(field) is not None and
+                             search(unicode(info[field])) is not None)
+
+    compare = OPERATORS[op]
+    number = _number(value)
+
+    def test(info):
+        actual = info.get(field)
+        if actual is None:
+            return op == '!='
+        if number is not None:
+            actual_number = _number(actual)
+            if actual_number is not None:
+                return compare(actual_number, number)
+        return compare(unicode(actual), value)
+    return test
+
+
+def _fields(node, found):
+    if node[0] in ('or', 'and'):
+        for child in node[1]:
+            _fields(child, found)
+    elif node[0] == 'not':
+        _fields(node[1], found)
+    elif node[1] not in found:
+        found.append(node[1])
+    return found
+
+
+class Filter(object):
+    """A filter expression, parsed and compiled once.
+
+    Calling it with the attribute dict of a resource tells whether the
+    resource matches. `fields` are the attributes it reads and `equalities`
+    the non-numeric ``field==value`` comparisons every match satisfies,
+    which a server can apply as query parameters.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        tree = _Parser(text).parse()
+        self._test = _compile(tree)
+        self.fields = tuple(_fields(tree, []))
+        if tree[0] == 'and':
+            conjuncts = tree[1]
+        else:
+            conjuncts = [tree]
+        # Numbers are left out, a server comparing strings would drop
+        # e.g. weight 10 for weight==10.0.
+        self.equalities = dict((node[1], node[3]) for node in conjuncts
+                               if node[0] == 'cmp' and node[2] == '==' and
+                               _number(node[3]) is None)
+
+    def __call__(self, info):
+        return self._test(info)
+
+
+class _SortKey(object):
+    __slots__ = ('values', 'reverse')
+
+    def __init__(self, values, reverse):
+        self.values = values
+        self.reverse = reverse
+
+    def __eq__(self, other):
+        return self.values == other.values
+
+    def __ne__(self, other):
+        return self.values != other.values
+
+    def __lt__(self, other):
+        for mine, theirs, reverse in itertools.izip(self.values, other.values,
+                                                    self.reverse):
+            if mine != theirs:
+                if reverse:
+                    return theirs < mine
+                return mine < theirs
+        return False
+
+
+def _sort_value(value):
+    number = _number(value)
+    if number is not None:
+        return number
+    return value
+
+
+def parse_sort(text):
+    """Parse `text` into a list of (field, descending) pairs."""
+    keys = []
+    for key in text.split(','):
+        key = key.strip()
+        descending = False
+        if key.startswith('-'):
+            key, descending = key[1:], True
+        elif ':' in key:
+            key, direction = key.rsplit(':', 1)
+            if direction.lower() not in ('asc', 'desc'):
+                raise exceptions.CommandError('Invalid sort direction %r, '
+                                              'expecting asc or desc' %
+                                              direction)
+            descending = direction.lower() == 'desc'
+        if not key:
+            raise exceptions.CommandError('Invalid sort %r' % text)
+        keys.append((key, descending))
+    return keys
+
+
+class Query(object):
+    """Filter, sort and limit applied to a stream of resources.
+
+    :param filter: A filter expression. (optional)
+    :param sort: A sort specification. (optional)
+    :param limit: Keep at most this many resources. (optional)
+    """
+
+    def __init__(self, filter=None, sort=None, limit=None):
+        if limit is not None and limit < 0:
+            raise exceptions.CommandError('The limit must not be negative')
+        self.filter = filter and Filter(filter) or None
+        self.sort = sort and parse_sort(sort) or []
+        self.limit = limit
+
+    @property
+    def fields(self):
+        """The attributes the filter and the sort read."""
+        fields = list(self.filter and self.filter.fields or ())
+        for field, descending in self.sort:
+            if field not in fields:
+                fields.append(field)
+        return tuple(fields)
+
+    @property
+    def equalities(self):
+        return self.filter and self.filter.equalities or {}
+
+    def columns(self, fields):
+        """`fields` followed by the other attributes the query reads."""
+        return tuple(fields) + tuple(field for field in self.fields
+                                     if field not in fields)
+
+    def _key(self, resource):
+        info = resource._info
+        return _SortKey([_sort_value(info.get(field))
+                         for field, descending in self.sort],
+                        [descending for field, descending in self.sort])
+
+    def apply(self, resources):
+        """Return an iterator over the matching `resources`.
+
+        Without a sort the resources stream through. With a sort and a
+        limit only the first `limit` of them are kept in a heap, otherwise
+        they are all sorted.
+        """
+        if self.filter is not None:
+            test = self.filter
+            resources = (resource for resource in resources
+                         if test(resource._info))
+        if self.sort:
+            if self.limit is not None:
+                return iter(heapq.nsmallest(self.limit, resources,
+                                            key=self._key))
+            return iter(sorted(resources, key=self._key))
+        if self.limit is not None:
+            return itertools.islice(resources, self.limit)
+        return iter(resources)
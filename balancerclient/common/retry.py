@@ -0,0 +1,144 @@
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+"""
+Retries with exponential backoff for throttled and failed requests.
+"""
+
+import collections
+import email.utils
+import logging
+import random
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+RETRY_STATUSES = (413, 429, 500, 502, 503, 504)
+
+Attempt = collections.namedtuple('Attempt', ['method', 'url', 'attempt',
+                                             'status', 'elapsed', 'delay'])
+
+
+def backoff(initial=0.5, maximum=30, factor=2, jitter=0.5):
+    """
+    Yields an endless series of exponentially growing delays, capped at
+    `maximum`. Every delay is randomly shortened by up to `jitter` of its
+    value, so concurrent clients don't retry in lockstep.
+    """
+    delay = initial
+    while True:
+        yield delay * (1 - random.random() * jitter)
+        delay = min(delay * factor, maximum)
+
+
+def parse_retry_after(value):
+    """
+    Returns the number of seconds to wait from a Retry-After header, which
+    holds either seconds or an HTTP date, or None if it can't be parsed.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(email.utils.mktime_tz(parsed) - time.time(), 0)
+
+
+class RetryPolicy(object):
+    """Decides whether and when to resend a request.
+
+    By default only idempotent methods are retried, on throttling (413,
+    429) and server errors. The delay comes from the Retry-After header
+    when the server sends one, otherwise from exponential backoff with
+    jitter. Retries stop after `retries` attempts or once `max_time`
+    seconds would be exceeded.
+
+    Counters of attempts are kept in `metrics`, and `on_attempt` is called
+    with an :class:`Attempt` after every response.
+
+    :param integer retries: Maximum number of retries per request.
+    :param float initial_backoff: Delay before the first retry.
+    :param float max_backoff: Upper bound for a single delay.
+    :param float max_time: Upper bound for all attempts of a request.
+    :param float jitter: Fraction of each delay that is randomized.
+    :param methods: HTTP methods that may be retried.
+    :param statuses: HTTP statuses that trigger a retry.
+    :param on_attempt: Callable that receives an :class:`Attempt`.
+    """
+
+    def __init__(self, retries=3, initial_backoff=0.5, max_backoff=30,
+                 max_time=120, jitter=0.5, methods=IDEMPOTENT_METHODS,
+                 statuses=RETRY_STATUSES, on_attempt=None):
+        self.retries = retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.max_time = max_time
+        self.jitter = jitter
+        self.methods = frozenset(methods)
+        self.statuses = frozenset(statuses)
+        self.on_attempt = on_attempt
+        self.metrics = {'requests': 0, 'attempts': 0, 'retries': 0,
+                        'exhausted': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, *names):
+        with self._lock:
+            for name in names:
+                self.metrics[name] += 1
+
+    def _wants_retry(self, method, resp):
+        return method in self.methods and resp.status in self.statuses
+
+    def run(self, method, url, send):
+        """Call `send` until it returns a final (resp, body) pair."""
+        self._count('requests')
+        delays = backoff(self.initial_backoff, self.max_backoff,
+                         jitter=self.jitter)
+        start = time.time()
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_start = time.time()
+            resp, body = send()
+            now = time.time()
+            delay = None
+            if self._wants_retry(method, resp):
+                if attempt > self.retries:
+                    self._count('exhausted')
+                else:
+                    delay = parse_retry_after(resp.get('retry-after'))
+                    if delay is None:
+                        delay = next(delays)
+                    if now + delay - start > self.max_time:
+                        self._count('exhausted')
+                        delay = None
+            self._count('attempts')
+            if self.on_attempt is not None:
+                self.on_attempt(Attempt(method, url, attempt, resp.status,
+                                        now - attempt_start, delay))
+            if delay is None:
+                return resp, body
+            self._count('retries')
+            logger.debug("Retrying %s %s in %.2fs after HTTP %s.",
+                         method, url, delay, resp.status)
+            time.sleep(delay)
@@ -25,6 +25,8 @@ class ServiceCatalog(object):
 
     def __init__(self, resource_dict):
         self.catalog = resource_dict
+        self._indexes = {}
+        self._resolved = {}
 
     def get_token(self):
         """Fetch token details fron service catalog"""
@@ -38,16 +40,24 @@ class ServiceCatalog(object):
             pass
         return token
 
-    def url_for(self, attr=None, filter_value=None,
-                    service_type='loadbalancer', endpoint_type='publicURL'):
-        """Fetch an endpoint from the service catalog.
-
-        Fetch the specified endpoint from the service catalog for
-        a particular endpoint attribute. If no attribute is given, return
-        the first endpoint of the specified type.
+    def _build_index(self, service_type):
+        """Map (attr, value) and (None, None) to the first matching
+        endpoint of `service_type`, in catalog order."""
+        index = {}
+        for service in self.catalog.get('serviceCatalog', []):
+            if service.get('type') != service_type:
+                continue
+            for endpoint in service.get('endpoints', []):
+                index.setdefault((None, None), endpoint)
+                for attr, value in endpoint.iteritems():
+                    try:
+                        index.setdefault((attr, value), endpoint)
+                    except TypeError:
+                        # unhashable values are only matched by _scan()
+                        pass
+        return index
 
-        See tests for a sample service catalog.
-        """
+    def _scan(self, attr, filter_value, service_type):
         catalog = self.catalog.get('serviceCatalog', [])
 
         for service in catalog:
@@ -57,6 +67,46 @@ class ServiceCatalog(object):
             endpoints = service['endpoints']
             for endpoint in endpoints:
                 if not filter_value or endpoint.get(attr) == filter_value:
-                    return endpoint[endpoint_type]
+                    return endpoint
+
+    def _find(self, attr, filter_value, service_type):
+        if not filter_value:
+            attr = filter_value = None
+        index = self._indexes.get(service_type)
+        if index is None:
+            index = self._indexes[service_type] = \
+                self._build_index(service_type)
+        try:
+            return index.get((attr, filter_value))
+        except TypeError:
+            return self._scan(attr, filter_value, service_type)
+
+    def url_for(self, attr=None, filter_value=None,
+                    service_type='loadbalancer', endpoint_type='publicURL'):
+        """Fetch an endpoint from the service catalog.
+
+        Fetch the specified endpoint from the service catalog for
+        a particular endpoint attribute. If no attribute is given, return
+        the first endpoint of the specified type.
+
+        Endpoints of a service type are indexed on the first lookup of that
+        type and resolved URLs are remembered, so repeated lookups don't
+        walk the catalog.
 
-        raise exceptions.EndpointNotFound('Endpoint not found.')
+        See tests for a sample service catalog.
+        """
+        key = (attr, filter_value, service_type, endpoint_type)
+        try:
+            return self._resolved[key]
+        except (KeyError, TypeError):
+            pass
+
+        endpoint = self._find(attr, filter_value, service_type)
+        if endpoint is None:
+            raise exceptions.EndpointNotFound('Endpoint not found.')
+        url = endpoint[endpoint_type]
+        try:
+            self._resolved[key] = url
+        except TypeError:
+            pass
+        return url
@@ -0,0 +1,123 @@
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+"""
+On-disk cache of Keystone tokens and service catalogs.
+"""
+
+import contextlib
+import errno
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . import utils
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = '~/.balancerclient/tokens'
+
+
+class TokenCache(object):
+    """Shares Keystone tokens between clients and processes.
+
+    Every entry is the body of a `/tokens` response stored in its own file,
+    keyed by auth URL, user and tenant. Entries are handed out until
+    `expiry_margin` seconds before the token expires. Access to an entry is
+    serialized with a file lock, so parallel processes authenticate once
+    and reuse the same token.
+
+    :param string path: Directory for the cache files. (optional)
+    :param integer expiry_margin: Seconds before expiration when a cached
+                                  token is no longer used. (optional)
+    """
+
+    def __init__(self, path=None, expiry_margin=60):
+        self.path = os.path.expanduser(path or DEFAULT_PATH)
+        self.expiry_margin = expiry_margin
+
+    @staticmethod
+    def key(auth_url, username, tenant_id=None, tenant_name=None):
+        parts = [auth_url or '', username or '', tenant_id or '',
+                 tenant_name or '']
+        return hashlib.sha1('\0'.join(parts).encode('utf-8')).hexdigest()
+
+    def _filename(self, key, suffix='.json'):
+        return os.path.join(self.path, key + suffix)
+
+    def _ensure_path(self):
+        try:
+            os.makedirs(self.path, 0700)
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        """Hold an exclusive lock on the entry for `key`."""
+        self._ensure_path()
+        lock_file = open(self._filename(key, '.lock'), 'a')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+        finally:
+            lock_file.close()
+
+    def expires(self, body):
+        return utils.parse_isotime(body['access']['token']['expires'])
+
+    def get(self, key):
+        """Return the cached `/tokens` response body or None."""
+        try:
+            with open(self._filename(key)) as f:
+                body = json.load(f)
+            expires = self.expires(body)
+        except (IOError, ValueError, KeyError, TypeError):
+            return None
+        if expires - self.expiry_margin <= time.time():
+            return None
+        return body
+
+    def put(self, key, body):
+        self._ensure_path()
+        fd, tmp_name = tempfile.mkstemp(dir=self.path, prefix=key)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(body, f)
+            os.rename(tmp_name, self._filename(key))
+        except (IOError, OSError):
+            logger.exception("Unable to store the token in the cache.")
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+
+    def delete(self, key):
+        try:
+            os.unlink(self._filename(key))
+        except OSError, e:
+            if e.errno != errno.ENOENT:
+                raise
@@ -1,9 +1,11 @@
+import calendar
+import collections
+import csv
+import json
 import os
 import re
 import sys
-import uuid
 import logging
-import prettytable
 
 from . import exceptions
 
@@ -28,6 +30,15 @@ def env(*vars, **kwargs):
     return kwargs.get('default', '')
 
 
+def bool_from_string(value):
+    """Interpret a string such as an environment variable as a boolean.
+
+    Only '1', 't', 'true', 'on', 'y' and 'yes' (in any case) are true.
+    """
+    return (isinstance(value, basestring) and
+            value.strip().lower() in ('1', 't', 'true', 'on', 'y', 'yes'))
+
+
 def add_arg(f, *args, **kwargs):
     """Bind CLI arguments to a shell.py `do_foo` function."""
 
@@ -123,7 +134,69 @@ def pretty_choice_list(l):
     return ', '.join("'%s'" % i for i in l)
 
 
-def print_list(objs, fields, formatters={}, sortby_index=0):
+OUTPUT_FORMATS = ('table', 'json', 'jsonl', 'csv', 'value')
+
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def _print_rows(fields, rows, output_format):
+    """Write `rows` in a machine-readable format as they are produced."""
+    out = sys.stdout
+    if output_format == 'json':
+        out.write('[')
+        separator = '\n'
+        for row in rows:
+            out.write(separator)
+            out.write(json.dumps(collections.OrderedDict(zip(fields, row)),
+                                 default=str))
+            separator = ',\n'
+        out.write('\n]\n')
+    elif output_format == 'jsonl':
+        for row in rows:
+            out.write(json.dumps(collections.OrderedDict(zip(fields, row)),
+                                 default=str))
+            out.write('\n')
+    elif output_format == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow([_encode(value) for value in row])
+    elif output_format == 'value':
+        for row in rows:
+            out.write(' '.join(_encode(unicode(value)) for value in row))
+            out.write('\n')
+    else:
+        raise exceptions.CommandError("Unknown output format '%s'" %
+                                      (output_format,))
+
+
+def _row(o, fields, formatters):
+    row = []
+    for field in fields:
+        if field in formatters:
+            row.append(formatters[field](o))
+        elif field in (getattr(o, '_info', None) or {}):
+            # Attribute names given with --fields keep their case
+            row.append(o._info[field])
+        else:
+            field_name = field.lower().replace(' ', '_')
+            data = getattr(o, field_name, '')
+            row.append(data)
+    return row
+
+
+def print_list(objs, fields, formatters={}, sortby_index=0,
+               output_format='table'):
+    if output_format != 'table':
+        _print_rows(fields, (_row(o, fields, formatters) for o in objs),
+                    output_format)
+        return
+
+    import prettytable
     if sortby_index == None:
         sortby = None
     else:
@@ -133,72 +206,108 @@ def print_list(objs, fields, formatters={}, sortby_index=0):
     pt.align = 'l'
 
     for o in objs:
-        row = []
-        for field in fields:
-            if field in formatters:
-                row.append(formatters[field](o))
-            else:
-                field_name = field.lower().replace(' ', '_')
-                data = getattr(o, field_name, '')
-                row.append(data)
-        pt.add_row(row)
+        pt.add_row(_row(o, fields, formatters))
 
     print pt.get_string(sortby=sortby)
 
 
-def print_flat_list(lst, field):
+def print_flat_list(lst, field, output_format='table'):
+    if output_format != 'table':
+        _print_rows(field, ([el] for el in lst), output_format)
+        return
+
+    import prettytable
     pt = prettytable.PrettyTable(field)
     for el in lst:
         pt.add_row([el])
     print pt.get_string()
 
 
-def print_dict(d, property="Property"):
+def print_dict(d, property="Property", output_format='table'):
+    if output_format in ('json', 'jsonl'):
+        indent = output_format == 'json' and 2 or None
+        print json.dumps(d, indent=indent, sort_keys=True, default=str)
+        return
+    if output_format == 'value':
+        _print_rows(['Value'], ([d[key]] for key in sorted(d)),
+                    output_format)
+        return
+    if output_format != 'table':
+        _print_rows([property, 'Value'], sorted(d.iteritems()),
+                    output_format)
+        return
+
+    import prettytable
     pt = prettytable.PrettyTable([property, 'Value'], caching=False)
     pt.align = 'l'
     [pt.add_row(list(r)) for r in d.iteritems()]
     print pt.get_string(sortby=property)
 
 
-def find_resource(manager, name_or_id):
-    """Helper for the _find_* methods."""
+def find_resource(manager, name_or_id, *args):
+    """Helper for the _find_* methods.
+
+    Positional arguments are passed on to the manager before the ID, e.g.
+    the load balancer of nested resources. Names are looked up with
+    `manager.find`, which answers from an index built with one list
+    request.
+    """
     # first try to get entity as integer id
     try:
         if isinstance(name_or_id, int) or name_or_id.isdigit():
-            return manager.get(int(name_or_id))
+            return manager.get(*(args + (int(name_or_id),)))
     except exceptions.NotFound:
         pass
 
     # now try to get entity as uuid
     try:
-        uuid.UUID(str(name_or_id))
-        return manager.get(name_or_id)
-    except (ValueError, exceptions.NotFound):
+        if _is_uuid(name_or_id):
+            return manager.get(*(args + (name_or_id,)))
+    except exceptions.NotFound:
         pass
 
     try:
         try:
-            return manager.find(human_id=name_or_id)
+            return manager.find(*args, human_id=name_or_id)
         except exceptions.NotFound:
             pass
 
         # finally try to find entity by name
         try:
-            return manager.find(name=name_or_id)
+            return manager.find(*args, name=name_or_id)
         except exceptions.NotFound:
             try:
                 # Volumes does not have name, but display_name
-                return manager.find(display_name=name_or_id)
+                return manager.find(*args, display_name=name_or_id)
             except exceptions.NotFound:
-                msg = "No %s with a name or ID of '%s' exists." % \
-                    (manager.resource_class.__name__.lower(), name_or_id)
-                raise exceptions.CommandError(msg)
+                pass
     except exceptions.NoUniqueMatch:
         msg = ("Multiple %s matches found for '%s', use an ID to be more"
                " specific." % (manager.resource_class.__name__.lower(),
                                name_or_id))
         raise exceptions.CommandError(msg)
 
+    # IDs that are neither integers nor UUIDs have not been tried yet
+    try:
+        if not (isinstance(name_or_id, int) or name_or_id.isdigit() or
+                _is_uuid(name_or_id)):
+            return manager.get(*(args + (name_or_id,)))
+    except exceptions.NotFound:
+        pass
+    msg = "No %s with a name or ID of '%s' exists." % \
+        (manager.resource_class.__name__.lower(), name_or_id)
+    raise exceptions.CommandError(msg)
+
+
+def _is_uuid(value):
+    # uuid loads ctypes and libuuid, which is slow for a CLI to start with
+    import uuid
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
 
 def _format_servers_list_networks(server):
     output = []
@@ -248,6 +357,73 @@ def import_class(import_str):
     __import__(mod_str)
     return getattr(sys.modules[mod_str], class_str)
 
+_isotime_re = re.compile(r'^(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d)'
+                         r'(?::(\d\d)(?:\.\d+)?)?'
+                         r'(Z|[+-]\d\d:?\d\d)?$')
+
+
+def parse_isotime(timestr):
+    """
+    Converts an ISO 8601 timestamp, as used by Keystone for token
+    expiration, to seconds since the epoch. Timestamps without an offset
+    are treated as UTC.
+    """
+    match = _isotime_re.match(timestr.strip())
+    if match is None:
+        raise ValueError("Invalid ISO 8601 time: %r" % (timestr,))
+    year, month, day, hour, minute, second, offset = match.groups()
+    timestamp = calendar.timegm((int(year), int(month), int(day),
+                                 int(hour), int(minute), int(second or 0)))
+    if offset and offset != 'Z':
+        sign = offset[0] == '-' and -1 or 1
+        offset = offset[1:].replace(':', '')
+        timestamp -= sign * (int(offset[:2]) * 3600 + int(offset[2:]) * 60)
+    return timestamp
+
+
+_json_ws_re = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_array(text, key):
+    """
+    Yields the items of the array stored under `key` in the JSON object
+    `text` one at a time. Only the item being yielded is decoded, so large
+    collections are never held in memory as a whole.
+    """
+    decoder = json.JSONDecoder()
+
+    def skip(pos, expected=None):
+        pos = _json_ws_re.match(text, pos).end()
+        if expected is not None:
+            if text[pos:pos + 1] != expected:
+                raise ValueError("Expecting %r at %d" % (expected, pos))
+            pos = _json_ws_re.match(text, pos + 1).end()
+        return pos
+
+    pos = skip(0, '{')
+    while text[pos:pos + 1] != '}':
+        name, pos = decoder.raw_decode(text, pos)
+        pos = skip(pos, ':')
+        if name == key and text[pos:pos + 1] == '[':
+            pos = skip(pos + 1)
+            if text[pos:pos + 1] == ']':
+                return
+            while True:
+                item, pos = decoder.raw_decode(text, pos)
+                yield item
+                pos = skip(pos)
+                if text[pos:pos + 1] == ']':
+                    return
+                pos = skip(pos, ',')
+        value, pos = decoder.raw_decode(text, pos)
+        if name == key:
+            raise ValueError("%s is not an array" % key)
+        pos = skip(pos)
+        if text[pos:pos + 1] == ',':
+            pos = skip(pos + 1)
+    raise KeyError(key)
+
+
 _slugify_strip_re = re.compile(r'[^\w\s-]')
 _slugify_hyphenate_re = re.compile(r'[-\s]+')
 
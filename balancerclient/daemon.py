@@ -0,0 +1,321 @@
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+"""
+Local daemon that keeps an authenticated client, its connections and its
+caches in memory and runs `balancer` subcommands sent over a Unix socket.
+
+`balancerd` is started with the usual global options. The `balancer`
+entry point forwards commands to it while it runs and falls back to
+running them itself otherwise. Only commands without global options are
+forwarded, and only if the daemon was started with the same credentials,
+compared by an HMAC of the OS_* and SERVICE_* variables of the caller.
+
+The socket lives in a directory only the user can access, next to the
+random HMAC key. Both ends check that the other runs as the same user:
+the client checks the owner and mode of the socket, its directory and
+the key before connecting, and both check the peer credentials of the
+connection where the platform supports it.
+
+This module is imported by every `balancer` invocation, so it only
+imports what forwarding needs.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+
+# Environment variables the daemon and its callers must agree on, in the
+# order of AUTH_OPTIONS
+AUTH_ENV = ('OS_USERNAME', 'OS_PASSWORD', 'OS_TENANT_NAME', 'OS_TENANT_ID',
+            'OS_AUTH_URL', 'OS_REGION_NAME', 'SERVICE_TOKEN',
+            'SERVICE_ENDPOINT', 'OS_BALANCER_ENDPOINT_TYPE')
+AUTH_OPTIONS = ('os_username', 'os_password', 'os_tenant_name',
+                'os_tenant_id', 'os_auth_url', 'os_region_name', 'token',
+                'endpoint', 'endpoint_type')
+
+# Commands that read the terminal or stdin of the caller
+LOCAL_COMMANDS = ('batch', 'shell')
+
+
+def socket_path():
+    """Path of the daemon socket, env[BALANCERD_SOCKET] by default, or
+    balancerd.sock in a per-user directory under env[XDG_RUNTIME_DIR] or
+    the temporary directory.
+    """
+    if os.environ.get('BALANCERD_SOCKET'):
+        return os.environ['BALANCERD_SOCKET']
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        directory = os.path.join(os.environ['XDG_RUNTIME_DIR'], 'balancerd')
+    else:
+        directory = os.path.join(os.environ.get('TMPDIR') or '/tmp',
+                                 'balancerd-%d' % os.getuid())
+    return os.path.join(directory, 'balancerd.sock')
+
+
+def key_path(path):
+    """Path of the HMAC key of the daemon listening on `path`."""
+    return path + '.key'
+
+
+def _private(path, kind, mask=077):
+    """Whether `path` is a `kind` (a stat.S_IS* test) owned by the user,
+    not a symlink, and has none of the `mask` permission bits.
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return (kind(st.st_mode) and st.st_uid == os.getuid() and
+            not st.st_mode & mask)
+
+
+def _private_socket(path):
+    # Group and others may enter the directory but not change it
+    return (_private(os.path.dirname(os.path.abspath(path)), stat.S_ISDIR,
+                     022) and
+            _private(path, stat.S_ISSOCK) and
+            _private(key_path(path), stat.S_ISREG))
+
+
+def peer_uid(sock):
+    """User ID of the process at the other end of a Unix socket, or None
+    where the platform can't tell.
+    """
+    option = getattr(socket, 'SO_PEERCRED', None)
+    if option is None:
+        return None
+    pid, uid, gid = struct.unpack('3i', sock.getsockopt(
+        socket.SOL_SOCKET, option, struct.calcsize('3i')))
+    return uid
+
+
+try:
+    _compare_digest = hmac.compare_digest
+except AttributeError:
+    # Python < 2.7.7
+    def _compare_digest(a, b):
+        return len(a) == len(b) and not sum(ord(x) ^ ord(y)
+                                            for x, y in zip(a, b))
+
+
+def auth_digest(key, values):
+    """HMAC of the authentication settings, never sent in clear."""
+    return hmac.new(key, json.dumps([value or '' for value in values]),
+                    hashlib.sha256).hexdigest()
+
+
+def _recv_all(sock):
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return ''.join(chunks)
+        chunks.append(chunk)
+
+
+def forward(argv, path=None):
+    """Run `argv` in a running daemon.
+
+    Returns the exit status of the command, or None if it has to run
+    locally because no daemon is listening, the command needs the caller's
+    stdin or options, or the daemon has other credentials. Once the
+    command is sent it is never run locally, as the daemon may have run
+    it already.
+    """
+    if (not argv or argv[0].startswith('-') or argv[0] in LOCAL_COMMANDS or
+            any(arg == '-' or arg.endswith('=-') for arg in argv)):
+        return None
+    path = path or socket_path()
+    if not _private_socket(path):
+        return None
+    try:
+        with open(key_path(path)) as f:
+            key = f.read()
+    except IOError:
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(path)
+            if peer_uid(sock) not in (None, os.getuid()):
+                return None
+            request = {'argv': argv, 'cwd': os.getcwd(),
+                       'auth': auth_digest(key, (os.environ.get(name)
+                                                 for name in AUTH_ENV))}
+            sock.sendall(json.dumps(request) + '\n')
+        except socket.error:
+            return None
+        try:
+            reply = json.loads(_recv_all(sock))
+        except (socket.error, ValueError):
+            reply = None
+    finally:
+        sock.close()
+    if isinstance(reply, dict) and reply.get('refused'):
+        return None
+    if not (isinstance(reply, dict) and
+            all(key in reply for key in ('stdout', 'stderr', 'status'))):
+        print >> sys.stderr, ('ERROR: balancerd failed to answer, the '
+                              'command may or may not have run.')
+        return 1
+    sys.stdout.write(reply['stdout'].encode('utf-8'))
+    sys.stderr.write(reply['stderr'].encode('utf-8'))
+    return reply['status']
+
+
+def _text(output):
+    # json.dumps() fails on byte strings that aren't UTF-8
+    if isinstance(output, str):
+        return output.decode('utf-8', 'replace')
+    return output
+
+
+def main():
+    """The `balancer` entry point."""
+    status = forward(sys.argv[1:])
+    if status is None:
+        from balancerclient import shell
+        return shell.main()
+    return status
+
+
+def serve(argv):
+    import signal
+    import SocketServer
+    import StringIO
+
+    from balancerclient.common import exceptions
+    from balancerclient import shell
+
+    class Handler(SocketServer.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline())
+            if (peer_uid(self.connection) not in (None, os.getuid()) or
+                    not _compare_digest(str(request.get('auth')),
+                                        self.server.auth)):
+                reply = {'refused': True}
+            else:
+                reply = self.server.run(
+                    [arg.encode('utf-8') for arg in request['argv']],
+                    request['cwd'].encode('utf-8'))
+            self.wfile.write(json.dumps(reply))
+
+    class Server(SocketServer.UnixStreamServer):
+        """Runs one command at a time, its output is captured by swapping
+        sys.stdout and sys.stderr.
+        """
+        def run(self, argv, cwd):
+            stdout, stderr = sys.stdout, sys.stderr
+            sys.stdout, sys.stderr = StringIO.StringIO(), StringIO.StringIO()
+            status = 0
+            try:
+                os.chdir(cwd)
+                cli.run_command(cs, argv)
+            except SystemExit, e:
+                # argparse exits with a status, sys.exit() may be given
+                # None or a message
+                status = (isinstance(e.code, int) and e.code or
+                          int(e.code is not None))
+            except exceptions.Unauthorized:
+                print >> sys.stderr, ('ERROR: Invalid OpenStack LBaaS '
+                                      'credentials.')
+                status = 1
+            except Exception, e:
+                print >> sys.stderr, 'ERROR: %s' % (e,)
+                status = 1
+            finally:
+                output, errors = sys.stdout, sys.stderr
+                sys.stdout, sys.stderr = stdout, stderr
+            return {'stdout': _text(output.getvalue()),
+                    'stderr': _text(errors.getvalue()), 'status': status}
+
+    cli = shell.OpenStackBalancerShell()
+    parser = cli.get_base_parser()
+    parser.add_argument('--socket', metavar='<path>', default=socket_path(),
+                        help='Defaults to env[BALANCERD_SOCKET]')
+    parser.add_argument('--cache-ttl', metavar='<seconds>', type=float,
+                        help='Cache GET responses for this long')
+    options = parser.parse_args(argv)
+    if options.help:
+        parser.print_help()
+        return 0
+    cs = cli.get_client(options)
+    cli.get_session_parser(options.os_balancer_api_version)
+
+    path = options.socket
+    directory = os.path.dirname(os.path.abspath(path))
+    old_umask = os.umask(0077)
+    try:
+        if not os.path.exists(directory):
+            os.makedirs(directory, 0700)
+    finally:
+        os.umask(old_umask)
+    if not _private(directory, stat.S_ISDIR, 022):
+        raise exceptions.CommandError('%s must be a directory owned by you '
+                                      'that no one else can write to' %
+                                      directory)
+    if os.path.lexists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except socket.error:
+            # left behind by a daemon that didn't exit cleanly
+            os.unlink(path)
+        else:
+            raise exceptions.CommandError('balancerd is already running on '
+                                          '%s' % path)
+        finally:
+            probe.close()
+
+    key = os.urandom(32).encode('hex')
+    old_umask = os.umask(0077)
+    try:
+        if os.path.lexists(key_path(path)):
+            os.unlink(key_path(path))
+        fd = os.open(key_path(path), os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                     0600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(key)
+        server = Server(path, Handler)
+    finally:
+        os.umask(old_umask)
+    server.auth = auth_digest(key, (getattr(options, name)
+                                    for name in AUTH_OPTIONS))
+    try:
+        # remove the socket on SIGTERM too
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    except ValueError:
+        # not running in the main thread
+        pass
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+        os.unlink(key_path(path))
+
+
+def server_main():
+    """The `balancerd` entry point."""
+    return serve(sys.argv[1:])
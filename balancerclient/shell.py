@@ -19,9 +19,10 @@ Command-line interface to the OpenStack LBaaS API.
 """
 
 import argparse
-import httplib2
 import os
+import shlex
 import sys
+import time
 import logging
 
 from balancerclient.common import exceptions as exc
@@ -107,30 +108,72 @@ class OpenStackBalancerShell(object):
                             default=utils.env('OS_BALANCER_ENDPOINT_TYPE'),
                             help='Defaults to env[OS_BALANCER_ENDPOINT_TYPE]')
 
-        return parser
+        parser.add_argument('--os_cache',
+                            default=utils.bool_from_string(
+                                utils.env('OS_CACHE')),
+                            action='store_true',
+                            help='Reuse Keystone tokens between invocations. '
+                                 'Defaults to env[OS_CACHE]')
+
+        parser.add_argument('--retries',
+                            metavar='<retries>',
+                            type=int,
+                            default=utils.env('OS_BALANCER_RETRIES',
+                                              default=0),
+                            help='Retry throttled and failed idempotent '
+                                 'requests. Defaults to '
+                                 'env[OS_BALANCER_RETRIES] or 0')
+
+        parser.add_argument('--server_fields',
+                            default=utils.bool_from_string(utils.env(
+                                'OS_BALANCER_SERVER_FIELDS')),
+                            action='store_true',
+                            help='Ask the server for the listed fields only. '
+                                 'Defaults to env[OS_BALANCER_SERVER_FIELDS]')
 
-    def get_subcommand_parser(self, version):
-        parser = self.get_base_parser()
+        parser.add_argument('--server_filters',
+                            default=utils.bool_from_string(utils.env(
+                                'OS_BALANCER_SERVER_FILTERS')),
+                            action='store_true',
+                            help='Send the == comparisons of --filter to the '
+                                 'server as query parameters. Defaults to '
+                                 'env[OS_BALANCER_SERVER_FILTERS]')
 
-        self.subcommands = {}
-        subparsers = parser.add_subparsers(metavar='<subcommand>')
+        return parser
 
+    def get_actions_module(self, version):
         try:
-            actions_module = {
+            return {
                 '1': shell_v1,
             }[version]
         except KeyError:
-            actions_module = shell_v1
+            return shell_v1
 
-        self._find_actions(subparsers, actions_module)
-        self._find_actions(subparsers, self)
+    def get_subcommand_parser(self, version, commands=None, parser=None):
+        """Add the subcommands to `parser`, or to a new base parser.
+
+        Only the subcommands named in `commands` are added if it is given,
+        building the parsers of all of them takes a good share of the
+        startup time.
+        """
+        if parser is None:
+            parser = self.get_base_parser()
+
+        self.subcommands = {}
+        subparsers = parser.add_subparsers(metavar='<subcommand>')
+
+        actions_module = self.get_actions_module(version)
+        self._find_actions(subparsers, actions_module, commands)
+        self._find_actions(subparsers, self, commands)
 
         return parser
 
-    def _find_actions(self, subparsers, actions_module):
+    def _find_actions(self, subparsers, actions_module, commands=None):
         for attr in (a for a in dir(actions_module) if a.startswith('do_')):
             # I prefer to be hypen-separated instead of underscores.
             command = attr[3:].replace('_', '-')
+            if commands is not None and command not in commands:
+                continue
             callback = getattr(actions_module, attr)
             desc = callback.__doc__ or ''
             help = desc.strip().split('\n')[0]
@@ -149,14 +192,37 @@ class OpenStackBalancerShell(object):
                 subparser.add_argument(*args, **kwargs)
             subparser.set_defaults(func=callback)
 
+    def _selected_commands(self, version, args):
+        """Return the subcommands named on the command line, or None when
+        all of them are needed to show the help or an error.
+        """
+        if not args or args[0].startswith('-'):
+            return None
+        commands = args[:1]
+        if commands == ['help']:
+            if len(args) < 2:
+                return None
+            commands.append(args[1])
+        actions_module = self.get_actions_module(version)
+        for command in commands:
+            attr = 'do_' + command.replace('-', '_')
+            if not (hasattr(actions_module, attr) or hasattr(self, attr)):
+                return None
+        return commands
+
     def main(self, argv):
-        # Parse args once to find version
+        # Parse args once to find version and subcommand
         parser = self.get_base_parser()
         (options, args) = parser.parse_known_args(argv)
 
-        # build available subcommands based on version
+        # build the selected subcommand based on version
         api_version = options.os_balancer_api_version
-        subcommand_parser = self.get_subcommand_parser(api_version)
+        if not argv or options.help:
+            commands = None
+        else:
+            commands = self._selected_commands(api_version, args)
+        subcommand_parser = self.get_subcommand_parser(api_version, commands,
+                                                       parser=parser)
         self.parser = subcommand_parser
 
         # Handle top-level --help/-h before attempting to parse
@@ -170,6 +236,7 @@ class OpenStackBalancerShell(object):
 
         # Deal with global arguments
         if args.debug:
+            import httplib2
             httplib2.debuglevel = 1
 
         # Short-circuit and deal with help command right away.
@@ -177,10 +244,25 @@ class OpenStackBalancerShell(object):
             self.do_help(args)
             return 0
 
+        self.cs = self.get_client(args)
+
+        try:
+            args.func(self.cs, args)
+        except exc.Unauthorized:
+            raise exc.CommandError("Invalid OpenStack LBaaS credentials.")
+        except exc.AuthorizationFailure:
+            raise exc.CommandError("Unable to authorize user")
+
+    def get_client(self, args):
+        """Check the authentication options in `args` and build the API
+        client for them.
+        """
         #FIXME(usrleon): Here should be restrict for project id same as
         # for username or apikey but for compatibility it is not.
 
-        if not utils.isunauthenticated(args.func):
+        unauthenticated = utils.isunauthenticated(getattr(args, 'func',
+                                                          None))
+        if not unauthenticated:
             # if the user hasn't provided any auth data
             if not (args.token or args.endpoint or args.os_username or
                     args.os_password or args.os_auth_url):
@@ -224,16 +306,25 @@ class OpenStackBalancerShell(object):
                         'Expecting an auth URL via either --os_auth_url or '
                         'env[OS_AUTH_URL]')
 
-        if utils.isunauthenticated(args.func):
-            self.cs = shell_v1.CLIENT_CLASS(endpoint=args.os_auth_url)
+        api_version = args.os_balancer_api_version
+        if unauthenticated:
+            return self.get_api_class(api_version)(endpoint=args.os_auth_url)
         else:
+            from balancerclient.common import retry
+            from balancerclient.common import token_cache
+
             token = None
             endpoint = None
             if args.token and args.endpoint:
                 token = args.token
                 endpoint = args.endpoint
-            api_version = options.os_balancer_api_version
-            self.cs = self.get_api_class(api_version)(
+            cache = None
+            if args.os_cache and not endpoint:
+                cache = token_cache.TokenCache()
+            retry_policy = None
+            if args.retries:
+                retry_policy = retry.RetryPolicy(retries=args.retries)
+            return self.get_api_class(api_version)(
                 username=args.os_username,
                 tenant_name=args.os_tenant_name,
                 tenant_id=args.os_tenant_id,
@@ -242,22 +333,20 @@ class OpenStackBalancerShell(object):
                 endpoint_type=args.endpoint_type,
                 password=args.os_password,
                 auth_url=args.os_auth_url,
-                region_name=args.os_region_name)
-
-        try:
-            args.func(self.cs, args)
-        except exc.Unauthorized:
-            raise exc.CommandError("Invalid OpenStack LBaaS credentials.")
-        except exc.AuthorizationFailure:
-            raise exc.CommandError("Unable to authorize user")
+                region_name=args.os_region_name,
+                token_cache=cache,
+                retry_policy=retry_policy,
+                cache_ttl=getattr(args, 'cache_ttl', None),
+                server_fields=args.server_fields,
+                server_filters=args.server_filters)
 
     def get_api_class(self, version):
         try:
             return {
-                "1": shell_v1.CLIENT_CLASS,
-            }[version]
+                "1": shell_v1.get_client_class,
+            }[version]()
         except KeyError:
-            return shell_v1.CLIENT_CLASS
+            return shell_v1.get_client_class()
 
     @utils.arg('command', metavar='<subcommand>', nargs='?',
                           help='Display help for <subcommand>')
@@ -274,6 +363,110 @@ class OpenStackBalancerShell(object):
         else:
             self.parser.print_help()
 
+    def get_session_parser(self, version):
+        """Return a parser for the subcommands run within a session,
+        without the global options.
+        """
+        parser = argparse.ArgumentParser(
+            prog='balancer', add_help=False,
+            formatter_class=OpenStackHelpFormatter)
+        self.parser = self.get_subcommand_parser(version, parser=parser)
+        return self.parser
+
+    def run_command(self, cs, argv):
+        """Run one subcommand of a session with client `cs`."""
+        if argv and argv[0] in ('batch', 'shell'):
+            raise exc.CommandError("'%s' can't be nested" % argv[0])
+        args = self.parser.parse_args(argv)
+        if args.func == self.do_help:
+            self.do_help(args)
+        else:
+            args.func(cs, args)
+
+    def _run_session(self, cs, lines, version, stop_on_error=False):
+        """Run the subcommands in `lines`, one per line, with client `cs`.
+
+        Every command reuses the client, so the session authenticates once
+        and keeps its connections and caches. The time taken by each
+        command is reported on stderr.
+
+        Returns the number of commands run and the number that failed.
+        """
+        self.get_session_parser(version)
+        count = failed = 0
+        started = time.time()
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line in ('exit', 'quit'):
+                break
+            count += 1
+            start = time.time()
+            try:
+                self.run_command(cs, shlex.split(line))
+            except SystemExit:
+                # argparse already printed the usage error
+                failed += 1
+            except Exception, e:
+                print >> sys.stderr, 'ERROR: %s' % (e,)
+                failed += 1
+            sys.stdout.flush()
+            print >> sys.stderr, '[%d] %s: %.3f s' % (number, line,
+                                                       time.time() - start)
+            if failed and stop_on_error:
+                break
+        print >> sys.stderr, '%d commands in %.3f s, %d failed.' % (
+            count, time.time() - started, failed)
+        return count, failed
+
+    @utils.arg('file', metavar='<file>',
+               help='File with one subcommand per line ("-" for stdin)')
+    @utils.arg('--keep-going', action='store_true', default=False,
+               help='Run the remaining commands after a command fails')
+    @utils.arg('--cache-ttl', metavar='<seconds>', type=float,
+               help='Cache GET responses for this long within the batch')
+    def do_batch(self, cs, args):
+        """
+        Run subcommands from a file in one authenticated session.
+        """
+        if args.file == '-':
+            lines = sys.stdin
+        else:
+            lines = open(args.file)
+        try:
+            count, failed = self._run_session(
+                cs, lines, args.os_balancer_api_version,
+                stop_on_error=not args.keep_going)
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+        if failed:
+            raise exc.CommandError('%d of %d commands failed.' % (failed,
+                                                                  count))
+
+    @utils.arg('--cache-ttl', metavar='<seconds>', type=float,
+               help='Cache GET responses for this long within the session')
+    def do_shell(self, cs, args):
+        """
+        Read subcommands interactively and run them in one authenticated
+        session.
+        """
+        try:
+            # Line editing and history for raw_input()
+            import readline
+        except ImportError:
+            pass
+
+        def read_lines():
+            while True:
+                try:
+                    yield raw_input('balancer> ')
+                except EOFError:
+                    print
+                    return
+        self._run_session(cs, read_lines(), args.os_balancer_api_version)
+
 
 # I'm picky about my shell help.
 class OpenStackHelpFormatter(argparse.HelpFormatter):
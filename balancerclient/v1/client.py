@@ -15,12 +15,16 @@
 #
 # vim: tabstop=4 shiftwidth=4 softtabstop=4
 
+from balancerclient.common import base
+from balancerclient.common import cache
 from balancerclient.common import client
+from balancerclient.common import executor
 from . import devices
 from . import loadbalancers
 from . import nodes
 from . import probes
 from . import stickies
+from . import topology
 from . import vips
 
 
@@ -32,13 +36,98 @@ class Client(object):
     :param string token: Token for authentication.
     :param integer timeout: Allows customization of the timeout for client
                             http requests. (optional)
+    :param integer pool_size: Number of persistent connections per endpoint
+                              shared by concurrent callers. (optional)
+    :param integer pool_idle_timeout: Seconds an unused pooled connection
+                                      is kept open. (optional)
+    :param integer pool_max_requests: Requests served by a pooled
+                                      connection before it is recycled.
+                                      (optional)
+    :param token_cache: A ``TokenCache`` that shares tokens between
+                        clients and processes. (optional)
+    :param bool auto_refresh: Refresh the token in the background before
+                              it expires. (optional)
+    :param integer refresh_margin: Seconds before expiration when the
+                                   token is refreshed. (optional)
+    :param retry_policy: A ``RetryPolicy`` for throttled and failed
+                         requests. (optional)
+    :param bool conditional_get: Revalidate repeated GET requests with
+                                 ETag/Last-Modified and reuse the decoded
+                                 body and resources when the server
+                                 answers 304. (optional)
+    :param float cache_ttl: Cache GET responses in the managers for this
+                            many seconds. Writes invalidate the cached
+                            responses they affect. (optional)
+    :param integer cache_size: Maximum number of cached responses.
+                               (optional)
+    :param bool compact: Keep only the raw attribute dict in resources and
+                         look attributes up in it on access, which roughly
+                         halves the memory used by large lists. (optional)
+    :param bool server_fields: The server accepts the `fields` query
+                               parameter, send it when listing only some
+                               fields. (optional)
+    :param bool server_filters: The server filters listings by attribute
+                                query parameters, send the equalities of
+                                filter expressions. (optional)
     """
 
-    def __init__(self, **kwargs):
+    def __init__(self, cache_ttl=None, cache_size=1000, compact=False,
+                 server_fields=False, server_filters=False, **kwargs):
         self.client = client.HTTPClient(**kwargs)
-        self.devices = devices.DeviceManager(self)
-        self.loadbalancers = loadbalancers.LoadBalancerManager(self)
-        self.nodes = nodes.NodeManager(self)
-        self.probes = probes.ProbeManager(self)
-        self.stickies = stickies.StickyManager(self)
-        self.vips = vips.VIPManager(self)
+        if cache_ttl:
+            self.response_cache = cache.ResponseCache(ttl=cache_ttl,
+                                                      size=cache_size)
+        else:
+            self.response_cache = None
+        options = {'cache': self.response_cache, 'compact': compact,
+                   'server_fields': server_fields,
+                   'server_filters': server_filters}
+        self.devices = devices.DeviceManager(self, **options)
+        self.loadbalancers = loadbalancers.LoadBalancerManager(self,
+                                                               **options)
+        self.nodes = nodes.NodeManager(self, **options)
+        self.probes = probes.ProbeManager(self, **options)
+        self.stickies = stickies.StickyManager(self, **options)
+        self.vips = vips.VIPManager(self, **options)
+
+    def iter_snapshot(self, lbs=None, concurrency=10):
+        """Yield the topology of each load balancer in `lbs` (all by
+        default) as it completes, fetching up to `concurrency` resources
+        at a time.
+        """
+        return topology.iter_snapshot(self, lbs, concurrency)
+
+    def snapshot(self, lbs=None, concurrency=10):
+        """Return an immutable tuple of load balancer topologies."""
+        return topology.snapshot(self, lbs, concurrency)
+
+
+class AsyncClient(object):
+    """Non-blocking client for the OpenStack LBaaS v1 API.
+
+    Has the same managers as :class:`Client`, but every manager call
+    returns a :class:`balancerclient.common.executor.Future` right away.
+    Calls run on a pool of `max_workers` threads that share one
+    authenticated session and a pool of persistent connections.
+
+    :param integer max_workers: Number of calls allowed in flight.
+    :param kwargs: Arguments accepted by :class:`Client`.
+    """
+
+    def __init__(self, max_workers=10, **kwargs):
+        kwargs.setdefault('pool_size', max_workers)
+        self.sync = Client(**kwargs)
+        self.client = self.sync.client
+        self.executor = executor.Executor(max_workers)
+        self.devices = base.AsyncManager(self.sync.devices, self.executor)
+        self.loadbalancers = base.AsyncManager(self.sync.loadbalancers,
+                                               self.executor)
+        self.nodes = base.AsyncManager(self.sync.nodes, self.executor)
+        self.probes = base.AsyncManager(self.sync.probes, self.executor)
+        self.stickies = base.AsyncManager(self.sync.stickies, self.executor)
+        self.vips = base.AsyncManager(self.sync.vips, self.executor)
+
+    def close(self):
+        self.executor.shutdown()
+        if self.client.pool is not None:
+            self.client.pool.clear()
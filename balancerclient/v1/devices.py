@@ -32,6 +32,10 @@ class DeviceManager(base.Manager):
     def list(self):
         return self._list('/devices', 'devices')
 
+    def iter_list(self, page_size=None, fields=None, filters=None):
+        return self._iter_list('/devices', 'devices', page_size=page_size,
+                               fields=fields, filters=filters)
+
     def create(self, name, type, version, ip, port, user, password, **extra):
         body = {'name': name,
                 'type': type,
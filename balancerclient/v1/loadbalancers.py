@@ -27,10 +27,16 @@ class LoadBalancer(base.Resource):
 
 class LoadBalancerManager(base.Manager):
     resource_class = LoadBalancer
+    invalidates = ('/loadbalancers/find_for_VM',)
 
     def list(self):
         return self._list('/loadbalancers', 'loadbalancers')
 
+    def iter_list(self, page_size=None, fields=None, filters=None):
+        return self._iter_list('/loadbalancers', 'loadbalancers',
+                               page_size=page_size, fields=fields,
+                               filters=filters)
+
     def create(self, name, algorithm, protocol,
                **extra):
         body = {'name': name,
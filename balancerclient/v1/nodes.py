@@ -16,6 +16,12 @@
 # vim: tabstop=4 shiftwidth=4 softtabstop=4
 
 from balancerclient.common import base
+from balancerclient.common import exceptions
+
+# Statuses of a server that doesn't accept several nodes per request. A
+# missing load balancer or throttling would fail, or get worse, one node
+# at a time too.
+BULK_REFUSED = (400, 405, 501)
 
 
 class Node(base.Resource):
@@ -27,6 +33,8 @@ class Node(base.Resource):
 
 class NodeManager(base.Manager):
     resource_class = Node
+    nested = True
+    invalidates = ('/loadbalancers/find_for_VM',)
 
     def create(self, lb, name, type, address, port, weight, condition,
                **extra):
@@ -37,11 +45,55 @@ class NodeManager(base.Manager):
                 'weight': weight,
                 'condition': condition}
         node.update(extra)
-        body = {'nodes': [node]}
-        # XXX(akscram): create only one node at one time
-        nodes_raw = self._create("/loadbalancers/%s/nodes" % (base.getid(lb),),
-                                 body, 'nodes', return_raw=True)
-        return self.resource_class(self, nodes_raw[0])
+        return self._create_one(lb, node)
+
+    def _create_one(self, lb, node):
+        url = "/loadbalancers/%s/nodes" % (base.getid(lb),)
+        nodes_raw = self._create(url, {'nodes': [node]}, 'nodes',
+                                 return_raw=True)
+        return self._set_parent(url, self.resource_class(self, nodes_raw[0]))
+
+    def create_many(self, lb, nodes, chunk_size=50, concurrency=10):
+        """Create many nodes sending up to `chunk_size` nodes per request.
+
+        If the server refuses a chunk with 400, 405 or 501, its nodes are
+        created one at a time on up to `concurrency` threads, and so are the
+        nodes missing from its answer, as some servers only create the
+        first node of a request. Other errors are raised. Returns the
+        created nodes in order; if some of them could not be created
+        BulkOperationError is raised with the created nodes and a
+        (node, exception) pair per failure.
+
+        :param lb: Load balancer or its ID.
+        :param nodes: List of dicts with the attributes of `create`.
+        """
+        url = "/loadbalancers/%s/nodes" % (base.getid(lb),)
+        created, errors = [], []
+        for start in xrange(0, len(nodes), chunk_size):
+            chunk = nodes[start:start + chunk_size]
+            try:
+                nodes_raw = self._create(url, {'nodes': chunk}, 'nodes',
+                                         return_raw=True) or []
+            except exceptions.ClientException, e:
+                if e.code not in BULK_REFUSED:
+                    raise
+                nodes_raw = []
+            nodes_raw = nodes_raw[:len(chunk)]
+            created.extend(self._set_parent(url, self.resource_class(
+                self, node_raw)) for node_raw in nodes_raw)
+            missing = chunk[len(nodes_raw):]
+            if not missing:
+                continue
+            try:
+                created.extend(self._bulk(
+                    lambda node: self._create_one(lb, node), missing,
+                    concurrency=concurrency))
+            except exceptions.BulkOperationError, e:
+                created.extend(e.results)
+                errors.extend(e.errors)
+        if errors:
+            raise exceptions.BulkOperationError(created, errors)
+        return created
 
     def update(self, lb, node,
                name=None, type=None, address=None, port=None, weight=None,
@@ -68,14 +120,112 @@ class NodeManager(base.Manager):
                          'node')
 
     def update_condition(self, lb, node, condition):
+        # The condition is in the URL, the request has no body
         return self._update("/loadbalancers/%s/nodes/%s/%s" %
                                 (base.getid(lb), base.getid(node), condition),
-                            'loadbalancers')
+                            None, 'node')
+
+    def rolling_condition(self, lb, nodes, condition, batch_size=10,
+                          max_in_flight=10, status=None,
+                          failure_statuses=('ERROR',), max_failures=0,
+                          timeout=600, poll_interval=1, max_poll_interval=30,
+                          on_batch=None):
+        """Change the condition of many nodes batch by batch.
+
+        The condition of the nodes of a batch is changed with up to
+        `max_in_flight` requests at once, then their state is polled with a
+        single list request per round until all of them report the new
+        condition, or `status` if it is given. Polling backs off from
+        `poll_interval` to `max_poll_interval` while nothing changes. The
+        next batch starts when the previous one is done.
+
+        A node fails if its request fails, if its status becomes one of
+        `failure_statuses`, or if it doesn't settle within `timeout`
+        seconds. Once more than `max_failures` nodes failed (a number, or a
+        fraction of all nodes if below 1) the remaining batches are not
+        started. BulkOperationError is raised with the settled nodes and a
+        (node, exception) pair per failure if any node failed.
+
+        :param on_batch: Called with the batch number, the settled nodes
+                         and the failures of the batch after each batch.
+        """
+        nodes = list(nodes)
+        if 0 < max_failures < 1:
+            max_failures = int(max_failures * len(nodes))
+
+        def fetch(pending):
+            return self._refresh(pending, lb)
+
+        def ready(node):
+            if status is not None:
+                return node._info.get('status') == status
+            return node._info.get('condition') == condition
+
+        def failed(node):
+            return node._info.get('status') in failure_statuses
+
+        settled, errors = [], []
+        for number, start in enumerate(xrange(0, len(nodes), batch_size)):
+            batch = nodes[start:start + batch_size]
+            batch_errors = []
+            try:
+                self._bulk(lambda node: self.update_condition(lb, node,
+                                                              condition),
+                           batch, concurrency=max_in_flight)
+            except exceptions.BulkOperationError, e:
+                batch_errors.extend(e.errors)
+                failed_ids = set(base.getid(node) for node, _ in e.errors)
+                batch = [node for node in batch
+                         if base.getid(node) not in failed_ids]
+            done, poll_errors = self._poll(batch, fetch, ready, failed,
+                                           timeout=timeout,
+                                           initial=poll_interval,
+                                           maximum=max_poll_interval)
+            batch_errors.extend(poll_errors)
+            settled.extend(done)
+            errors.extend(batch_errors)
+            if on_batch is not None:
+                on_batch(number + 1, done, batch_errors)
+            if len(errors) > max_failures:
+                break
+        if errors:
+            raise exceptions.BulkOperationError(settled, errors)
+        return settled
 
     def delete(self, lb, node):
         self._delete("/loadbalancers/%s/nodes/%s" % (base.getid(lb),
                                                      base.getid(node)))
 
+    def delete_many(self, lb, nodes, concurrency=10):
+        """Delete nodes on up to `concurrency` threads.
+
+        Returns the IDs of the deleted nodes. If some nodes could not be
+        deleted BulkOperationError is raised with the deleted IDs and a
+        (node, exception) pair per failure.
+        """
+        def delete(node):
+            self.delete(lb, node)
+            return base.getid(node)
+        return self._bulk(delete, nodes, concurrency=concurrency)
+
+    def update_many(self, lb, changes, concurrency=10):
+        """Update nodes on up to `concurrency` threads.
+
+        :param changes: Dict mapping a node or its ID to a dict of keyword
+                        arguments for `update`.
+
+        Returns the updated nodes. If some nodes could not be updated
+        BulkOperationError is raised with the updated nodes and a
+        (node, exception) pair per failure.
+        """
+        return self._bulk(lambda node: self.update(lb, node, **changes[node]),
+                          changes, concurrency=concurrency)
+
     def list(self, lb):
         return self._list("/loadbalancers/%s/nodes" % (base.getid(lb),),
                           'nodes')
+
+    def iter_list(self, lb, page_size=None, fields=None, filters=None):
+        return self._iter_list("/loadbalancers/%s/nodes" % (base.getid(lb),),
+                               'nodes', page_size=page_size, fields=fields,
+                               filters=filters)
@@ -27,6 +27,7 @@ class Probe(base.Resource):
 
 class ProbeManager(base.Manager):
     resource_class = Probe
+    nested = True
 
     def create(self, lb, name, type, **extra):
         probe = {'name': name,
@@ -50,3 +51,9 @@ class ProbeManager(base.Manager):
         return self._list("/loadbalancers/%s/healthMonitoring" %
                               (base.getid(lb),),
                           'healthMonitoring')
+
+    def iter_list(self, lb, page_size=None, fields=None, filters=None):
+        return self._iter_list("/loadbalancers/%s/healthMonitoring" %
+                                   (base.getid(lb),),
+                               'healthMonitoring', page_size=page_size,
+                               fields=fields, filters=filters)
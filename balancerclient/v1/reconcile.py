@@ -0,0 +1,272 @@
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+"""
+Bring load balancers to a desired state described as a document like::
+
+    {"loadbalancers": [
+        {"name": "web",
+         "algorithm": "ROUNDROBIN",
+         "nodes": [{"name": "web1", "type": "HW", "address": "10.0.0.1",
+                    "port": 80, "weight": 10, "condition": "ENABLED"}],
+         "probes": [{"name": "ping", "type": "ICMP"}],
+         "vips": [{"name": "vip", "address": "10.0.1.1",
+                   "mask": "255.255.255.255", "port": 80}]}]}
+
+Load balancers are looked up by "id" or "name" and must exist, and only
+their "name", "algorithm" and "protocol" can be set. Nodes, probes and
+VIPs are only managed for the lists present in the document. Items are
+matched to existing resources by address and port when the item has an
+address, by address alone when it has no port, and by name otherwise.
+"""
+
+import collections
+import json
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from balancerclient.common import base
+from balancerclient.common import exceptions
+from balancerclient.common import executor
+from balancerclient.v1 import topology
+
+
+MANAGED = ('nodes', 'probes', 'vips')
+LB_ATTRIBUTES = ('name', 'algorithm', 'protocol')
+
+# Nodes created in one request by NodeManager.create_many
+NODE_CHUNK_SIZE = 50
+
+
+Action = collections.namedtuple('Action', ['op', 'kind', 'lb', 'target',
+                                           'body'])
+
+
+def load_state(text):
+    """Parse a desired state document in JSON or, if PyYAML is available,
+    YAML.
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        if yaml is None:
+            raise exceptions.CommandError(
+                "The desired state is not valid JSON and PyYAML is not "
+                "installed to read YAML.")
+        return yaml.safe_load(text)
+
+
+def _same(current, desired):
+    return current == desired or unicode(current) == unicode(desired)
+
+
+def _changes(current, desired, ignore=('id',)):
+    return dict((key, value) for key, value in desired.iteritems()
+                if key not in ignore and not _same(current.get(key), value))
+
+
+def _key(info):
+    if info.get('address') is not None:
+        if info.get('port') is None:
+            return ('address', unicode(info['address']))
+        return ('address', unicode(info['address']), unicode(info['port']))
+    return ('name', info.get('name'))
+
+
+def _pop_match(existing, item):
+    """Remove and return the resource of `existing` that `item` describes,
+    or None. An item with an address but no port matches any port.
+    """
+    key = _key(item)
+    if key[0] == 'address' and len(key) == 2:
+        for other in existing:
+            if other[:2] == key:
+                return existing.pop(other)
+    return existing.pop(key, None)
+
+
+class Plan(object):
+    """Changes needed to bring load balancers to the desired state.
+
+    Creations run first, then updates and condition changes, then
+    deletions, each phase only after the previous one succeeded, so that
+    new nodes take traffic before the old ones are drained or go away.
+    """
+
+    def __init__(self, actions=()):
+        self.actions = list(actions)
+
+    def __iter__(self):
+        return iter(self.actions)
+
+    def __len__(self):
+        return len(self.actions)
+
+    def phases(self):
+        creates = [a for a in self.actions if a.op == 'create']
+        changes = [a for a in self.actions
+                   if a.op not in ('create', 'delete')]
+        deletes = [a for a in self.actions if a.op == 'delete']
+        return [phase for phase in (creates, changes, deletes) if phase]
+
+    @property
+    def calls(self):
+        """Number of API calls needed to carry out the plan."""
+        calls = 0
+        for action in self.actions:
+            if action.op == 'create' and action.kind == 'nodes':
+                calls += -(-len(action.body) // NODE_CHUNK_SIZE)
+            else:
+                calls += 1
+        return calls
+
+    def describe(self):
+        """Yield a line of text per action."""
+        for action in self.actions:
+            lb_id = base.getid(action.lb)
+            if action.op == 'create' and action.kind == 'nodes':
+                yield 'loadbalancer %s: create %d nodes' % (lb_id,
+                                                            len(action.body))
+            elif action.op == 'create':
+                yield 'loadbalancer %s: create %s %s' % (
+                    lb_id, action.kind, json.dumps(action.body,
+                                                   sort_keys=True))
+            elif action.target is None:
+                yield 'loadbalancer %s: update %s' % (
+                    lb_id, json.dumps(action.body, sort_keys=True))
+            elif action.op == 'delete':
+                yield 'loadbalancer %s: delete %s %s' % (
+                    lb_id, action.kind, base.getid(action.target))
+            else:
+                yield 'loadbalancer %s: %s %s %s %s' % (
+                    lb_id, action.op, action.kind, base.getid(action.target),
+                    json.dumps(action.body, sort_keys=True))
+
+
+def _diff(topo, spec):
+    lb = topo.loadbalancer
+    lb_changes = _changes(lb._info, spec, ignore=('id',) + MANAGED)
+    if lb_changes:
+        yield Action('update', 'loadbalancers', lb, None, lb_changes)
+    for kind in MANAGED:
+        if kind not in spec:
+            continue
+        existing = collections.OrderedDict((_key(res._info), res)
+                                           for res in getattr(topo, kind))
+        new = []
+        for item in spec[kind] or []:
+            current = _pop_match(existing, item)
+            if current is None:
+                new.append(item)
+                continue
+            changes = _changes(current._info, item)
+            condition = changes.pop('condition', None)
+            if changes and kind == 'probes':
+                # Probes can't be updated, replace them
+                new.append(item)
+                existing[('replaced', current.id)] = current
+                continue
+            if changes:
+                yield Action('update', kind, lb, current, changes)
+            if condition is not None and kind == 'nodes':
+                yield Action('condition', kind, lb, current,
+                             {'condition': condition})
+        if new and kind == 'nodes':
+            yield Action('create', kind, lb, None, new)
+        else:
+            for item in new:
+                yield Action('create', kind, lb, None, item)
+        for current in existing.itervalues():
+            yield Action('delete', kind, lb, current, None)
+
+
+def plan(api, desired, concurrency=10):
+    """Compare the desired state with the current one and return a
+    :class:`Plan`. The current state is fetched with `concurrency`
+    requests in flight.
+    """
+    specs = desired.get('loadbalancers') or []
+    by_name = None
+    lbs = []
+    for spec in specs:
+        unknown = sorted(key for key in spec
+                         if key not in ('id',) + LB_ATTRIBUTES + MANAGED)
+        if unknown:
+            raise exceptions.CommandError(
+                "Unknown load balancer attributes in the desired state: %s" %
+                ', '.join(unknown))
+    for spec in specs:
+        if 'id' in spec:
+            lbs.append(spec['id'])
+            continue
+        if by_name is None:
+            by_name = dict((lb.name, lb) for lb in api.loadbalancers.list())
+        try:
+            lbs.append(by_name[spec.get('name')])
+        except KeyError:
+            raise exceptions.NotFound(404, "LoadBalancer %s not found" %
+                                      spec.get('name'))
+    actions = []
+    for topo, spec in zip(topology.snapshot(api, lbs, concurrency), specs):
+        actions.extend(_diff(topo, spec))
+    return Plan(actions)
+
+
+def _execute(api, action):
+    if action.kind == 'loadbalancers':
+        return api.loadbalancers.update(action.lb, **action.body)
+    manager = getattr(api, action.kind)
+    if action.op == 'create' and action.kind == 'nodes':
+        return manager.create_many(action.lb, action.body,
+                                   chunk_size=NODE_CHUNK_SIZE)
+    if action.op == 'create':
+        return manager.create(action.lb, **action.body)
+    if action.op == 'condition':
+        return manager.update_condition(action.lb, action.target,
+                                        action.body['condition'])
+    if action.op == 'update':
+        return manager.update(action.lb, action.target, **action.body)
+    return manager.delete(action.lb, action.target)
+
+
+def apply(api, plan, concurrency=10):
+    """Carry out a :class:`Plan` with up to `concurrency` calls in flight.
+
+    Returns the results of the actions in order. If an action fails
+    BulkOperationError is raised with the results of the actions that
+    succeeded and an (action, exception) pair per failure; the deletions
+    are not attempted if a creation or an update failed.
+    """
+    api.client.ensure_pool(concurrency)
+    results, errors = [], []
+    with executor.Executor(concurrency) as pool:
+        for phase in plan.phases():
+            futures = [pool.submit(_execute, api, action)
+                       for action in phase]
+            for action, future in zip(phase, futures):
+                error = future.exception()
+                if error is None:
+                    results.append(future.result())
+                else:
+                    errors.append((action, error))
+            if errors:
+                break
+    if errors:
+        raise exceptions.BulkOperationError(results, errors)
+    return results
@@ -15,35 +15,163 @@
 #
 # vim: tabstop=4 shiftwidth=4 softtabstop=4
 
+import json
+import sys
+
+from balancerclient.common import exceptions
+from balancerclient.common import query
 from balancerclient.common import utils
-from balancerclient.v1 import client
 
 
-CLIENT_CLASS = client.Client
+def get_client_class():
+    # Importing the client pulls in httplib2 and every manager, which only
+    # commands that talk to the API need.
+    from balancerclient.v1 import client
+    return client.Client
 
 
 def extra_args(argument):
     return dict(v.split('=', 1) for v in argument)
 
+
+def read_ids(args):
+    """Collect IDs given on the command line and in --from-file."""
+    ids = list(args.id)
+    if args.from_file:
+        if args.from_file == '-':
+            lines = sys.stdin.readlines()
+        else:
+            with open(args.from_file) as f:
+                lines = f.readlines()
+        ids.extend(line.strip() for line in lines
+                   if line.strip() and not line.startswith('#'))
+    if not ids:
+        raise exceptions.CommandError("Expecting at least one ID.")
+    return ids
+
+
+def report_bulk_errors(action, e):
+    for item, error in e.errors:
+        print >> sys.stderr, 'Unable to %s %s: %s' % (action, item, error)
+    raise exceptions.CommandError('%d of %d operations failed.' % (
+        len(e.errors), len(e.errors) + len(e.results)))
+
+
+def wait_args(func):
+    """Add the --wait, --wait-status and --wait-timeout options to a
+    command.
+    """
+    utils.add_arg(func, '--wait-timeout', metavar='<seconds>', type=float,
+                  default=600, help='Time to wait for the status')
+    utils.add_arg(func, '--wait-status', metavar='<status>',
+                  default='ACTIVE',
+                  help='Status to wait for with --wait, ACTIVE by default')
+    utils.add_arg(func, '--wait', action='store_true', default=False,
+                  help='Wait until the status becomes --wait-status')
+    return func
+
+
+def wait(manager, args, resources, lb=None):
+    """Wait for the status requested with --wait, if any."""
+    if not args.wait:
+        return resources
+    try:
+        return manager.wait_for(resources, target=args.wait_status,
+                                timeout=args.wait_timeout, lb=lb)
+    except exceptions.BulkOperationError, e:
+        report_bulk_errors('wait for', e)
+    except (exceptions.WaitTimeout, exceptions.ResourceStateError), e:
+        raise exceptions.CommandError(str(e))
+
+
+def format_args(func):
+    """Add the --format option to a command."""
+    utils.add_arg(func, '--format', metavar='<format>', default='table',
+                  choices=utils.OUTPUT_FORMATS,
+                  help='Output format: %s. All but table write each row '
+                       'as soon as it is fetched' %
+                       ', '.join(utils.OUTPUT_FORMATS))
+    return func
+
+
+def fields_args(func):
+    """Add the --fields option to a command."""
+    utils.add_arg(func, '--fields', metavar='<field,...>',
+                  help='Comma-separated attributes to show')
+    return func
+
+
+def columns(args, default):
+    """Return the columns requested with --fields, `default` otherwise."""
+    if not args.fields:
+        return default
+    return [field.strip() for field in args.fields.split(',')
+            if field.strip()]
+
+
+def query_args(func):
+    """Add the --filter, --sort and --limit options to a command."""
+    utils.add_arg(func, '--limit', metavar='<n>', type=int,
+                  help='Show at most <n> items, the first <n> by --sort')
+    utils.add_arg(func, '--sort', metavar='<field[:desc],...>',
+                  help='Sort by these attributes, e.g. weight:desc,name')
+    utils.add_arg(func, '--filter', metavar='<expression>',
+                  help='Show the items matching the expression, e.g. '
+                       '"weight>10 and condition==ENABLED". Comparisons '
+                       'are ==, !=, <, <=, >, >=, ^= (starts with) and '
+                       '=~ (regex), combined with and, or, not')
+    return func
+
+
+def print_resources(iter_list, args, default, *list_args, **list_kwargs):
+    """List resources with `iter_list` and print those selected by
+    --filter, --sort and --limit, in the columns of --fields.
+    """
+    fields = columns(args, default)
+    selection = query.Query(args.filter, args.sort, args.limit)
+    if selection.equalities:
+        list_kwargs['filters'] = selection.equalities
+    resources = iter_list(*list_args, fields=selection.columns(fields),
+                          **list_kwargs)
+    sortby_index = 0
+    if selection.sort:
+        sortby_index = None
+    utils.print_list(selection.apply(resources), fields,
+                     sortby_index=sortby_index, output_format=args.format)
+
+
+def print_resource(info, args):
+    """Print the attributes of a resource selected with --fields."""
+    if args.fields:
+        fields = columns(args, None)
+        info = dict((key, value) for key, value in info.iteritems()
+                    if key in fields)
+    utils.print_dict(info, output_format=args.format)
+
 # Devices
 
 
+@query_args
+@fields_args
+@format_args
 def do_device_list(cl, args):
     """
     List available load-balancing devices
     """
-    devices = cl.devices.list()
-    utils.print_list(devices, ('id', 'name', 'type', 'version', 'ip', 'port',
-                               'user', 'password'))
+    print_resources(cl.devices.iter_list, args,
+                    ('id', 'name', 'type', 'version', 'ip', 'port', 'user',
+                     'password'))
 
 
-@utils.arg('id', metavar='<device-id>', help='Device ID to display')
+@fields_args
+@format_args
+@utils.arg('id', metavar='<device-id>', help='Device name or ID to display')
 def do_device_show(cl, args):
     """
     Describe a specific load-balancing device
     """
-    device = cl.devices.get(args.id)
-    utils.print_dict(device._info)
+    device = utils.find_resource(cl.devices, args.id)
+    print_resource(device._info, args)
 
 
 @utils.arg('--name', metavar='<device-name>', required=True,
@@ -78,39 +206,63 @@ def do_device_delete(cl, args):
     cl.devices.delete(args.id)
 
 
+@format_args
 def do_algorithms_list(cl, args):
     """
     List available algorithms
     """
     algos = cl.devices.list_algoritms()
-    utils.print_flat_list(algos, ['algorithms'])
+    utils.print_flat_list(algos, ['algorithms'], output_format=args.format)
 
 
+@format_args
 def do_protocols_list(cl, args):
     """
     List available protocols
     """
     protos = cl.devices.list_protocols()
-    utils.print_flat_list(protos, ['protocols'])
+    utils.print_flat_list(protos, ['protocols'], output_format=args.format)
 
 # LoadBalancers
 
 
+@query_args
+@fields_args
+@format_args
+@utils.arg('--page-size', metavar='<n>', type=int,
+           help='Fetch the load balancers in pages of <n> items')
 def do_lb_list(cl, args):
     """
     List load balancers for a particular device
     """
-    lbs = cl.loadbalancers.list()
-    utils.print_list(lbs, ('id', 'name', 'algorithm', 'protocol'))
+    print_resources(cl.loadbalancers.iter_list, args,
+                    ('id', 'name', 'algorithm', 'protocol'),
+                    page_size=args.page_size)
 
 
-@utils.arg('id', metavar='<lb-id>', help='LoadBalancer ID to display')
+@utils.arg('id', metavar='<lb-id>', nargs='*',
+           help='LoadBalancer ID to dump, all by default')
+@utils.arg('--concurrency', metavar='<n>', type=int, default=10,
+           help='Number of requests in flight')
+def do_lb_dump(cl, args):
+    """
+    Dump load balancers with their nodes, probes, stickies and VIPs as
+    JSON, one load balancer per line
+    """
+    for topology in cl.iter_snapshot(args.id or None, args.concurrency):
+        print json.dumps(topology.to_dict())
+        sys.stdout.flush()
+
+
+@fields_args
+@format_args
+@utils.arg('id', metavar='<lb-id>', help='LoadBalancer name or ID to display')
 def do_lb_show(cl, args):
     """
     Describe a specific load balancer
     """
-    lb = cl.loadbalancers.get(args.id)
-    utils.print_dict(lb.get_info())
+    lb = utils.find_resource(cl.loadbalancers, args.id)
+    print_resource(lb.get_info(), args)
 
 
 @utils.arg('--name', metavar='<lb-name>', required=True, help='New lb name')
@@ -120,12 +272,14 @@ def do_lb_show(cl, args):
            help='Protocol of load balancing')
 @utils.arg('--extra', metavar="<key=value>", action='append', default=[],
             help='Load Balancer extra properties')
+@wait_args
 def do_lb_create(cl, args):
     """
     Create a new load balancer
     """
     lb = cl.loadbalancers.create(args.name, args.algorithm, args.protocol,
                                  **extra_args(args.extra))
+    lb = wait(cl.loadbalancers, args, lb)
     utils.print_dict(lb.get_info())
 
 
@@ -136,6 +290,7 @@ def do_lb_create(cl, args):
 @utils.arg('id', metavar='<lb-id>', help='LoadBalancer ID to update')
 @utils.arg('--extra', metavar="<key=value>", action='append', default=[],
             help='Extra properties')
+@wait_args
 def do_lb_update(cl, args):
     """
     Update a specific load balancer
@@ -154,6 +309,9 @@ def do_lb_update(cl, args):
 
     try:
         lb = cl.loadbalancers.update(args.id, **kwargs)
+        if args.wait:
+            # The update may not return the load balancer
+            lb = wait(cl.loadbalancers, args, args.id)
         print 'LoadBalancer has been updated.'
         utils.print_dict(lb._info)
     except Exception, e:
@@ -169,27 +327,67 @@ def do_lb_delete(cl, args):
     cl.loadbalancers.delete(args.id)
 
 
+@utils.arg('file', metavar='<file>',
+           help='JSON or YAML file with the desired state ("-" for stdin)')
+@utils.arg('--plan', action='store_true', default=False,
+           help='Only print the planned changes and the number of API '
+                'calls they need')
+@utils.arg('--concurrency', metavar='<n>', type=int, default=10,
+           help='Number of requests in flight')
+def do_lb_reconcile(cl, args):
+    """
+    Create, update and delete nodes, probes and virtual IPs to match the
+    desired state of load balancers
+    """
+    from balancerclient.v1 import reconcile
+
+    if args.file == '-':
+        text = sys.stdin.read()
+    else:
+        with open(args.file) as f:
+            text = f.read()
+    plan = reconcile.plan(cl, reconcile.load_state(text),
+                          concurrency=args.concurrency)
+    for line in plan.describe():
+        print line
+    print '%d API calls planned.' % plan.calls
+    if args.plan or not len(plan):
+        return
+    try:
+        reconcile.apply(cl, plan, concurrency=args.concurrency)
+    except exceptions.BulkOperationError, e:
+        report_bulk_errors('apply', e)
+    print 'Load balancers have been reconciled.'
+
 # Nodes
 
 
+@query_args
+@fields_args
+@format_args
 @utils.arg('lb_id', metavar='<lb-id>', help='LoadBalancer ID')
+@utils.arg('--page-size', metavar='<n>', type=int,
+           help='Fetch the nodes in pages of <n> items')
 def do_node_list(cl, args):
     """
     List nodes for a particular load balancer
     """
-    nodes = cl.nodes.list(args.lb_id)
-    utils.print_list(nodes, ('id', 'name', 'type', 'address', 'port',
-                             'weight', 'condition', 'status'))
+    print_resources(cl.nodes.iter_list, args,
+                    ('id', 'name', 'type', 'address', 'port', 'weight',
+                     'condition', 'status'),
+                    args.lb_id, page_size=args.page_size)
 
 
+@fields_args
+@format_args
 @utils.arg('lb_id', metavar='<lb-id>', help='LoadBalancer ID')
-@utils.arg('id', metavar='<node-id>', help='Node ID to display')
+@utils.arg('id', metavar='<node-id>', help='Node name or ID to display')
 def do_node_show(cl, args):
     """
     Describe a specific node
     """
-    node = cl.nodes.get(args.lb_id, args.id)
-    utils.print_dict(node._info)
+    node = utils.find_resource(cl.nodes, args.id, args.lb_id)
+    print_resource(node._info, args)
 
 
 @utils.arg('--name', metavar='<node-name>', required=True,
@@ -205,6 +403,7 @@ def do_node_show(cl, args):
 @utils.arg('lb_id', metavar='<lb-id>', help='LoadBalancer ID')
 @utils.arg('--extra', metavar="<key=value>", action='append', default=[],
            help='Extra properties')
+@wait_args
 def do_node_create(cl, args):
     """
     Create a new node
@@ -212,6 +411,7 @@ def do_node_create(cl, args):
     node = cl.nodes.create(args.lb_id, args.name, args.type, args.address,
                            args.port, args.weight, args.condition,
                            **extra_args(args.extra))
+    node = wait(cl.nodes, args, node, lb=args.lb_id)
     utils.print_dict(node._info)
 
 
@@ -223,11 +423,17 @@ def do_node_create(cl, args):
 @utils.arg('--condition', metavar='<condition>', help='Node condition')
 @utils.arg('--extra', metavar="<key=value>", action='append', default=[],
             help='Extra properties')
+@utils.arg('--from-file', metavar='<file>',
+           help='Read additional node IDs from a file, one per line '
+                '("-" for stdin)')
+@utils.arg('--concurrency', metavar='<concurrency>', type=int, default=10,
+           help='Number of nodes updated at once')
 @utils.arg('lb_id', metavar='<lb-id>', help='LoadBalancer ID')
-@utils.arg('id', metavar='<node-id>', help='Node ID')
+@utils.arg('id', metavar='<node-id>', nargs='*', help='Node ID')
+@wait_args
 def do_node_update(cl, args):
     """
-    Update a specific node
+    Update one or more nodes
     """
     kwargs = extra_args(args.extra)
     if args.name:
@@ -247,8 +453,23 @@ def do_node_update(cl, args):
         print "Node not updated, no arguments present."
         return
 
+    ids = read_ids(args)
+    if len(ids) > 1:
+        try:
+            cl.nodes.update_many(args.lb_id,
+                                 dict((id, kwargs) for id in ids),
+                                 concurrency=args.concurrency)
+        except exceptions.BulkOperationError, e:
+            report_bulk_errors('update node', e)
+        wait(cl.nodes, args, ids, lb=args.lb_id)
+        print '%d nodes have been updated.' % len(ids)
+        return
+
     try:
-        node = cl.nodes.update(args.lb_id, args.id, **kwargs)
+        node = cl.nodes.update(args.lb_id, ids[0], **kwargs)
+        if args.wait:
+            # The update may not return the node
+            node = wait(cl.nodes, args, ids[0], lb=args.lb_id)
         print 'Node has been updated.'
         utils.print_dict(node._info)
     except Exception, e:
@@ -256,35 +477,95 @@ def do_node_update(cl, args):
         raise
 
 
+@utils.arg('--from-file', metavar='<file>',
+           help='Read additional node IDs from a file, one per line '
+                '("-" for stdin)')
+@utils.arg('--all', action='store_true', default=False,
+           help='Change all nodes of the load balancer')
+@utils.arg('--batch-size', metavar='<n>', type=int, default=10,
+           help='Number of nodes changed before waiting for them to settle')
+@utils.arg('--max-in-flight', metavar='<n>', type=int, default=10,
+           help='Number of requests in flight')
+@utils.arg('--status', metavar='<status>',
+           help='Node status to wait for, the new condition by default')
+@utils.arg('--max-failures', metavar='<n>', type=float, default=0,
+           help='Stop after this many failed nodes, or this fraction of '
+                'nodes if below 1')
+@utils.arg('--timeout', metavar='<seconds>', type=float, default=600,
+           help='Time to wait for each batch to settle')
 @utils.arg('lb_id', metavar='<lb-id>', help='LoadBalancer ID')
-@utils.arg('id', metavar='<node-id>', help='Node ID')
+@utils.arg('condition', metavar='<condition>', help='New node condition')
+@utils.arg('id', metavar='<node-id>', nargs='*', help='Node ID')
+def do_node_condition(cl, args):
+    """
+    Change the condition of nodes in rolling batches
+    """
+    if args.all:
+        ids = [node.id for node in cl.nodes.list(args.lb_id)]
+    else:
+        ids = read_ids(args)
+
+    def on_batch(number, done, errors):
+        print 'Batch %d: %d nodes settled, %d failed.' % (number, len(done),
+                                                          len(errors))
+        sys.stdout.flush()
+
+    try:
+        cl.nodes.rolling_condition(args.lb_id, ids, args.condition,
+                                   batch_size=args.batch_size,
+                                   max_in_flight=args.max_in_flight,
+                                   status=args.status,
+                                   max_failures=args.max_failures,
+                                   timeout=args.timeout,
+                                   on_batch=on_batch)
+    except exceptions.BulkOperationError, e:
+        report_bulk_errors('change condition of node', e)
+    print '%d nodes are %s.' % (len(ids), args.condition)
+
+
+@utils.arg('--from-file', metavar='<file>',
+           help='Read additional node IDs from a file, one per line '
+                '("-" for stdin)')
+@utils.arg('--concurrency', metavar='<concurrency>', type=int, default=10,
+           help='Number of nodes deleted at once')
+@utils.arg('lb_id', metavar='<lb-id>', help='LoadBalancer ID')
+@utils.arg('id', metavar='<node-id>', nargs='*', help='Node ID')
 def do_node_delete(cl, args):
     """
-    Delete a specific node
+    Delete one or more nodes
     """
-    cl.nodes.delete(args.lb_id, args.id)
+    ids = read_ids(args)
+    try:
+        cl.nodes.delete_many(args.lb_id, ids, concurrency=args.concurrency)
+    except exceptions.BulkOperationError, e:
+        report_bulk_errors('delete node', e)
 
 
 # Probes
 
 
+@query_args
+@fields_args
+@format_args
 @utils.arg('lb_id', metavar='<lb-id>', help='LoadBalancer ID')
 def do_probe_list(cl, args):
     """
     List probes for a particular load balancer
     """
-    probes = cl.probes.list(args.lb_id)
-    utils.print_list(probes, ('id', 'name', 'type'))
+    print_resources(cl.probes.iter_list, args, ('id', 'name', 'type'),
+                    args.lb_id)
 
 
+@fields_args
+@format_args
 @utils.arg('lb_id', metavar='<lb-id>', help='LoadBalancer ID')
-@utils.arg('id', metavar='<probe-id>', help='Probe ID to display')
+@utils.arg('id', metavar='<probe-id>', help='Probe name or ID to display')
 def do_probe_show(cl, args):
     """
     Describe a specific probe
     """
-    probe = cl.probes.get(args.lb_id, args.id)
-    utils.print_dict(probe._info)
+    probe = utils.find_resource(cl.probes, args.id, args.lb_id)
+    print_resource(probe._info, args)
 
 
 @utils.arg('--name', metavar='<probe-name>', required=True,
@@ -314,23 +595,28 @@ def do_probe_delete(cl, args):
 # Stickies
 
 
+@query_args
+@fields_args
+@format_args
 @utils.arg('lb_id', metavar='<lb-id>', help='LoadBalancer ID')
 def do_sticky_list(cl, args):
     """
     List sticky commands for a particular load balancer
     """
-    stickies = cl.stickies.list(args.lb_id)
-    utils.print_list(stickies, ('id', 'name', 'type'))
+    print_resources(cl.stickies.iter_list, args, ('id', 'name', 'type'),
+                    args.lb_id)
 
 
+@fields_args
+@format_args
 @utils.arg('lb_id', metavar='<lb-id>', help='LoadBalancer ID')
-@utils.arg('id', metavar='<sticky-id>', help='Sticky ID to display')
+@utils.arg('id', metavar='<sticky-id>', help='Sticky name or ID to display')
 def do_sticky_show(cl, args):
     """
     Describe a specific sticky command
     """
-    sticky = cl.stickies.get(args.lb_id, args.id)
-    utils.print_dict(sticky._info)
+    sticky = utils.find_resource(cl.stickies, args.id, args.lb_id)
+    print_resource(sticky._info, args)
 
 
 @utils.arg('--name', metavar='<sticky-name>', required=True,
@@ -361,23 +647,28 @@ def do_sticky_delete(cl, args):
 # Virtual IPs
 
 
+@query_args
+@fields_args
+@format_args
 @utils.arg('lb_id', metavar='<lb-id>', help='LoadBalancer ID')
 def do_vip_list(cl, args):
     """
     List virtual IPs for a particular load balancer
     """
-    vips = cl.vips.list(args.lb_id)
-    utils.print_list(vips, ('id', 'name', 'address', 'port'))
+    print_resources(cl.vips.iter_list, args, ('id', 'name', 'address', 'port'),
+                    args.lb_id)
 
 
+@fields_args
+@format_args
 @utils.arg('lb_id', metavar='<lb-id>', help='LoadBalancer ID')
-@utils.arg('id', metavar='<vip-id>', help='Virtual IP ID to display')
+@utils.arg('id', metavar='<vip-id>', help='Virtual IP name or ID to display')
 def do_vip_show(cl, args):
     """
     Describe a specific virtual IP
     """
-    vip = cl.vips.get(args.lb_id, args.id)
-    utils.print_dict(vip._info)
+    vip = utils.find_resource(cl.vips, args.id, args.lb_id)
+    print_resource(vip._info, args)
 
 
 @utils.arg('--name', metavar='<vip-name>', required=True,
@@ -27,6 +27,7 @@ class Sticky(base.Resource):
 
 class StickyManager(base.Manager):
     resource_class = Sticky
+    nested = True
 
     def create(self, lb, name, type, **extra):
         body = {'name': name,
@@ -49,3 +50,9 @@ class StickyManager(base.Manager):
         return self._list("/loadbalancers/%s/sessionPersistence" %
                               (base.getid(lb),),
                           'sessionPersistence')
+
+    def iter_list(self, lb, page_size=None, fields=None, filters=None):
+        return self._iter_list("/loadbalancers/%s/sessionPersistence" %
+                                   (base.getid(lb),),
+                               'sessionPersistence', page_size=page_size,
+                               fields=fields, filters=filters)
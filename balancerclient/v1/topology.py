@@ -0,0 +1,104 @@
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+import collections
+import Queue
+import threading
+
+from balancerclient.common import base
+from balancerclient.common import executor
+
+
+class Topology(collections.namedtuple('Topology', ['loadbalancer', 'nodes',
+                                                   'probes', 'stickies',
+                                                   'vips'])):
+    """A load balancer with all of its sub-resources.
+
+    Sub-resources are stored as tuples, so a topology can't be changed
+    once it is built.
+    """
+    __slots__ = ()
+
+    def to_dict(self):
+        info = {'loadbalancer': self.loadbalancer._info}
+        for field in self._fields[1:]:
+            info[field] = [res._info for res in getattr(self, field)]
+        return info
+
+
+def _fetch(api, lbs, concurrency):
+    """Yield (index in `lbs`, :class:`Topology`) pairs in the order the
+    topologies complete.
+    """
+    if lbs is None:
+        lbs = api.loadbalancers.list()
+    lbs = list(lbs)
+    if not lbs:
+        return
+    api.client.ensure_pool(concurrency)
+    completed = Queue.Queue()
+    lock = threading.Lock()
+    with executor.Executor(concurrency) as pool:
+        for index, lb in enumerate(lbs):
+            if isinstance(lb, base.Resource):
+                lb_future = executor.Future()
+                lb_future.set_result(lb)
+            else:
+                lb_future = pool.submit(api.loadbalancers.get, lb)
+            lb_id = base.getid(lb)
+            futures = [lb_future] + [pool.submit(manager.list, lb_id)
+                                     for manager in (api.nodes, api.probes,
+                                                     api.stickies, api.vips)]
+            remaining = [len(futures)]
+
+            def part_done(future, index=index, futures=futures,
+                          remaining=remaining):
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0]:
+                        return
+                completed.put((index, futures))
+            for future in futures:
+                future.add_done_callback(part_done)
+        for i in xrange(len(lbs)):
+            index, futures = completed.get()
+            parts = [future.result() for future in futures]
+            yield index, Topology(parts[0],
+                                  *[tuple(part) for part in parts[1:]])
+
+
+def iter_snapshot(api, lbs=None, concurrency=10):
+    """Fetch the topology of load balancers with concurrent requests.
+
+    Yields a :class:`Topology` per load balancer as soon as all of its
+    parts have been fetched, so a slow load balancer doesn't hold up the
+    others.
+
+    :param api: A v1 :class:`Client`.
+    :param lbs: Load balancers or their IDs, all of them by default.
+    :param concurrency: Number of requests in flight.
+    """
+    for index, topology in _fetch(api, lbs, concurrency):
+        yield topology
+
+
+def snapshot(api, lbs=None, concurrency=10):
+    """Return a tuple of :class:`Topology` in the order of `lbs`, see
+    `iter_snapshot`.
+    """
+    return tuple(topology for index, topology
+                 in sorted(_fetch(api, lbs, concurrency)))
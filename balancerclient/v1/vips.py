@@ -27,11 +27,18 @@ class VIP(base.Resource):
 
 class VIPManager(base.Manager):
     resource_class = VIP
+    nested = True
 
     def list(self, lb):
         return self._list("/loadbalancers/%s/virtualIps" % (base.getid(lb),),
                           'virtualIps')
 
+    def iter_list(self, lb, page_size=None, fields=None, filters=None):
+        return self._iter_list("/loadbalancers/%s/virtualIps" %
+                                   (base.getid(lb),),
+                               'virtualIps', page_size=page_size,
+                               fields=fields, filters=filters)
+
     def create(self, lb, name, address, mask, port, type=None, vlan=None,
                **extra):
         vip = dict(name=name,
@@ -51,13 +58,17 @@ class VIPManager(base.Manager):
                name=None, address=None, mask=None, port=None, type=None,
                vlan=None,
                **extra):
+        # The attribute is spelled VLAN in the API and may come in `extra`
+        extra_vlan = extra.pop('VLAN', None)
+        if vlan is None:
+            vlan = extra_vlan
         body = dict(name=name,
                     address=address,
                     mask=mask,
                     port=port,
                     type=type,
                     VLAN=vlan,
-                    *extra)
+                    **extra)
         for key, value in body.items():
             if value is None:
                 body.pop(key)
@@ -45,6 +45,7 @@ setuptools.setup(
         "Programming Language :: Python"
     ],
     entry_points={
-        'console_scripts': ['balancer = balancerclient.shell:main'],
+        'console_scripts': ['balancer = balancerclient.daemon:main',
+                            'balancerd = balancerclient.daemon:server_main'],
     }
 )
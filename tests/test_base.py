@@ -1,8 +1,11 @@
+import gc
+
 import unittest2
 import mock
 
 from balancerclient.common.client import HTTPClient
 from balancerclient.common import base
+from balancerclient.common import exceptions
 
 
 class MockWithoutAttrs(mock.Mock):
@@ -121,6 +124,273 @@ class TestManager(unittest2.TestCase):
                                  admin_url=False)
         self.assertEqual(resp, {'id': 'fakeid'})
 
+    def test_get_not_modified_reuses_resource(self):
+        self.client.conditional_get = True
+        self.client.MAX_VALIDATORS = 10
+        self.client.json_request.side_effect = [
+            (mock.Mock(status=200), {'data': {'id': 'fakeid'}}),
+            (mock.Mock(status=304), {'data': {'id': 'fakeid'}}),
+        ]
+        obj1 = self.manager._get('/fakes', 'data')
+        obj2 = self.manager._get('/fakes', 'data')
+        self.assertIs(obj1, obj2)
+        self.assertEqual(self.resource.call_count, 1)
+
+    def test_list_not_modified_reuses_resources(self):
+        self.client.conditional_get = True
+        self.client.MAX_VALIDATORS = 10
+        self.client.json_request.side_effect = [
+            (mock.Mock(status=200), {'data': [{'id': 'fakeid'}]}),
+            (mock.Mock(status=304), {'data': [{'id': 'fakeid'}]}),
+        ]
+        objs1 = self.manager._list('/fakes', 'data')
+        objs2 = self.manager._list('/fakes', 'data')
+        self.assertEqual(objs1, objs2)
+        self.assertIs(objs1[0], objs2[0])
+        self.assertEqual(self.resource.call_count, 1)
+
+    def test_iter_list_incremental(self):
+        self.client.raw_request.return_value = (
+            mock.Mock(status=200), '{"data": [{"id": 1}, {"id": 2}]}')
+        objs = self.manager._iter_list('/fakes', 'data')
+        self.assertFalse(self.client.raw_request.called)
+        self.assertEqual(len(list(objs)), 2)
+        self.assertEqual(self.resource.mock_calls,
+                         [mock.call(self.manager, {'id': 1}, loaded=True),
+                          mock.call(self.manager, {'id': 2}, loaded=True)])
+
+    def test_iter_list_pages(self):
+        self.client.json_request.side_effect = [
+            (mock.Mock(), {'data': [{'id': 1}, {'id': 2}]}),
+            (mock.Mock(), {'data': [{'id': 3}]}),
+        ]
+        objs = list(self.manager._iter_list('/fakes', 'data', page_size=2))
+        self.assertEqual(len(objs), 3)
+        self.assertEqual(self.client.json_request.mock_calls, [
+            mock.call('GET', '/fakes?limit=2', admin_url=False),
+            mock.call('GET', '/fakes?limit=2&marker=2', admin_url=False)])
+
+    def test_iter_list_pagination_unsupported(self):
+        self.client.json_request.return_value = (
+            mock.Mock(), {'data': [{'id': 1}, {'id': 2}]})
+        objs = list(self.manager._iter_list('/fakes', 'data', page_size=2))
+        self.assertEqual(len(objs), 2)
+        self.assertEqual(self.client.json_request.call_count, 2)
+        self.client.json_request.return_value = (
+            mock.Mock(), {'data': [{'id': 1}, {'id': 2}, {'id': 3}]})
+        objs = list(self.manager._iter_list('/fakes', 'data', page_size=2))
+        self.assertEqual(len(objs), 3)
+        self.assertEqual(self.client.json_request.call_count, 3)
+
+    def test_iter_list_fields(self):
+        self.manager.resource_class = base.Resource
+        self.client.raw_request.return_value = (
+            mock.Mock(), '{"data": [{"id": 1, "name": "a", "port": 80}]}')
+        objs = list(self.manager._iter_list('/fakes', 'data',
+                                            fields=['name']))
+        self.assertEqual(objs[0]._info, {'id': 1, 'name': 'a'})
+        self.assertEqual(self.client.raw_request.mock_calls, [
+            mock.call('GET', '/fakes', admin_url=False)])
+
+    def test_iter_list_server_fields(self):
+        self.manager.server_fields = True
+        self.client.raw_request.return_value = (mock.Mock(), '{"data": []}')
+        list(self.manager._iter_list('/fakes', 'data',
+                                     fields=['name', 'port']))
+        self.assertEqual(self.client.raw_request.mock_calls, [
+            mock.call('GET', '/fakes?fields=name,port', admin_url=False)])
+
+    def test_iter_list_server_filters(self):
+        self.client.raw_request.return_value = (mock.Mock(), '{"data": []}')
+        filters = {'condition': 'ENABLED', 'address': '10.0.0.1'}
+        list(self.manager._iter_list('/fakes', 'data', filters=filters))
+        self.manager.server_filters = True
+        list(self.manager._iter_list('/fakes', 'data', filters=filters))
+        self.assertEqual(self.client.raw_request.mock_calls, [
+            mock.call('GET', '/fakes', admin_url=False),
+            mock.call('GET', '/fakes?address=10.0.0.1&condition=ENABLED',
+                      admin_url=False)])
+
+
+@mock.patch('time.sleep')
+class TestPoll(unittest2.TestCase):
+    def setUp(self):
+        self.manager = base.Manager(mock.Mock())
+        self.states = {'a': ['BUILD', 'ACTIVE'],
+                       'b': ['BUILD', 'BUILD', 'BUILD', 'ACTIVE'],
+                       'c': ['BUILD', 'ERROR']}
+
+    def fetch(self, pending):
+        self.rounds.append(list(pending))
+        return [mock.Mock(id=item, status=self.states[item].pop(0))
+                for item in pending]
+
+    def poll(self, items, **kwargs):
+        self.rounds = []
+        return self.manager._poll(items, self.fetch,
+                                  lambda res: res.status == 'ACTIVE',
+                                  lambda res: res.status == 'ERROR',
+                                  **kwargs)
+
+    def test_shared_loop(self, mock_sleep):
+        done, errors = self.poll(['b', 'a', 'c'])
+        self.assertEqual([res.id for res in done], ['b', 'a'])
+        self.assertEqual([item for item, error in errors], ['c'])
+        self.assertIsInstance(errors[0][1], exceptions.ResourceStateError)
+        self.assertEqual(self.rounds, [['b', 'a', 'c'], ['b', 'a', 'c'],
+                                       ['b'], ['b']])
+        self.assertEqual(mock_sleep.call_count, 3)
+
+    @mock.patch('random.random', return_value=0)
+    def test_backoff_resets_on_progress(self, mock_random, mock_sleep):
+        self.poll(['b', 'a'], initial=1, maximum=10)
+        self.assertEqual(mock_sleep.mock_calls,
+                         [mock.call(1), mock.call(1), mock.call(2)])
+
+    @mock.patch('time.time')
+    def test_timeout(self, mock_time, mock_sleep):
+        mock_time.side_effect = [100, 100, 101, 102]
+        done, errors = self.poll(['b'], timeout=1.5)
+        self.assertEqual(done, [])
+        self.assertIsInstance(errors[0][1], exceptions.WaitTimeout)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(mock_sleep.mock_calls[-1], mock.call(0.5))
+
+
+@mock.patch('time.sleep')
+class TestWaitFor(unittest2.TestCase):
+    def setUp(self):
+        self.manager = base.Manager(mock.Mock())
+        self.manager.get = mock.Mock()
+        self.manager.list = mock.Mock()
+
+    def res(self, id, status):
+        return base.Resource(self.manager, {'id': id, 'status': status},
+                             loaded=True)
+
+    def test_single(self, mock_sleep):
+        self.manager.get.side_effect = [self.res('fakeid', 'BUILD'),
+                                        self.res('fakeid', 'ACTIVE')]
+        res = self.manager.wait_for(self.res('fakeid', 'BUILD'))
+        self.assertEqual(res.status, 'ACTIVE')
+        self.assertEqual(self.manager.get.mock_calls,
+                         [mock.call('fakeid')] * 2)
+
+    def test_single_failure(self, mock_sleep):
+        self.manager.get.return_value = self.res('fakeid', 'ERROR')
+        self.assertRaises(exceptions.ResourceStateError,
+                          self.manager.wait_for, 'fakeid')
+
+    def test_many_with_one_list_per_round(self, mock_sleep):
+        self.manager.list.side_effect = [
+            [self.res('a', 'BUILD'), self.res('b', 'ACTIVE')],
+            [self.res('a', 'ACTIVE'), self.res('b', 'ACTIVE')],
+        ]
+        resources = self.manager.wait_for(['a', 'b'], lb='lbfakeid')
+        self.assertEqual([res.id for res in resources], ['a', 'b'])
+        self.assertEqual(self.manager.list.mock_calls,
+                         [mock.call('lbfakeid')] * 2)
+        self.assertFalse(self.manager.get.called)
+
+    def test_many_failure(self, mock_sleep):
+        self.manager.list.return_value = [self.res('a', 'ACTIVE'),
+                                          self.res('b', 'ERROR')]
+        with self.assertRaises(exceptions.BulkOperationError) as cm:
+            self.manager.wait_for(['a', 'b'], lb='lbfakeid')
+        self.assertEqual([res.id for res in cm.exception.results], ['a'])
+
+    def test_refresh_bypasses_cache(self, mock_sleep):
+        client = mock.Mock(spec=HTTPClient)
+        client.json_request.return_value = (mock.Mock(status=200),
+                                            {'data': {'id': 'fakeid'}})
+        manager = base.Manager(mock.Mock(client=client),
+                               cache=mock.Mock())
+        manager.resource_class = base.Resource
+        manager.get = lambda id: manager._get('/fakes/%s' % id, 'data')
+        manager._refresh(['fakeid'])
+        self.assertFalse(manager.cache.get.called)
+        self.assertTrue(manager.cache.put.called)
+
+
+class TestHydrate(unittest2.TestCase):
+    def setUp(self):
+        client = mock.Mock(spec=HTTPClient)
+        self.manager = base.Manager(mock.Mock(client=client))
+        self.manager.resource_class = base.Resource
+        self.manager.nested = True
+        self.manager.get = mock.Mock()
+        self.manager.list = mock.Mock(return_value=[
+            base.Resource(self.manager, {'id': 'a', 'name': 'fake-a'}),
+            base.Resource(self.manager, {'id': 'b', 'name': 'fake-b'}),
+        ])
+
+    def test_records_parent(self):
+        self.manager.api.client.json_request.return_value = \
+            (mock.Mock(status=200), {'data': {'id': 'a'}})
+        res = self.manager._get('/loadbalancers/lbfakeid/nodes/a', 'data')
+        self.assertEqual(res._parent, 'lbfakeid')
+
+    def test_lazy_load_nested(self):
+        res = base.Resource(self.manager, {'id': 'a'})
+        res._parent = 'lbfakeid'
+        self.manager.get.return_value = self.manager.list()[0]
+        self.assertEqual(res.name, 'fake-a')
+        self.manager.get.assert_called_once_with('lbfakeid', 'a')
+
+    def test_one_list_per_parent(self):
+        resources = [base.Resource(self.manager, {'id': id})
+                     for id in ('a', 'b')]
+        for res in resources:
+            res._parent = 'lbfakeid'
+        self.manager.hydrate(resources)
+        self.assertEqual([res.name for res in resources],
+                         ['fake-a', 'fake-b'])
+        self.assertTrue(all(res.is_loaded() for res in resources))
+        self.manager.list.assert_called_once_with('lbfakeid')
+        self.assertFalse(self.manager.get.called)
+
+
+class TestFind(unittest2.TestCase):
+    def setUp(self):
+        self.manager = base.Manager(mock.Mock())
+        self.manager.resource_class = base.Resource
+        self.manager.list = mock.Mock(return_value=[
+            base.Resource(self.manager, {'id': 'a', 'name': 'web'}),
+            base.Resource(self.manager, {'id': 'b', 'name': 'db'}),
+            base.Resource(self.manager, {'id': 'c', 'name': 'db'}),
+        ])
+
+    def test_find_by_name_uses_index(self):
+        self.assertEqual(self.manager.find('lbfakeid', name='web').id, 'a')
+        self.assertEqual(
+            [res.id for res in self.manager.findall('lbfakeid', name='db')],
+            ['b', 'c'])
+        self.manager.list.assert_called_once_with('lbfakeid')
+
+    def test_miss_refreshes_stale_index(self):
+        self.assertRaises(exceptions.NotFound, self.manager.find,
+                          name='new')
+        self.assertEqual(self.manager.list.call_count, 1)
+        self.manager.index_refresh_interval = 0
+        self.assertRaises(exceptions.NotFound, self.manager.find,
+                          name='new')
+        self.assertEqual(self.manager.list.call_count, 2)
+
+    def test_not_unique(self):
+        self.assertRaises(exceptions.NoUniqueMatch, self.manager.find,
+                          name='db')
+
+    def test_write_drops_index(self):
+        self.manager.find(name='web')
+        self.manager._invalidate('/fakes')
+        self.manager.find(name='web')
+        self.assertEqual(self.manager.list.call_count, 2)
+
+    def test_findall_other_attrs(self):
+        self.assertEqual(
+            [res.id for res in self.manager.findall(id='b', name='db')],
+            ['b'])
+
 
 class TestResource(unittest2.TestCase):
     def test_getattr_loaded(self):
@@ -235,3 +505,38 @@ class TestResource(unittest2.TestCase):
         res1 = base.Resource(manager, {'name': 'fakename1'}, loaded=True)
         res2 = base.Resource(manager, {'name': 'fakename2'}, loaded=True)
         self.assertFalse(res1 == res2)
+
+
+class TestCompactResource(unittest2.TestCase):
+    def setUp(self):
+        self.cls = base.compact_class(base.Resource)
+
+    def test_class_cached(self):
+        self.assertIs(base.compact_class(base.Resource), self.cls)
+        self.assertTrue(issubclass(self.cls, base.Resource))
+
+    def test_attributes_from_info(self):
+        res = self.cls(mock.Mock(), {'id': 'fakeid', 'name': 'fake'},
+                       loaded=True)
+        self.assertEqual(res.name, 'fake')
+        self.assertFalse(hasattr(res, 'missing'))
+        self.assertEqual(repr(res), '<Resource id=fakeid, name=fake>')
+        self.assertFalse([ref for ref in gc.get_referents(res)
+                          if isinstance(ref, dict) and ref is not res._info])
+
+    def test_lazy_load(self):
+        manager = mock.Mock()
+        manager.get.return_value = base.Resource(
+            manager, {'id': 'fakeid', 'name': 'fake'})
+        res = self.cls(manager, {'id': 'fakeid'})
+        self.assertEqual(res.name, 'fake')
+        manager.get.assert_called_once_with('fakeid')
+
+    def test_manager_option(self):
+        manager = base.Manager(mock.Mock(), compact=True)
+        self.assertIsNone(manager.resource_class)
+
+        class FakeManager(base.Manager):
+            resource_class = base.Resource
+        manager = FakeManager(mock.Mock(), compact=True)
+        self.assertIs(manager.resource_class, self.cls)
@@ -0,0 +1,108 @@
+import unittest2
+import mock
+
+from balancerclient.common import base
+from balancerclient.common import cache
+from balancerclient.common.client import HTTPClient
+
+
+class TestResponseCache(unittest2.TestCase):
+    def setUp(self):
+        self.cache = cache.ResponseCache(ttl=10, size=3)
+
+    def test_scope(self):
+        self.assertEqual(cache.scope('/loadbalancers/1/nodes/2'),
+                         ('/loadbalancers', '/loadbalancers/1'))
+        self.assertEqual(cache.scope('/loadbalancers'),
+                         ('/loadbalancers', '/loadbalancers'))
+        self.assertEqual(cache.scope('/devices/1?fields=id'),
+                         ('/devices', '/devices/1'))
+
+    def test_get_put(self):
+        self.assertIsNone(self.cache.get((False, '/fakes')))
+        self.cache.put((False, '/fakes'), {'id': 'fakeid'})
+        value = self.cache.get((False, '/fakes'))
+        self.assertEqual(value, {'id': 'fakeid'})
+        value['id'] = 'changed'
+        self.assertEqual(self.cache.get((False, '/fakes')),
+                         {'id': 'fakeid'})
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+    @mock.patch('time.time')
+    def test_ttl(self, mock_time):
+        mock_time.return_value = 100
+        self.cache.put((False, '/fakes'), {'id': 'fakeid'})
+        mock_time.return_value = 111
+        self.assertIsNone(self.cache.get((False, '/fakes')))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        for i in range(3):
+            self.cache.put((False, '/fakes/%d' % i), {'id': i})
+        self.cache.get((False, '/fakes/0'))
+        self.cache.put((False, '/fakes/3'), {'id': 3})
+        self.assertIsNotNone(self.cache.get((False, '/fakes/0')))
+        self.assertIsNone(self.cache.get((False, '/fakes/1')))
+        self.assertEqual(len(self.cache), 3)
+
+    def test_invalidate(self):
+        self.cache.size = 10
+        urls = ['/loadbalancers', '/loadbalancers/1',
+                '/loadbalancers/1/nodes', '/loadbalancers/10/nodes',
+                '/devices']
+        for url in urls:
+            self.cache.put((False, url), {})
+        self.cache.invalidate('/loadbalancers/1/nodes/5')
+        self.assertEqual(sorted(k[1] for k in self.cache._entries),
+                         ['/devices', '/loadbalancers/10/nodes'])
+
+
+class TestCachedManager(unittest2.TestCase):
+    def setUp(self):
+        self.client = mock.Mock(spec=HTTPClient)
+        self.client.json_request.return_value = \
+            (mock.Mock(), {'data': {'id': 'fakeid'}})
+        self.api = mock.Mock(client=self.client)
+        self.cache = cache.ResponseCache()
+        self.manager = base.Manager(self.api, cache=self.cache)
+        self.manager.resource_class = base.Resource
+
+    def test_get_cached(self):
+        obj1 = self.manager._get('/fakes/fakeid', 'data')
+        obj2 = self.manager._get('/fakes/fakeid', 'data')
+        self.assertEqual(self.client.json_request.call_count, 1)
+        self.assertEqual(obj1, obj2)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_list_with_body_not_cached(self):
+        self.client.json_request.return_value = \
+            (mock.Mock(), {'data': [{'id': 'fakeid'}]})
+        self.manager._list('/fakes', 'data', body='fakebody')
+        self.manager._list('/fakes', 'data', body='fakebody')
+        self.assertEqual(self.client.json_request.call_count, 2)
+
+    def test_write_invalidates(self):
+        self.manager._get('/fakes/fakeid', 'data')
+        self.manager._update('/fakes/fakeid', {'name': 'new'}, 'data')
+        self.manager._get('/fakes/fakeid', 'data')
+        self.manager._delete('/fakes/fakeid')
+        self.manager._get('/fakes/fakeid', 'data')
+        self.assertEqual(self.client.json_request.call_count, 4)
+        self.assertEqual(self.client.raw_request.call_count, 1)
+
+    def test_write_invalidates_dependent_lookups(self):
+        self.manager._get('/fakes/find_for_VM/vmid', 'data')
+        self.manager._update('/other/fakeid', {'name': 'new'}, 'data')
+        self.manager._get('/fakes/find_for_VM/vmid', 'data')
+        self.manager.invalidates = ('/fakes/find_for_VM',)
+        self.manager._update('/other/fakeid', {'name': 'new'}, 'data')
+        self.manager._get('/fakes/find_for_VM/vmid', 'data')
+        self.assertEqual(self.client.json_request.call_count, 4)
+
+    def test_failed_write_invalidates(self):
+        self.manager._get('/fakes/fakeid', 'data')
+        self.client.raw_request.side_effect = IOError()
+        with self.assertRaises(IOError):
+            self.manager._delete('/fakes/fakeid')
+        self.manager._get('/fakes/fakeid', 'data')
+        self.assertEqual(self.client.json_request.call_count, 2)
@@ -0,0 +1,107 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import unittest2
+import mock
+
+from balancerclient import daemon
+from balancerclient import shell
+
+
+class TestForward(unittest2.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'balancerd.sock')
+
+    def tearDown(self):
+        for path in (self.path, daemon.key_path(self.path)):
+            if os.path.lexists(path):
+                os.unlink(path)
+        os.rmdir(os.path.dirname(self.path))
+
+    def listen(self, reply):
+        """Serve one connection on self.path, answering with `reply`."""
+        with open(daemon.key_path(self.path), 'w') as f:
+            f.write('key')
+        os.chmod(daemon.key_path(self.path), 0600)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        os.chmod(self.path, 0600)
+        server.listen(1)
+
+        def serve():
+            conn, address = server.accept()
+            conn.makefile().readline()
+            conn.sendall(reply)
+            conn.close()
+            server.close()
+        thread = threading.Thread(target=serve)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def test_socket_path(self):
+        with mock.patch.dict(os.environ, {'BALANCERD_SOCKET': '',
+                                          'XDG_RUNTIME_DIR': '/run/user/1'}):
+            self.assertEqual(daemon.socket_path(),
+                             '/run/user/1/balancerd/balancerd.sock')
+
+    def test_no_daemon(self):
+        self.assertIsNone(daemon.forward(['lb-list'], self.path))
+
+    def test_local_commands(self):
+        open(self.path, 'w').close()
+        for argv in ([], ['--debug', 'lb-list'], ['batch', 'file'],
+                     ['lb-reconcile', '-'], ['node-delete', 'lb1',
+                                             '--from-file=-']):
+            self.assertIsNone(daemon.forward(argv, self.path))
+
+    def test_not_private(self):
+        thread = self.listen('{"status": 0, "stdout": "", "stderr": ""}')
+        os.chmod(daemon.key_path(self.path), 0644)
+        self.assertIsNone(daemon.forward(['lb-list'], self.path))
+        os.chmod(daemon.key_path(self.path), 0600)
+        os.chmod(os.path.dirname(self.path), 0777)
+        try:
+            self.assertIsNone(daemon.forward(['lb-list'], self.path))
+        finally:
+            os.chmod(os.path.dirname(self.path), 0700)
+        self.assertEqual(daemon.forward(['lb-list'], self.path), 0)
+        thread.join()
+
+    @mock.patch('sys.stderr')
+    def test_truncated_reply(self, mock_stderr):
+        # The daemon may have run the command, it must not run again
+        thread = self.listen('{"status": 0, "std')
+        self.assertEqual(daemon.forward(['lb-list'], self.path), 1)
+        thread.join()
+        self.assertTrue(mock_stderr.write.called)
+
+    def test_refused(self):
+        thread = self.listen('{"refused": true}')
+        self.assertIsNone(daemon.forward(['lb-list'], self.path))
+        thread.join()
+
+    @mock.patch('sys.stdout')
+    @mock.patch.object(shell.OpenStackBalancerShell, 'get_client')
+    def test_round_trip(self, mock_get_client, mock_stdout):
+        cs = mock_get_client.return_value
+        cs.probes.iter_list.return_value = []
+        thread = threading.Thread(target=daemon.serve,
+                                  args=(['--socket', self.path],))
+        thread.daemon = True
+        thread.start()
+        while not os.path.exists(self.path):
+            time.sleep(0.01)
+        self.assertEqual(os.stat(daemon.key_path(self.path)).st_mode & 0777,
+                         0600)
+        with mock.patch('sys.stderr'):
+            self.assertEqual(daemon.forward(['probe-list', 'lb1'],
+                                            self.path), 0)
+        cs.probes.iter_list.assert_called_once_with(
+            'lb1', fields=('id', 'name', 'type'))
+        with mock.patch.dict(os.environ, {'OS_USERNAME': 'other'}):
+            self.assertIsNone(daemon.forward(['probe-list', 'lb1'],
+                                             self.path))
@@ -0,0 +1,132 @@
+import BaseHTTPServer
+import json
+import SocketServer
+import threading
+import time
+
+import unittest2
+import mock
+
+from balancerclient.common import base
+from balancerclient.common import exceptions
+from balancerclient.common import executor
+from balancerclient.v1 import client
+
+
+class TestExecutor(unittest2.TestCase):
+    def setUp(self):
+        self.executor = executor.Executor(max_workers=4)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_submit_result(self):
+        future = self.executor.submit(lambda a, b=0: a + b, 1, b=2)
+        self.assertEqual(future.result(), 3)
+        self.assertTrue(future.done())
+        self.assertIsNone(future.exception())
+
+    def test_submit_exception(self):
+        def fail():
+            raise exceptions.NotFound(404)
+        future = self.executor.submit(fail)
+        with self.assertRaises(exceptions.NotFound):
+            future.result()
+        self.assertIsInstance(future.exception(), exceptions.NotFound)
+
+    def test_map_preserves_order(self):
+        def slow_double(i):
+            time.sleep(0.001 * (10 - i))
+            return i * 2
+        self.assertEqual(self.executor.map(slow_double, range(10)),
+                         [i * 2 for i in range(10)])
+
+    def test_max_workers(self):
+        barrier = threading.Event()
+        futures = [self.executor.submit(barrier.wait) for i in range(10)]
+        time.sleep(0.05)
+        self.assertEqual(len(self.executor._threads), 4)
+        barrier.set()
+        [future.result() for future in futures]
+
+    def test_as_completed(self):
+        futures = [self.executor.submit(time.sleep, d)
+                   for d in (0.05, 0.0)]
+        done = list(executor.as_completed(futures))
+        self.assertEqual(done, [futures[1], futures[0]])
+
+    def test_submit_after_shutdown(self):
+        self.executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            self.executor.submit(time.sleep, 0)
+
+
+class TestAsyncManager(unittest2.TestCase):
+    def test_public_methods_return_futures(self):
+        manager = mock.Mock()
+        manager.get.return_value = 'fakelb'
+        async_manager = base.AsyncManager(manager, executor.Executor(2))
+        future = async_manager.get('fakeid')
+        self.assertEqual(future.result(), 'fakelb')
+        self.assertEqual(manager.get.mock_calls, [mock.call('fakeid')])
+
+
+DELAY = 0.02
+
+
+class SlowHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(DELAY)
+        lb_id = self.path.rsplit('/', 1)[-1]
+        body = json.dumps({'loadbalancer': {'id': lb_id}})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class TestAsyncClient(unittest2.TestCase):
+    def setUp(self):
+        self.server = ThreadingServer(('127.0.0.1', 0), SlowHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.endpoint = 'http://127.0.0.1:%s' % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_concurrent_requests(self):
+        count = 25
+        sync = client.Client(endpoint=self.endpoint, token='faketoken')
+        start = time.time()
+        for i in range(count):
+            sync.loadbalancers.get(str(i))
+        sync_elapsed = time.time() - start
+
+        async_client = client.AsyncClient(max_workers=count,
+                                          endpoint=self.endpoint,
+                                          token='faketoken')
+        try:
+            start = time.time()
+            futures = [async_client.loadbalancers.get(str(i))
+                       for i in range(count)]
+            lbs = [future.result() for future in futures]
+            async_elapsed = time.time() - start
+        finally:
+            async_client.close()
+
+        self.assertEqual([lb.id for lb in lbs],
+                         [str(i) for i in range(count)])
+        self.assertGreaterEqual(sync_elapsed, count * DELAY)
+        self.assertLess(async_elapsed, sync_elapsed / 4)
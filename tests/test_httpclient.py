@@ -1,8 +1,13 @@
+import threading
+import time
+
+import httplib2
 import unittest2
 import mock
 
 from balancerclient.common import client
 from balancerclient.common import exceptions
+from balancerclient.common import utils
 
 
 class TestHTTPClient(unittest2.TestCase):
@@ -176,6 +181,12 @@ class TestHTTPClient(unittest2.TestCase):
         self.assertEqual(mock_http_request.mock_calls, [expected])
         self.assertEqual(cm.exception, fake_error)
 
+    def test_ensure_pool(self):
+        self.assertIsNone(self.client.pool)
+        pool = self.client.ensure_pool(5)
+        self.assertEqual(pool.size, 5)
+        self.assertIs(self.client.ensure_pool(10), pool)
+
 
 class TestAuthHttpClient(unittest2.TestCase):
     def setUp(self):
@@ -297,3 +308,175 @@ class TestAuthHttpClient(unittest2.TestCase):
                                 filter_value='fakeregion',
                                 endpoint_type='adminURL')
         ])
+
+
+def make_access(token_id):
+    return {'access': {'token': {'id': token_id,
+                                 'expires': '2100-01-01T00:00:00Z',
+                                 'tenant': {'id': 'faketenantid'}},
+                       'user': {'id': 'fakeuserid'},
+                       'serviceCatalog': [{
+                           'type': 'loadbalancer',
+                           'endpoints': [{
+                               'region': 'fakeregion',
+                               'publicURL': 'http://localhost:8181',
+                               'adminURL': 'http://localhost:8182',
+                           }],
+                       }]}}
+
+
+class TestReauthentication(unittest2.TestCase):
+    def setUp(self):
+        self.tokens = iter('token%d' % i for i in range(100))
+        self.token_requests = 0
+        self.patcher1 = mock.patch('balancerclient.common.client.HTTPClient.'
+                                   '_request_token', autospec=True)
+        self.patcher2 = mock.patch('httplib2.Http.request', autospec=True)
+        self.mock_request_token = self.patcher1.start()
+        self.mock_request_token.side_effect = self._request_token
+        self.mock_request = self.patcher2.start()
+        self.valid_token = 'token0'
+        self.mock_request.side_effect = self._request
+        self.client = client.HTTPClient(username='fakeuser',
+                                        password='fakepass',
+                                        tenant_name='fake',
+                                        auth_url='http://fakes',
+                                        region_name='fakeregion')
+
+    def tearDown(self):
+        self.patcher1.stop()
+        self.patcher2.stop()
+
+    def _request_token(self, cl):
+        time.sleep(0.01)
+        return make_access(next(self.tokens))
+
+    def _request(self, http, url, method, headers=None, **kwargs):
+        if headers.get('X-Auth-Token') != self.valid_token:
+            return mock.Mock(status=401), None
+        return mock.Mock(status=200), '{"id": "fakeid"}'
+
+    def test_retry_after_reauthentication(self):
+        self.valid_token = 'token1'
+        resp, body = self.client.json_request('GET', '/fakes')
+        self.assertEqual(body, {'id': 'fakeid'})
+        self.assertEqual(self.client.auth_token, 'token1')
+        self.assertEqual(self.mock_request_token.call_count, 2)
+        self.assertEqual(self.mock_request.call_count, 2)
+
+    def test_retry_once(self):
+        self.valid_token = 'none'
+        with self.assertRaises(exceptions.Unauthorized):
+            self.client.raw_request('GET', '/fakes')
+        self.assertEqual(self.mock_request_token.call_count, 2)
+        self.assertEqual(self.mock_request.call_count, 2)
+
+    def test_no_credentials(self):
+        cl = client.HTTPClient(endpoint='http://localhost:8181',
+                               token='faketoken')
+        with self.assertRaises(exceptions.Unauthorized):
+            cl.json_request('GET', '/fakes')
+        self.assertEqual(self.mock_request.call_count, 1)
+
+    def test_single_flight_refresh(self):
+        self.valid_token = 'token1'
+        threads = [threading.Thread(target=self.client.json_request,
+                                    args=('GET', '/fakes'))
+                   for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.mock_request_token.call_count, 2)
+        self.assertEqual(self.client.auth_token, 'token1')
+
+    @mock.patch('time.time')
+    def test_background_refresh(self, mock_time):
+        mock_time.return_value = utils.parse_isotime('2100-01-01T00:00:00Z')
+        cl = client.HTTPClient(username='fakeuser', password='fakepass',
+                               tenant_name='fake', auth_url='http://fakes',
+                               auto_refresh=True, refresh_margin=60)
+        timer = cl._refresh_timer
+        timer.cancel()
+        self.assertEqual(timer.interval, cl.MIN_REFRESH_INTERVAL)
+        mock_time.return_value -= 3600
+        timer.function(*timer.args)
+        cl._refresh_timer.cancel()
+        self.assertEqual(self.mock_request_token.call_count, 3)
+        self.assertEqual(cl.auth_token, 'token2')
+        self.assertEqual(cl._refresh_timer.interval, 3600 - 60)
+
+
+class TestEndpointCache(unittest2.TestCase):
+    @mock.patch('balancerclient.common.client.HTTPClient._request_token',
+                autospec=True)
+    def test_endpoints_cached_until_reauthentication(self,
+                                                     mock_request_token):
+        mock_request_token.return_value = make_access('faketoken')
+        cl = client.HTTPClient(username='fakeuser', password='fakepass',
+                               tenant_name='fake', auth_url='http://fakes',
+                               region_name='fakeregion')
+        with mock.patch.object(cl.service_catalog, 'url_for',
+                               wraps=cl.service_catalog.url_for) as url_for:
+            for i in range(3):
+                self.assertEqual(cl._url('/fakes'),
+                                 'http://localhost:8181/fakes')
+                self.assertEqual(cl._url('/fakes', admin_url=True),
+                                 'http://localhost:8182/fakes')
+        self.assertEqual(url_for.call_count, 2)
+
+        mock_request_token.return_value = make_access('newtoken')
+        mock_request_token.return_value['access']['serviceCatalog'][0][
+            'endpoints'][0]['publicURL'] = 'http://otherhost:8181'
+        cl.reauthenticate('faketoken')
+        self.assertEqual(cl._url('/fakes'), 'http://otherhost:8181/fakes')
+
+
+class TestConditionalGet(unittest2.TestCase):
+    def setUp(self):
+        self.client = client.HTTPClient(endpoint='http://localhost:8181',
+                                        token='faketoken',
+                                        conditional_get=True)
+
+    @mock.patch('httplib2.Http.request', autospec=True)
+    def test_not_modified(self, mock_req):
+        mock_req.side_effect = [
+            (httplib2.Response({'status': 200, 'etag': '"v1"'}),
+             '{"id": "fakeid"}'),
+            (httplib2.Response({'status': 304}), ''),
+        ]
+        resp, body1 = self.client.json_request('GET', '/fakes')
+        resp, body2 = self.client.json_request('GET', '/fakes')
+        self.assertEqual(resp.status, 304)
+        self.assertIs(body1, body2)
+        headers = mock_req.mock_calls[1][2]['headers']
+        self.assertEqual(headers['If-None-Match'], '"v1"')
+
+    @mock.patch('httplib2.Http.request', autospec=True)
+    def test_modified(self, mock_req):
+        mock_req.side_effect = [
+            (httplib2.Response({'status': 200,
+                                'last-modified': 'fakedate'}),
+             '{"id": "fakeid"}'),
+            (httplib2.Response({'status': 200}), '{"id": "newid"}'),
+            (httplib2.Response({'status': 200}), '{"id": "newid"}'),
+        ]
+        self.client.json_request('GET', '/fakes')
+        resp, body = self.client.json_request('GET', '/fakes')
+        self.assertEqual(body, {'id': 'newid'})
+        self.assertEqual(mock_req.mock_calls[1][2]['headers'][
+            'If-Modified-Since'], 'fakedate')
+        # no validators came with the last response
+        self.client.json_request('GET', '/fakes')
+        self.assertNotIn('If-Modified-Since',
+                         mock_req.mock_calls[2][2]['headers'])
+
+    @mock.patch('httplib2.Http.request', autospec=True)
+    def test_only_get(self, mock_req):
+        mock_req.return_value = (httplib2.Response({'status': 200,
+                                                    'etag': '"v1"'}),
+                                 '{"id": "fakeid"}')
+        self.client.json_request('PUT', '/fakes', body={})
+        self.client.json_request('PUT', '/fakes', body={})
+        self.assertNotIn('If-None-Match',
+                         mock_req.mock_calls[1][2]['headers'])
@@ -2,6 +2,7 @@ import unittest2
 import mock
 
 from balancerclient.common import client
+from balancerclient.common import exceptions
 from balancerclient.v1.client import Client
 from balancerclient.v1.loadbalancers import LoadBalancerManager
 from balancerclient.v1.nodes import NodeManager
@@ -132,14 +133,19 @@ class TestNodeManager(unittest2.TestCase):
         self.assertTrue(mock_update.called)
         self.assertEqual(mock_update.mock_calls, [expected])
 
-    @mock.patch('balancerclient.common.base.Manager._update', autospec=True)
-    def test_update_condition(self, mock_update):
-        self.nodes.update_condition(self.lb, self.node, 'FAKECONDITION')
-        expected = mock.call(self.nodes,
-                       '/loadbalancers/lbfakeid/nodes/fakeid/FAKECONDITION',
-                       'loadbalancers')
-        self.assertTrue(mock_update.called)
-        self.assertEqual(mock_update.mock_calls, [expected])
+    def test_update_condition(self):
+        json_request = self.nodes.api.client.json_request
+        json_request.return_value = (mock.Mock(), {'node': {'id': 'fakeid'}})
+        node = self.nodes.update_condition(self.lb, self.node,
+                                           'FAKECONDITION')
+        self.assertEqual(node.id, 'fakeid')
+        json_request.return_value = (mock.Mock(), None)
+        self.assertIsNone(self.nodes.update_condition(self.lb, self.node,
+                                                      'FAKECONDITION'))
+        self.assertEqual(json_request.mock_calls, [
+            mock.call('PUT',
+                      '/loadbalancers/lbfakeid/nodes/fakeid/FAKECONDITION',
+                      admin_url=False, body=None)] * 2)
 
     @mock.patch('balancerclient.common.base.Manager._delete', autospec=True)
     def test_delete(self, mock_delete):
@@ -157,6 +163,139 @@ class TestNodeManager(unittest2.TestCase):
         self.assertTrue(mock_list.called)
         self.assertEqual(mock_list.mock_calls, [expected])
 
+    @mock.patch('balancerclient.common.base.Manager._create', autospec=True)
+    def test_create_many(self, mock_create):
+        nodes = [{'name': 'node%d' % i} for i in range(5)]
+        mock_create.side_effect = lambda manager, url, body, key, **kw: \
+            body['nodes']
+        created = self.nodes.create_many(self.lb, nodes, chunk_size=2)
+        self.assertEqual([n.name for n in created],
+                         ['node%d' % i for i in range(5)])
+        self.assertEqual(mock_create.mock_calls, [
+            mock.call(self.nodes, '/loadbalancers/lbfakeid/nodes',
+                      {'nodes': chunk}, 'nodes', return_raw=True)
+            for chunk in (nodes[0:2], nodes[2:4], nodes[4:5])])
+
+    @mock.patch('balancerclient.common.base.Manager._create', autospec=True)
+    def test_create_many_fallback(self, mock_create):
+        nodes = [{'name': 'node%d' % i} for i in range(3)]
+
+        def create(manager, url, body, key, **kwargs):
+            if len(body['nodes']) > 1:
+                raise exceptions.BadRequest(400)
+            if body['nodes'][0]['name'] == 'node1':
+                raise exceptions.BadRequest(400)
+            return body['nodes']
+        mock_create.side_effect = create
+        with self.assertRaises(exceptions.BulkOperationError) as cm:
+            self.nodes.create_many(self.lb, nodes, chunk_size=3)
+        self.assertEqual([n.name for n in cm.exception.results],
+                         ['node0', 'node2'])
+        self.assertEqual(len(cm.exception.errors), 1)
+        node, error = cm.exception.errors[0]
+        self.assertEqual(node, {'name': 'node1'})
+        self.assertIsInstance(error, exceptions.BadRequest)
+        self.assertEqual(mock_create.call_count, 4)
+
+    @mock.patch('balancerclient.common.base.Manager._create', autospec=True)
+    def test_create_many_first_node_only(self, mock_create):
+        nodes = [{'name': 'node%d' % i} for i in range(5)]
+        mock_create.side_effect = lambda manager, url, body, key, **kw: \
+            body['nodes'][:1]
+        created = self.nodes.create_many(self.lb, nodes, chunk_size=3)
+        self.assertEqual([n.name for n in created],
+                         ['node%d' % i for i in range(5)])
+        self.assertEqual(mock_create.call_count, 5)
+
+    @mock.patch('balancerclient.common.base.Manager._create', autospec=True)
+    def test_create_many_server_error(self, mock_create):
+        for code in (404, 413, 429, 503):
+            mock_create.reset_mock()
+            mock_create.side_effect = exceptions.ClientException(code)
+            with self.assertRaises(exceptions.ClientException):
+                self.nodes.create_many(self.lb, [{'name': 'node'}])
+            self.assertEqual(mock_create.call_count, 1)
+
+    @mock.patch('balancerclient.common.base.Manager._delete', autospec=True)
+    def test_delete_many(self, mock_delete):
+        ids = ['fakeid%d' % i for i in range(5)]
+        self.assertEqual(self.nodes.delete_many(self.lb, ids), ids)
+        self.assertEqual(sorted(mock_delete.mock_calls), sorted(
+            mock.call(self.nodes, '/loadbalancers/lbfakeid/nodes/%s' % id)
+            for id in ids))
+
+    @mock.patch('balancerclient.common.base.Manager._delete', autospec=True)
+    def test_delete_many_partial_failure(self, mock_delete):
+        def delete(manager, url):
+            if url.endswith('fakeid1'):
+                raise exceptions.NotFound(404)
+        mock_delete.side_effect = delete
+        with self.assertRaises(exceptions.BulkOperationError) as cm:
+            self.nodes.delete_many(self.lb, ['fakeid0', 'fakeid1',
+                                             'fakeid2'], concurrency=2)
+        self.assertEqual(cm.exception.results, ['fakeid0', 'fakeid2'])
+        self.assertEqual([item for item, error in cm.exception.errors],
+                         ['fakeid1'])
+
+    @mock.patch('balancerclient.common.base.Manager._update', autospec=True)
+    def test_update_many(self, mock_update):
+        mock_update.side_effect = lambda manager, url, body, key: body
+        changes = {'fakeid1': {'weight': 1}, 'fakeid2': {'name': 'fake'}}
+        results = self.nodes.update_many(self.lb, changes)
+        self.assertEqual(sorted(results), sorted([{'weight': 1},
+                                                  {'name': 'fake'}]))
+        self.assertEqual(mock_update.call_count, 2)
+
+    @mock.patch('balancerclient.common.base.Manager._iter_list',
+                autospec=True)
+    def test_iter_list(self, mock_iter_list):
+        self.nodes.iter_list(self.lb, page_size=100)
+        mock_iter_list.assert_called_once_with(
+            self.nodes, '/loadbalancers/lbfakeid/nodes', 'nodes',
+            page_size=100, fields=None, filters=None)
+
+    def make_nodes(self, **states):
+        return [mock.Mock(id=id, _info={'id': id, 'condition': condition,
+                                        'status': 'ACTIVE'})
+                for id, condition in sorted(states.items())]
+
+    @mock.patch('time.sleep')
+    @mock.patch('balancerclient.v1.nodes.NodeManager.list')
+    @mock.patch('balancerclient.v1.nodes.NodeManager.update_condition')
+    def test_rolling_condition(self, mock_condition, mock_list, mock_sleep):
+        mock_list.side_effect = [
+            self.make_nodes(n1='ENABLED', n2='ENABLED', n3='ENABLED'),
+            self.make_nodes(n1='DISABLED', n2='DISABLED', n3='ENABLED'),
+            self.make_nodes(n1='DISABLED', n2='DISABLED', n3='DISABLED'),
+        ]
+        batches = []
+        settled = self.nodes.rolling_condition(
+            self.lb, ['n1', 'n2', 'n3'], 'DISABLED', batch_size=2,
+            on_batch=lambda number, done, errors: batches.append(
+                (number, [node.id for node in done], errors)))
+        self.assertEqual([node.id for node in settled], ['n1', 'n2', 'n3'])
+        self.assertEqual(batches, [(1, ['n1', 'n2'], []), (2, ['n3'], [])])
+        self.assertEqual(mock_condition.call_count, 3)
+        self.assertEqual(mock_list.call_count, 3)
+
+    @mock.patch('time.sleep')
+    @mock.patch('balancerclient.v1.nodes.NodeManager.list')
+    @mock.patch('balancerclient.v1.nodes.NodeManager.update_condition')
+    def test_rolling_condition_abort(self, mock_condition, mock_list,
+                                     mock_sleep):
+        def update_condition(lb, node, condition):
+            if node == 'n1':
+                raise exceptions.NotFound(404)
+        mock_condition.side_effect = update_condition
+        mock_list.return_value = self.make_nodes(n2='DISABLED')
+        with self.assertRaises(exceptions.BulkOperationError) as cm:
+            self.nodes.rolling_condition(self.lb, ['n1', 'n2', 'n3', 'n4'],
+                                         'DISABLED', batch_size=2)
+        self.assertEqual([node.id for node in cm.exception.results], ['n2'])
+        self.assertEqual([item for item, error in cm.exception.errors],
+                         ['n1'])
+        self.assertEqual(mock_condition.call_count, 2)
+
 
 class TestDeviceManager(unittest2.TestCase):
     def setUp(self):
@@ -350,6 +489,13 @@ class TestVIPManager(unittest2.TestCase):
         self.assertTrue(mock_update.called)
         self.assertEqual(mock_update.mock_calls, [expected])
 
+    @mock.patch('balancerclient.common.base.Manager._update', autospec=True)
+    def test_update_vlan_in_extra(self, mock_update):
+        self.vips.update(self.lb, self.vip, **{'VLAN': 200, 'port': 81})
+        mock_update.assert_called_once_with(
+            self.vips, '/loadbalancers/lbfakeid/virtualIps/fakeid',
+            {'VLAN': 200, 'port': 81}, 'virtualIp')
+
     @mock.patch('balancerclient.common.base.Manager._get', autospec=True)
     def test_get(self, mock_get):
         self.vips.get(self.lb, self.vip)
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import unittest2
+import mock
+
+from balancerclient.common import client
+from balancerclient.common import pool
+
+
+class TestConnectionPool(unittest2.TestCase):
+    def setUp(self):
+        self.patcher = mock.patch('httplib2.Http')
+        self.mock_http = self.patcher.start()
+        self.mock_http.side_effect = lambda **kwargs: mock.Mock(
+            connections={},
+            request=mock.Mock(return_value=(mock.Mock(status=200), 'body')))
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_reuse_connection(self):
+        p = pool.ConnectionPool(size=2)
+        p.request('http://localhost:8181/fakes', 'GET')
+        p.request('http://localhost:8181/fakes', 'GET')
+        self.assertEqual(self.mock_http.call_count, 1)
+
+    def test_separate_endpoints(self):
+        p = pool.ConnectionPool(size=2)
+        p.request('http://localhost:8181/fakes', 'GET')
+        p.request('http://localhost:8282/fakes', 'GET')
+        self.assertEqual(self.mock_http.call_count, 2)
+
+    def test_max_requests(self):
+        p = pool.ConnectionPool(size=1, max_requests=2)
+        for i in range(5):
+            p.request('http://localhost:8181/fakes', 'GET')
+        self.assertEqual(self.mock_http.call_count, 3)
+
+    @mock.patch('time.time')
+    def test_idle_timeout(self, mock_time):
+        mock_time.return_value = 100
+        p = pool.ConnectionPool(size=1, idle_timeout=10)
+        p.request('http://localhost:8181/fakes', 'GET')
+        mock_time.return_value = 105
+        p.request('http://localhost:8181/fakes', 'GET')
+        self.assertEqual(self.mock_http.call_count, 1)
+        mock_time.return_value = 200
+        p.request('http://localhost:8181/fakes', 'GET')
+        self.assertEqual(self.mock_http.call_count, 2)
+
+    def test_failed_request_discards_connection(self):
+        p = pool.ConnectionPool(size=1)
+        self.mock_http.side_effect = None
+        self.mock_http.return_value.request.side_effect = IOError()
+        with self.assertRaises(IOError):
+            p.request('http://localhost:8181/fakes', 'GET')
+        self.assertEqual(p._idle[('http', 'localhost:8181')], [])
+        # the slot must be released even though the request failed
+        with self.assertRaises(IOError):
+            p.request('http://localhost:8181/fakes', 'GET')
+
+    def test_size_bounds_concurrency(self):
+        state = {'active': 0, 'peak': 0}
+        lock = threading.Lock()
+
+        def request(*args, **kwargs):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.01)
+            with lock:
+                state['active'] -= 1
+            return mock.Mock(status=200), 'body'
+
+        self.mock_http.side_effect = lambda **kwargs: mock.Mock(
+            connections={}, request=request)
+        p = pool.ConnectionPool(size=3)
+        threads = [threading.Thread(target=p.request,
+                                    args=('http://localhost:8181/', 'GET'))
+                   for i in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(state['peak'], 3)
+        self.assertEqual(self.mock_http.call_count, 3)
+
+
+class TestPooledHTTPClient(unittest2.TestCase):
+    @mock.patch('balancerclient.common.pool.ConnectionPool.request')
+    def test_http_request_uses_pool(self, mock_request):
+        mock_request.return_value = (mock.Mock(status=200), 'fakebody')
+        cl = client.HTTPClient(endpoint='http://localhost:8181',
+                               token='faketoken', pool_size=4)
+        resp, body = cl._http_request('http://fakes', 'GET')
+        headers = {'User-Agent': 'python-balancerclient',
+                   'X-Auth-Token': 'faketoken'}
+        self.assertEqual(mock_request.mock_calls, [
+            mock.call('http://fakes', 'GET', follow_all_redirects=False,
+                      headers=headers),
+        ])
+        self.assertEqual(body, 'fakebody')
+        self.assertEqual(cl.pool.size, 4)
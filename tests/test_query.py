@@ -0,0 +1,97 @@
+import unittest2
+
+from balancerclient.common import base
+from balancerclient.common import exceptions
+from balancerclient.common import query
+
+
+def resources(count):
+    return [base.Resource(None, {'id': str(i), 'name': 'node%02d' % i,
+                                 'weight': i % 4,
+                                 'condition': i % 2 and 'ENABLED' or
+                                              'DISABLED',
+                                 'address': '10.0.%d.%d' % (i % 3, i)},
+                          loaded=True)
+            for i in range(count)]
+
+
+def ids(selected):
+    return [res.id for res in selected]
+
+
+class TestFilter(unittest2.TestCase):
+    def match(self, text, count=12):
+        return ids(query.Query(text).apply(resources(count)))
+
+    def test_comparisons(self):
+        self.assertEqual(self.match('weight>2'), ['3', '7', '11'])
+        self.assertEqual(self.match('weight>=3'), ['3', '7', '11'])
+        self.assertEqual(self.match('condition!=ENABLED and weight==0'),
+                         ['0', '4', '8'])
+        self.assertEqual(self.match('address^=10.0.2.'), ['2', '5', '8',
+                                                          '11'])
+        self.assertEqual(self.match("name=~'0[13]$'"), ['1', '3'])
+
+    def test_numbers_compare_as_numbers(self):
+        self.assertEqual(self.match('id>9'), ['10', '11'])
+        self.assertEqual(self.match('name<node02'), ['0', '1'])
+
+    def test_boolean_operators(self):
+        self.assertEqual(self.match('weight==3 or id==0 and weight==0'),
+                         ['0', '3', '7', '11'])
+        self.assertEqual(self.match('(weight==3 or id==0) and id<5'),
+                         ['0', '3'])
+        self.assertEqual(self.match('not weight<3'), ['3', '7', '11'])
+
+    def test_missing_attribute(self):
+        self.assertEqual(self.match('status==ACTIVE'), [])
+        self.assertEqual(len(self.match('status!=ACTIVE')), 12)
+
+    def test_fields_and_equalities(self):
+        selected = query.Filter('condition==ENABLED and (weight>1 or '
+                                'address==10.0.0.1) and name=="a b"')
+        self.assertEqual(selected.fields, ('condition', 'weight', 'address',
+                                           'name'))
+        self.assertEqual(selected.equalities, {'condition': 'ENABLED',
+                                               'name': 'a b'})
+        self.assertEqual(query.Filter('a==1 or b==2').equalities, {})
+        self.assertEqual(query.Filter('weight==10.0 and type==HW').equalities,
+                         {'type': 'HW'})
+
+    def test_invalid(self):
+        for text in ('weight>', 'weight 3', '(weight==3', 'a==1 b==2',
+                     'a=~"("', '==3'):
+            self.assertRaises(exceptions.CommandError, query.Filter, text)
+
+
+class TestQuery(unittest2.TestCase):
+    def test_sort(self):
+        selected = query.Query(sort='-weight,name:desc').apply(resources(8))
+        self.assertEqual(ids(selected), ['7', '3', '6', '2', '5', '1', '4',
+                                         '0'])
+
+    def test_top_k(self):
+        selected = query.Query('condition==ENABLED', sort='weight:desc,id',
+                               limit=3).apply(resources(12))
+        self.assertEqual(ids(selected), ['3', '7', '11'])
+
+    def test_limit_stops_early(self):
+        consumed = []
+
+        def stream():
+            for res in resources(10):
+                consumed.append(res.id)
+                yield res
+        self.assertEqual(ids(query.Query(limit=2).apply(stream())),
+                         ['0', '1'])
+        self.assertEqual(consumed, ['0', '1'])
+
+    def test_columns(self):
+        selection = query.Query('weight>1', sort='-condition,id')
+        self.assertEqual(selection.columns(('id', 'name')),
+                         ('id', 'name', 'weight', 'condition'))
+
+    def test_invalid(self):
+        self.assertRaises(exceptions.CommandError, query.Query,
+                          sort='weight:up')
+        self.assertRaises(exceptions.CommandError, query.Query, limit=-1)
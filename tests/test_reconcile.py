@@ -0,0 +1,145 @@
+import unittest2
+import mock
+
+from balancerclient.common import base
+from balancerclient.common import exceptions
+from balancerclient.v1 import reconcile
+from balancerclient.v1 import topology
+
+
+def res(**info):
+    return base.Resource(None, info, loaded=True)
+
+
+def make_topology():
+    return topology.Topology(
+        res(id='lb1', name='web', algorithm='ROUNDROBIN'),
+        (res(id='n1', name='a', address='10.0.0.1', port='80', weight='10',
+             condition='ENABLED'),
+         res(id='n2', name='b', address='10.0.0.2', port='80', weight='10',
+             condition='ENABLED')),
+        (res(id='p1', name='ping', type='ICMP'),),
+        (),
+        (res(id='v1', name='vip', address='10.0.1.1', port='80'),))
+
+
+class TestPlan(unittest2.TestCase):
+    def setUp(self):
+        self.api = mock.Mock()
+        self.api.loadbalancers.list.return_value = [res(id='lb1', name='web')]
+        patcher = mock.patch('balancerclient.v1.topology.snapshot',
+                             return_value=(make_topology(),))
+        self.mock_snapshot = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def plan(self, **spec):
+        spec.setdefault('name', 'web')
+        return reconcile.plan(self.api, {'loadbalancers': [spec]})
+
+    def test_no_changes(self):
+        plan = self.plan(algorithm='ROUNDROBIN',
+                         nodes=[{'address': '10.0.0.1', 'port': 80,
+                                 'weight': 10},
+                                {'address': '10.0.0.2', 'port': 80}])
+        self.assertEqual(len(plan), 0)
+        self.assertEqual(plan.calls, 0)
+        lb = self.api.loadbalancers.list.return_value[0]
+        self.mock_snapshot.assert_called_once_with(self.api, [lb], 10)
+
+    def test_nodes(self):
+        plan = self.plan(nodes=[{'address': '10.0.0.1', 'port': 80,
+                                 'weight': 20, 'condition': 'DISABLED'},
+                                {'address': '10.0.0.3', 'port': 80},
+                                {'address': '10.0.0.4', 'port': 80}])
+        self.assertEqual([(a.op, base.getid(a.target)) for a in plan],
+                         [('update', 'n1'), ('condition', 'n1'),
+                          ('create', None), ('delete', 'n2')])
+        self.assertEqual(plan.actions[0].body, {'weight': 20})
+        self.assertEqual(len(plan.actions[2].body), 2)
+        self.assertEqual(plan.calls, 4)
+
+    def test_phases(self):
+        plan = self.plan(nodes=[{'address': '10.0.0.2', 'port': 80,
+                                 'condition': 'DISABLED'},
+                                {'address': '10.0.0.9', 'port': 80}])
+        self.assertEqual([[(a.op, base.getid(a.target)) for a in phase]
+                          for phase in plan.phases()],
+                         [[('create', None)], [('condition', 'n2')],
+                          [('delete', 'n1')]])
+
+    def test_node_without_port(self):
+        plan = self.plan(nodes=[{'address': '10.0.0.1', 'weight': 10},
+                                {'address': '10.0.0.2', 'weight': 5}])
+        self.assertEqual([(a.op, base.getid(a.target)) for a in plan],
+                         [('update', 'n2')])
+        self.assertEqual(plan.actions[0].body, {'weight': 5})
+
+    def test_unknown_lb_attributes(self):
+        with self.assertRaises(exceptions.CommandError) as cm:
+            self.plan(stickies=[], algoritm='ROUNDROBIN')
+        self.assertIn('algoritm, stickies', str(cm.exception))
+        self.assertFalse(self.mock_snapshot.called)
+
+    def test_unmanaged_kinds_untouched(self):
+        plan = self.plan(vips=[])
+        self.assertEqual([(a.op, a.kind) for a in plan],
+                         [('delete', 'vips')])
+
+    def test_probe_replaced(self):
+        plan = self.plan(probes=[{'name': 'ping', 'type': 'HTTP'}])
+        self.assertEqual([(a.op, base.getid(a.target)) for a in plan],
+                         [('create', None), ('delete', 'p1')])
+
+    def test_lb_update(self):
+        plan = self.plan(algorithm='LEASTCONNECTION')
+        self.assertEqual(plan.actions[0].kind, 'loadbalancers')
+        self.assertEqual(plan.actions[0].body,
+                         {'algorithm': 'LEASTCONNECTION'})
+
+    def test_lb_not_found(self):
+        self.assertRaises(exceptions.NotFound, self.plan, name='missing')
+
+    def test_describe(self):
+        plan = self.plan(nodes=[{'address': '10.0.0.3', 'port': 80}])
+        self.assertEqual(list(plan.describe()),
+                         ['loadbalancer lb1: create 1 nodes',
+                          'loadbalancer lb1: delete nodes n1',
+                          'loadbalancer lb1: delete nodes n2'])
+
+
+class TestApply(unittest2.TestCase):
+    def setUp(self):
+        self.api = mock.Mock()
+        self.actions = [
+            reconcile.Action('create', 'nodes', 'lb1', None, [{'a': 1}]),
+            reconcile.Action('condition', 'nodes', 'lb1', 'n1',
+                             {'condition': 'ENABLED'}),
+            reconcile.Action('delete', 'probes', 'lb1', 'p1', None),
+        ]
+
+    def test_apply(self):
+        reconcile.apply(self.api, reconcile.Plan(self.actions))
+        self.api.nodes.create_many.assert_called_once_with(
+            'lb1', [{'a': 1}], chunk_size=reconcile.NODE_CHUNK_SIZE)
+        self.api.nodes.update_condition.assert_called_once_with(
+            'lb1', 'n1', 'ENABLED')
+        self.api.probes.delete.assert_called_once_with('lb1', 'p1')
+
+    def test_no_deletes_after_failure(self):
+        self.api.nodes.create_many.side_effect = IOError()
+        with self.assertRaises(exceptions.BulkOperationError) as cm:
+            reconcile.apply(self.api, reconcile.Plan(self.actions))
+        self.assertEqual(cm.exception.errors[0][0], self.actions[0])
+        self.assertFalse(self.api.nodes.update_condition.called)
+        self.assertFalse(self.api.probes.delete.called)
+
+
+class TestLoadState(unittest2.TestCase):
+    def test_json(self):
+        self.assertEqual(reconcile.load_state('{"loadbalancers": []}'),
+                         {'loadbalancers': []})
+
+    @mock.patch('balancerclient.v1.reconcile.yaml', None)
+    def test_yaml_unavailable(self):
+        self.assertRaises(exceptions.CommandError, reconcile.load_state,
+                          'loadbalancers: []')
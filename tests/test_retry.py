@@ -0,0 +1,106 @@
+import email.utils
+
+import unittest2
+import mock
+
+from balancerclient.common import client
+from balancerclient.common import retry
+
+
+def make_resp(status, retry_after=None):
+    resp = {}
+    if retry_after is not None:
+        resp['retry-after'] = retry_after
+    return mock.Mock(status=status, get=resp.get)
+
+
+class TestBackoff(unittest2.TestCase):
+    def test_exponential_capped(self):
+        delays = retry.backoff(1, 5, jitter=0)
+        self.assertEqual([next(delays) for i in range(5)], [1, 2, 4, 5, 5])
+
+    def test_jitter(self):
+        delays = retry.backoff(4, 4, jitter=0.5)
+        for i in range(50):
+            self.assertTrue(2 <= next(delays) <= 4)
+
+
+class TestParseRetryAfter(unittest2.TestCase):
+    def test_seconds(self):
+        self.assertEqual(retry.parse_retry_after('120'), 120)
+
+    @mock.patch('time.time')
+    def test_http_date(self, mock_time):
+        mock_time.return_value = 1000000000
+        value = email.utils.formatdate(1000000030, usegmt=True)
+        self.assertEqual(retry.parse_retry_after(value), 30)
+
+    def test_invalid(self):
+        self.assertIsNone(retry.parse_retry_after('soon'))
+        self.assertIsNone(retry.parse_retry_after(None))
+
+
+@mock.patch('time.sleep')
+class TestRetryPolicy(unittest2.TestCase):
+    def setUp(self):
+        self.attempts = []
+        self.policy = retry.RetryPolicy(retries=3, initial_backoff=1,
+                                        jitter=0,
+                                        on_attempt=self.attempts.append)
+
+    def test_retry_until_success(self, mock_sleep):
+        send = mock.Mock(side_effect=[(make_resp(503), None),
+                                      (make_resp(413), None),
+                                      (make_resp(200), 'body')])
+        resp, body = self.policy.run('GET', 'http://fakes', send)
+        self.assertEqual(body, 'body')
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(mock_sleep.mock_calls, [mock.call(1),
+                                                 mock.call(2)])
+        self.assertEqual([a.status for a in self.attempts], [503, 413, 200])
+        self.assertEqual(self.policy.metrics, {'requests': 1, 'attempts': 3,
+                                               'retries': 2, 'exhausted': 0})
+
+    def test_retry_after(self, mock_sleep):
+        send = mock.Mock(side_effect=[(make_resp(413, '7'), None),
+                                      (make_resp(200), 'body')])
+        self.policy.run('GET', 'http://fakes', send)
+        self.assertEqual(mock_sleep.mock_calls, [mock.call(7)])
+        self.assertEqual(self.attempts[0].delay, 7)
+
+    def test_not_idempotent(self, mock_sleep):
+        send = mock.Mock(return_value=(make_resp(503), None))
+        resp, body = self.policy.run('POST', 'http://fakes', send)
+        self.assertEqual(resp.status, 503)
+        self.assertEqual(send.call_count, 1)
+        self.assertFalse(mock_sleep.called)
+
+    def test_not_retryable_status(self, mock_sleep):
+        send = mock.Mock(return_value=(make_resp(404), None))
+        self.policy.run('GET', 'http://fakes', send)
+        self.assertEqual(send.call_count, 1)
+
+    def test_retries_exhausted(self, mock_sleep):
+        send = mock.Mock(return_value=(make_resp(500), None))
+        resp, body = self.policy.run('DELETE', 'http://fakes', send)
+        self.assertEqual(resp.status, 500)
+        self.assertEqual(send.call_count, 4)
+        self.assertEqual(self.policy.metrics['exhausted'], 1)
+
+    def test_max_time(self, mock_sleep):
+        self.policy.max_time = 10
+        send = mock.Mock(return_value=(make_resp(413, '60'), None))
+        self.policy.run('GET', 'http://fakes', send)
+        self.assertEqual(send.call_count, 1)
+        self.assertFalse(mock_sleep.called)
+        self.assertEqual(self.policy.metrics['exhausted'], 1)
+
+    @mock.patch('httplib2.Http.request', autospec=True)
+    def test_http_client(self, mock_request, mock_sleep):
+        mock_request.side_effect = [(make_resp(503), ''),
+                                    (make_resp(200), '{"id": "fakeid"}')]
+        cl = client.HTTPClient(endpoint='http://localhost:8181',
+                               token='faketoken', retry_policy=self.policy)
+        resp, body = cl.json_request('GET', '/fakes')
+        self.assertEqual(body, {'id': 'fakeid'})
+        self.assertEqual(mock_request.call_count, 2)
@@ -1,4 +1,5 @@
 import unittest2
+import mock
 
 from balancerclient.common import exceptions
 from balancerclient.common import service_catalog
@@ -121,3 +122,41 @@ class ServiceCatalogTest(unittest2.TestCase):
                 "2010-11-01T03:32:15-05:00")
         self.assertEquals(sc.catalog['token']['tenant']['id'],
                 '345')
+
+    def test_index_parity(self):
+        sc = service_catalog.ServiceCatalog(SERVICE_CATALOG['access'])
+        queries = [(None, None, 'compute', 'publicURL'),
+                   ('region', 'North', 'compute', 'internalURL'),
+                   ('versionId', '1.1', 'compute', 'publicURL'),
+                   ('tenantId', '2', 'object-store', 'publicURL'),
+                   ('region', 'South', 'object-store', 'internalURL'),
+                   ('region', '', 'object-store', 'publicURL')]
+        for attr, value, stype, etype in queries:
+            self.assertEqual(sc.url_for(attr, value, service_type=stype,
+                                        endpoint_type=etype),
+                             sc._scan(attr, value, stype)[etype])
+
+    def test_index_not_found(self):
+        sc = service_catalog.ServiceCatalog(SERVICE_CATALOG['access'])
+        self.assertRaises(exceptions.EndpointNotFound, sc.url_for,
+                          'region', 'West', service_type='compute')
+        self.assertRaises(exceptions.EndpointNotFound, sc.url_for,
+                          'nosuchattr', 'North', service_type='compute')
+        self.assertRaises(exceptions.EndpointNotFound, sc.url_for)
+        self.assertRaises(KeyError, sc.url_for, service_type='compute',
+                          endpoint_type='adminURL')
+
+    def test_index_unhashable_filter(self):
+        sc = service_catalog.ServiceCatalog(SERVICE_CATALOG['access'])
+        self.assertRaises(exceptions.EndpointNotFound, sc.url_for,
+                          'region', ['North'], service_type='compute')
+
+    def test_index_built_once(self):
+        sc = service_catalog.ServiceCatalog(SERVICE_CATALOG['access'])
+        with mock.patch.object(sc, '_build_index',
+                               wraps=sc._build_index) as build_index:
+            for i in range(3):
+                sc.url_for('region', 'North', service_type='compute')
+                sc.url_for('region', 'South', service_type='object-store')
+        self.assertEqual(build_index.mock_calls, [mock.call('compute'),
+                                                  mock.call('object-store')])
@@ -0,0 +1,104 @@
+import unittest2
+import mock
+
+from balancerclient import shell
+from balancerclient.common import base
+
+
+class TestShell(unittest2.TestCase):
+    def setUp(self):
+        self.shell = shell.OpenStackBalancerShell()
+
+    def test_builds_selected_subcommand_only(self):
+        with mock.patch('sys.stdout'):
+            self.shell.main(['help', 'node-list'])
+        self.assertEqual(sorted(self.shell.subcommands),
+                         ['help', 'node-list'])
+
+    def test_builds_all_subcommands_for_help(self):
+        with mock.patch('sys.stdout'):
+            self.shell.main(['help'])
+        self.assertIn('lb-list', self.shell.subcommands)
+        self.assertIn('node-list', self.shell.subcommands)
+
+    def test_selected_commands(self):
+        self.assertEqual(self.shell._selected_commands('1', ['lb-list']),
+                         ['lb-list'])
+        self.assertIsNone(self.shell._selected_commands('1', ['nope']))
+        self.assertIsNone(self.shell._selected_commands('1', ['--bogus']))
+
+
+class TestSession(unittest2.TestCase):
+    def setUp(self):
+        self.shell = shell.OpenStackBalancerShell()
+        self.cs = mock.Mock()
+        self.cs.probes.iter_list.return_value = []
+        self.cs.stickies.iter_list.return_value = []
+
+    @mock.patch('sys.stderr')
+    @mock.patch('sys.stdout')
+    def test_commands_share_client(self, mock_stdout, mock_stderr):
+        lines = ['# comment', 'probe-list lb1', '', 'sticky-list lb1']
+        self.assertEqual(self.shell._run_session(self.cs, lines, '1'),
+                         (2, 0))
+        self.cs.probes.iter_list.assert_called_once_with(
+            'lb1', fields=('id', 'name', 'type'))
+        self.cs.stickies.iter_list.assert_called_once_with(
+            'lb1', fields=('id', 'name', 'type'))
+
+    @mock.patch('sys.stderr')
+    @mock.patch('sys.stdout')
+    def test_list_query(self, mock_stdout, mock_stderr):
+        self.cs.probes.iter_list.return_value = [
+            base.Resource(None, {'id': str(i), 'name': 'p%d' % i,
+                                 'type': i % 2 and 'HTTP' or 'TCP',
+                                 'delay': i}, loaded=True)
+            for i in range(10)]
+        lines = ['probe-list lb1 --fields id --filter "type==HTTP" '
+                 '--sort delay:desc --limit 2 --format value']
+        self.assertEqual(self.shell._run_session(self.cs, lines, '1'),
+                         (1, 0))
+        self.cs.probes.iter_list.assert_called_once_with(
+            'lb1', fields=('id', 'type', 'delay'), filters={'type': 'HTTP'})
+        output = ''.join(call[1][0] for call in mock_stdout.write.mock_calls)
+        self.assertEqual(output.split(), ['9', '7'])
+
+    @mock.patch('sys.stderr')
+    @mock.patch('sys.stdout')
+    def test_wait_flag(self, mock_stdout, mock_stderr):
+        self.cs.loadbalancers.update.return_value = None
+        self.cs.loadbalancers.wait_for.return_value = base.Resource(
+            None, {'id': 'lb1'}, loaded=True)
+        lines = ['lb-update --wait lb1 --name web',
+                 'lb-update lb1 --name web --wait --wait-status BUILD']
+        self.assertEqual(self.shell._run_session(self.cs, lines, '1'),
+                         (2, 0))
+        self.cs.loadbalancers.update.assert_called_with('lb1', name='web')
+        self.assertEqual(self.cs.loadbalancers.wait_for.mock_calls, [
+            mock.call('lb1', target=target, timeout=600, lb=None)
+            for target in ('ACTIVE', 'BUILD')])
+
+    @mock.patch('sys.stderr')
+    @mock.patch('sys.stdout')
+    def test_wait_node_update(self, mock_stdout, mock_stderr):
+        self.cs.nodes.update.return_value = None
+        self.cs.nodes.wait_for.return_value = base.Resource(
+            None, {'id': 'n1'}, loaded=True)
+        lines = ['node-update --wait lb1 n1 --weight 5']
+        self.assertEqual(self.shell._run_session(self.cs, lines, '1'),
+                         (1, 0))
+        self.cs.nodes.wait_for.assert_called_once_with(
+            'n1', target='ACTIVE', timeout=600, lb='lb1')
+
+    @mock.patch('sys.stderr')
+    @mock.patch('sys.stdout')
+    def test_stop_on_error(self, mock_stdout, mock_stderr):
+        self.cs.probes.iter_list.side_effect = Exception('boom')
+        lines = ['probe-list lb1', 'sticky-list lb1']
+        self.assertEqual(self.shell._run_session(self.cs, lines, '1',
+                                                 stop_on_error=True),
+                         (1, 1))
+        self.assertFalse(self.cs.stickies.iter_list.called)
+        self.assertEqual(self.shell._run_session(self.cs, lines, '1'),
+                         (2, 1))
+        self.assertTrue(self.cs.stickies.iter_list.called)
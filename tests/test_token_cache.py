@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import time
+
+import unittest2
+import mock
+
+from balancerclient.common import client
+from balancerclient.common import token_cache
+from balancerclient.common import utils
+
+
+def make_body(token_id, expires_in=3600):
+    expires = time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                            time.gmtime(time.time() + expires_in))
+    return {'access': {'token': {'id': token_id,
+                                 'expires': expires,
+                                 'tenant': {'id': 'faketenantid'}},
+                       'user': {'id': 'fakeuserid'},
+                       'serviceCatalog': []}}
+
+
+class TestParseIsotime(unittest2.TestCase):
+    def test_utc(self):
+        self.assertEqual(utils.parse_isotime('2012-09-12T15:38:26Z'),
+                         1347464306)
+
+    def test_offset(self):
+        self.assertEqual(utils.parse_isotime('2012-09-12T10:38:26-05:00'),
+                         1347464306)
+
+    def test_fraction_without_offset(self):
+        self.assertEqual(utils.parse_isotime('2012-09-12T15:38:26.425493'),
+                         1347464306)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, utils.parse_isotime, 'yesterday')
+
+
+class TestTokenCache(unittest2.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = token_cache.TokenCache(os.path.join(self.path, 'tokens'))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_key(self):
+        key1 = self.cache.key('http://fakes', 'fakeuser', tenant_id='1')
+        key2 = self.cache.key('http://fakes', 'fakeuser', tenant_id='2')
+        self.assertNotEqual(key1, key2)
+        self.assertEqual(key1, self.cache.key('http://fakes', 'fakeuser',
+                                              tenant_id='1'))
+
+    def test_put_get(self):
+        body = make_body('fakeid')
+        with self.cache.lock('fakekey'):
+            self.cache.put('fakekey', body)
+        self.assertEqual(self.cache.get('fakekey'), body)
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get('fakekey'))
+
+    def test_get_expiring(self):
+        self.cache.put('fakekey', make_body('fakeid', expires_in=30))
+        self.assertIsNone(self.cache.get('fakekey'))
+
+    def test_get_corrupted(self):
+        self.cache.put('fakekey', {'access': {}})
+        self.assertIsNone(self.cache.get('fakekey'))
+
+    def test_delete(self):
+        self.cache.put('fakekey', make_body('fakeid'))
+        self.cache.delete('fakekey')
+        self.cache.delete('fakekey')
+        self.assertIsNone(self.cache.get('fakekey'))
+
+    @mock.patch('balancerclient.common.client.HTTPClient._json_request',
+                autospec=True)
+    def test_clients_share_token(self, mock_json_request):
+        mock_json_request.return_value = (mock.Mock(status=200),
+                                          make_body('fakeid'))
+        kwargs = dict(username='fakeuser', password='fakepass',
+                      tenant_name='fake', auth_url='http://fakes',
+                      token_cache=self.cache)
+        cl1 = client.HTTPClient(**kwargs)
+        cl2 = client.HTTPClient(**kwargs)
+        self.assertEqual(mock_json_request.call_count, 1)
+        self.assertEqual(cl1.auth_token, 'fakeid')
+        self.assertEqual(cl2.auth_token, 'fakeid')
+        self.assertEqual(cl2.auth_tenant_id, 'faketenantid')
+
+    @mock.patch('balancerclient.common.client.HTTPClient._json_request',
+                autospec=True)
+    def test_expired_token_reauthenticates(self, mock_json_request):
+        mock_json_request.return_value = (mock.Mock(status=200),
+                                          make_body('freshid'))
+        key = self.cache.key('http://fakes', 'fakeuser', tenant_name='fake')
+        self.cache.put(key, make_body('staleid', expires_in=-10))
+        cl = client.HTTPClient(username='fakeuser', password='fakepass',
+                               tenant_name='fake', auth_url='http://fakes',
+                               token_cache=self.cache)
+        self.assertEqual(mock_json_request.call_count, 1)
+        self.assertEqual(cl.auth_token, 'freshid')
+        self.assertEqual(self.cache.get(key)['access']['token']['id'],
+                         'freshid')
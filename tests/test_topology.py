@@ -0,0 +1,71 @@
+import threading
+
+import unittest2
+import mock
+
+from balancerclient.v1.client import Client
+from balancerclient.v1 import topology
+
+
+def fake_json_request(method, url, **kwargs):
+    parts = url.strip('/').split('/')
+    if len(parts) == 1:
+        return None, {'loadbalancers': [{'id': '1'}, {'id': '2'}]}
+    if len(parts) == 2:
+        return None, {'loadbalancer': {'id': parts[1]}}
+    key = parts[2]
+    return None, {key: [{'id': '%s-%s' % (parts[1], parts[2])}]}
+
+
+@mock.patch('balancerclient.common.client.HTTPClient.json_request',
+            side_effect=fake_json_request)
+class TestSnapshot(unittest2.TestCase):
+    def setUp(self):
+        self.api = Client(endpoint='http://localhost:8181', token='faketoken')
+
+    def test_snapshot_all(self, mock_request):
+        topologies = self.api.snapshot(concurrency=4)
+        self.assertIsInstance(topologies, tuple)
+        self.assertEqual([t.loadbalancer.id for t in topologies], ['1', '2'])
+        self.assertEqual(mock_request.call_count, 9)
+        self.assertIsNotNone(self.api.client.pool)
+        nodes = topologies[1].nodes
+        self.assertIsInstance(nodes, tuple)
+        self.assertEqual(nodes[0].id, '2-nodes')
+
+    def test_snapshot_ids(self, mock_request):
+        topologies = self.api.snapshot(['2'])
+        self.assertEqual(len(topologies), 1)
+        self.assertEqual(mock_request.call_count, 5)
+        self.assertEqual(topologies[0].to_dict(), {
+            'loadbalancer': {'id': '2'},
+            'nodes': [{'id': '2-nodes'}],
+            'probes': [{'id': '2-healthMonitoring'}],
+            'stickies': [{'id': '2-sessionPersistence'}],
+            'vips': [{'id': '2-virtualIps'}],
+        })
+
+    def test_completion_order(self, mock_request):
+        release = threading.Event()
+
+        def slow_lb1(method, url, **kwargs):
+            if url.startswith('/loadbalancers/1'):
+                release.wait(5)
+            return fake_json_request(method, url, **kwargs)
+        mock_request.side_effect = slow_lb1
+        topologies = self.api.iter_snapshot(['1', '2'], concurrency=10)
+        self.assertEqual(next(topologies).loadbalancer.id, '2')
+        release.set()
+        self.assertEqual([t.loadbalancer.id for t in topologies], ['1'])
+
+    def test_immutable(self, mock_request):
+        topo = self.api.snapshot(['1'])[0]
+        with self.assertRaises(AttributeError):
+            topo.nodes = ()
+        with self.assertRaises(AttributeError):
+            topo.extra = 1
+
+    def test_empty(self, mock_request):
+        self.assertEqual(topology.snapshot(self.api, []), ())
+        self.assertFalse(mock_request.called)
+
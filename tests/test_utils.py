@@ -0,0 +1,123 @@
+import json
+import StringIO
+
+import unittest2
+import mock
+
+from balancerclient.common import base
+from balancerclient.common import exceptions
+from balancerclient.common import utils
+
+
+class TestBoolFromString(unittest2.TestCase):
+    def test_values(self):
+        for value in ('1', 'true', 'True', 'YES', 'on', ' y '):
+            self.assertTrue(utils.bool_from_string(value), value)
+        for value in ('', '0', 'false', 'no', 'off', 'bogus', None):
+            self.assertFalse(utils.bool_from_string(value), value)
+
+
+class TestIterJSONArray(unittest2.TestCase):
+    def test_items(self):
+        text = json.dumps({'other': {'nodes': [1]},
+                           'nodes': [{'id': 1}, {'id': 2, 'x': [1, ']']}],
+                           'last': None}, indent=2)
+        self.assertEqual(list(utils.iter_json_array(text, 'nodes')),
+                         [{'id': 1}, {'id': 2, 'x': [1, ']']}])
+
+    def test_empty(self):
+        self.assertEqual(list(utils.iter_json_array('{"nodes": [ ]}',
+                                                    'nodes')), [])
+
+    def test_lazy(self):
+        items = utils.iter_json_array('{"nodes": [{"id": 1}, garbage',
+                                      'nodes')
+        self.assertEqual(next(items), {'id': 1})
+        self.assertRaises(ValueError, next, items)
+
+    def test_missing_key(self):
+        self.assertRaises(KeyError, list,
+                          utils.iter_json_array('{"a": []}', 'nodes'))
+
+    def test_not_an_object(self):
+        self.assertRaises(ValueError, list,
+                          utils.iter_json_array('[]', 'nodes'))
+
+
+class TestFindResource(unittest2.TestCase):
+    def setUp(self):
+        self.manager = base.Manager(mock.Mock())
+        self.manager.resource_class = base.Resource
+        self.manager.get = mock.Mock(side_effect=exceptions.NotFound(404))
+        self.manager.list = mock.Mock(return_value=[
+            base.Resource(self.manager, {'id': 'a', 'name': 'web'}),
+        ])
+
+    def test_by_name_with_one_list(self):
+        res = utils.find_resource(self.manager, 'web', 'lbfakeid')
+        self.assertEqual(res.id, 'a')
+        self.manager.list.assert_called_once_with('lbfakeid')
+        self.assertFalse(self.manager.get.called)
+
+    def test_by_id(self):
+        self.manager.get.side_effect = None
+        utils.find_resource(self.manager, '42', 'lbfakeid')
+        self.manager.get.assert_called_once_with('lbfakeid', 42)
+        self.assertFalse(self.manager.list.called)
+
+    def test_missing(self):
+        self.assertRaises(exceptions.CommandError, utils.find_resource,
+                          self.manager, 'missing')
+        self.assertEqual(self.manager.list.call_count, 1)
+        self.manager.get.assert_called_once_with('missing')
+
+
+class TestOutputFormats(unittest2.TestCase):
+    def setUp(self):
+        self.objs = [base.Resource(None, {'id': 1, 'name': u'web'},
+                                   loaded=True),
+                     base.Resource(None, {'id': 2, 'name': 'db'},
+                                   loaded=True)]
+
+    def output(self, func, *args, **kwargs):
+        with mock.patch('sys.stdout', new_callable=StringIO.StringIO) as out:
+            func(*args, **kwargs)
+        return out.getvalue()
+
+    def test_json(self):
+        text = self.output(utils.print_list, iter(self.objs), ('id', 'name'),
+                           output_format='json')
+        self.assertEqual(json.loads(text), [{'id': 1, 'name': 'web'},
+                                            {'id': 2, 'name': 'db'}])
+        self.assertEqual(json.loads(self.output(
+            utils.print_list, [], ('id',), output_format='json')), [])
+
+    def test_jsonl(self):
+        text = self.output(utils.print_list, iter(self.objs), ('id', 'name'),
+                           output_format='jsonl')
+        self.assertEqual(text, '{"id": 1, "name": "web"}\n'
+                               '{"id": 2, "name": "db"}\n')
+
+    def test_csv(self):
+        text = self.output(utils.print_list, iter(self.objs), ('id', 'name'),
+                           output_format='csv')
+        self.assertEqual(text, 'id,name\r\n1,web\r\n2,db\r\n')
+
+    def test_value(self):
+        text = self.output(utils.print_list, iter(self.objs), ('id', 'name'),
+                           output_format='value')
+        self.assertEqual(text, '1 web\n2 db\n')
+
+    def test_dict(self):
+        d = {'id': 1, 'name': 'web'}
+        self.assertEqual(json.loads(self.output(utils.print_dict, d,
+                                                output_format='jsonl')), d)
+        self.assertEqual(self.output(utils.print_dict, d,
+                                     output_format='value'), '1\nweb\n')
+
+    def test_field_case(self):
+        obj = base.Resource(None, {'id': 1, 'VLAN': 100, 'name': 'web'},
+                            loaded=True)
+        text = self.output(utils.print_list, [obj], ('ID', 'VLAN', 'Name'),
+                           output_format='csv')
+        self.assertEqual(text, 'ID,VLAN,Name\r\n1,100,web\r\n')
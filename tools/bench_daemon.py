@@ -0,0 +1,100 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Wall time of `balancer lb-list` run cold and forwarded to balancerd,
+against a fake LBaaS endpoint on localhost.
+
+Usage: python tools/bench_daemon.py [runs]
+"""
+
+import BaseHTTPServer
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+BALANCER = ('import sys; from balancerclient import daemon; '
+            'sys.exit(daemon.main())')
+BALANCERD = ('import sys; from balancerclient import daemon; '
+             'sys.exit(daemon.server_main())')
+
+
+class FakeHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    body = json.dumps({'loadbalancers': [
+        {'id': 'lb-%d' % i, 'name': 'web%d' % i, 'algorithm': 'ROUNDROBIN',
+         'protocol': 'HTTP'} for i in xrange(20)]})
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(code, args, env, runs):
+    """Best wall time of running the balancer command `runs` times."""
+    best = None
+    for i in xrange(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code] + args, cwd=ROOT,
+                              env=env, stdout=open(os.devnull, 'w'))
+        elapsed = time.time() - start
+        best = best is None and elapsed or min(best, elapsed)
+    return best
+
+
+def main():
+    runs = len(sys.argv) > 1 and int(sys.argv[1]) or 20
+    httpd = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), FakeHandler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    path = os.path.join(tempfile.mkdtemp(), 'balancerd.sock')
+    env = dict(os.environ, SERVICE_TOKEN='faketoken',
+               SERVICE_ENDPOINT='http://127.0.0.1:%d' % httpd.server_port,
+               BALANCERD_SOCKET=path)
+    print "cold      %8.2f ms" % (run(BALANCER, ['lb-list'], env, runs) * 1e3)
+
+    daemon = subprocess.Popen([sys.executable, '-c', BALANCERD], cwd=ROOT,
+                              env=env)
+    try:
+        while not os.path.exists(path):
+            time.sleep(0.01)
+        print "balancerd %8.2f ms" % (run(BALANCER, ['lb-list'], env,
+                                          runs) * 1e3)
+    finally:
+        daemon.terminate()
+        daemon.wait()
+        if os.path.exists(path):
+            os.unlink(path)
+        os.rmdir(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    main()
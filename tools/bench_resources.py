@@ -0,0 +1,69 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Memory and attribute access cost of regular and compact resources.
+
+Usage: python tools/bench_resources.py [nodes]
+"""
+
+import gc
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from balancerclient.common import base
+from balancerclient.v1 import nodes
+
+
+def make_info(i):
+    return {'id': 'node-%d' % i, 'name': 'web%d' % i, 'type': 'HW',
+            'address': '10.0.%d.%d' % (i // 256 % 256, i % 256),
+            'port': '80', 'weight': '10', 'condition': 'ENABLED',
+            'status': 'INSERVICE'}
+
+
+def overhead(obj):
+    """Bytes used by a resource on top of its shared info dict."""
+    size = sys.getsizeof(obj)
+    for ref in gc.get_referents(obj):
+        if isinstance(ref, dict) and ref is not obj._info:
+            size += sys.getsizeof(ref)
+    return size
+
+
+def main():
+    count = len(sys.argv) > 1 and int(sys.argv[1]) or 100000
+    infos = [make_info(i) for i in xrange(count)]
+    number = 1000000
+    print "%d nodes with %d attributes" % (count, len(infos[0]))
+    for name, cls in (('regular', nodes.Node),
+                      ('compact', base.compact_class(nodes.Node))):
+        objs = [cls(None, info, loaded=True) for info in infos]
+        size = sum(overhead(obj) for obj in objs)
+        obj = objs[0]
+        elapsed = min(timeit.repeat(lambda: obj.address, number=number,
+                                    repeat=3))
+        print "%-8s %8.1f MB %6d B/node %8.3f us/attribute" % (
+            name, size / 1048576.0, size // count, elapsed / number * 1e6)
+        del objs
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Micro-benchmark of endpoint lookups in a large multi-region catalog.
+
+Usage: python tools/bench_service_catalog.py [services] [regions]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from balancerclient.common import service_catalog
+
+
+def make_catalog(services, regions):
+    catalog = []
+    for s in range(services):
+        service_type = s == services - 1 and 'loadbalancer' or 'svc%d' % s
+        endpoints = []
+        for r in range(regions):
+            url = 'http://%s.region%d.host:8181/v1' % (service_type, r)
+            endpoints.append({'region': 'region%d' % r,
+                              'publicURL': url,
+                              'adminURL': url + '/admin',
+                              'internalURL': url + '/internal'})
+        catalog.append({'type': service_type, 'endpoints': endpoints})
+    return {'serviceCatalog': catalog}
+
+
+def main():
+    services = len(sys.argv) > 1 and int(sys.argv[1]) or 50
+    regions = len(sys.argv) > 2 and int(sys.argv[2]) or 50
+    number = 2000
+    sc = service_catalog.ServiceCatalog(make_catalog(services, regions))
+    region = 'region%d' % (regions - 1)
+
+    def linear():
+        sc._scan('region', region, 'loadbalancer')['publicURL']
+
+    def indexed():
+        sc.url_for('region', region, endpoint_type='publicURL')
+
+    def first_lookup():
+        service_catalog.ServiceCatalog(sc.catalog).url_for('region', region)
+
+    print "catalog: %d services x %d regions" % (services, regions)
+    for name, func in (('linear scan', linear),
+                       ('indexed url_for', indexed),
+                       ('index build + lookup', first_lookup)):
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+        print "%-22s %10.2f us/lookup" % (name, elapsed / number * 1e6)
+
+
+if __name__ == '__main__':
+    main()
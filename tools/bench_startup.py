@@ -0,0 +1,70 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Startup cost of the balancer command: importing the shell, building the
+argument parsers and running `balancer help node-list` in a new process.
+
+Usage: python tools/bench_startup.py [runs]
+"""
+
+import os
+import subprocess
+import sys
+import time
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from balancerclient import shell
+
+
+def spawn(code, runs):
+    """Best wall time of running `code` in a new interpreter."""
+    best = None
+    for i in xrange(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code], cwd=ROOT,
+                              stdout=open(os.devnull, 'w'))
+        elapsed = time.time() - start
+        best = best is None and elapsed or min(best, elapsed)
+    return best
+
+
+def main():
+    runs = len(sys.argv) > 1 and int(sys.argv[1]) or 20
+    cli = shell.OpenStackBalancerShell()
+    number = 100
+    for name, commands in (('all subcommands', None),
+                           ('one subcommand', ['node-list'])):
+        elapsed = min(timeit.repeat(
+            lambda: cli.get_subcommand_parser('1', commands),
+            number=number, repeat=3))
+        print "parser, %-16s %8.2f ms" % (name, elapsed / number * 1e3)
+    for name, code in (
+            ('interpreter', 'pass'),
+            ('import shell', 'from balancerclient import shell'),
+            ('import client', 'from balancerclient.v1 import client'),
+            ('help node-list', 'from balancerclient import shell; '
+                               'shell.OpenStackBalancerShell().main('
+                               '["help", "node-list"])')):
+        print "process, %-15s %8.2f ms" % (name, spawn(code, runs) * 1e3)
+
+
+if __name__ == '__main__':
+    main()